@@ -0,0 +1,32 @@
+-- ============================================================================
+-- 002_opex_rag_queries_feedback.sql
+-- Feedback columns written by the rag-feedback Edge Function
+-- ============================================================================
+
+-- rag-feedback updates `rating`, `feedback` and `evaluation_metadata`, and
+-- fit_confidence.py reads `rating`; 001 named the rating `feedback_rating`.
+ALTER TABLE opex.rag_queries ADD COLUMN IF NOT EXISTS rating INTEGER;
+ALTER TABLE opex.rag_queries ADD COLUMN IF NOT EXISTS feedback TEXT;
+ALTER TABLE opex.rag_queries ADD COLUMN IF NOT EXISTS evaluation_metadata JSONB;
+
+DO $$
+BEGIN
+  IF NOT EXISTS (
+    SELECT 1 FROM pg_constraint
+    WHERE conname = 'check_rating' AND conrelid = 'opex.rag_queries'::regclass
+  ) THEN
+    ALTER TABLE opex.rag_queries
+      ADD CONSTRAINT check_rating CHECK (rating IS NULL OR (rating >= 1 AND rating <= 5));
+  END IF;
+END $$;
+
+-- Keep ratings recorded under the old column name
+UPDATE opex.rag_queries
+SET rating = feedback_rating, feedback = COALESCE(feedback, feedback_text)
+WHERE rating IS NULL AND feedback_rating IS NOT NULL;
+
+-- Rated rows are what fit_confidence.py reads
+CREATE INDEX IF NOT EXISTS idx_rag_queries_rated ON opex.rag_queries(id) WHERE rating IS NOT NULL;
+
+COMMENT ON COLUMN opex.rag_queries.rating IS '1-5 user rating (rag-feedback); feedback_rating is legacy';
+COMMENT ON COLUMN opex.rag_queries.metadata IS 'Flexible JSONB for additional context; the Mattermost rag-service writes retrieval_scores, confidence_score and mm_user_id here';
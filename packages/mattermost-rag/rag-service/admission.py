@@ -0,0 +1,116 @@
+"""Admission control for the RAG pipeline: bounded in-flight work + bounded wait queue."""
+
+import asyncio
+import os
+import time
+from contextlib import asynccontextmanager
+
+import structlog
+
+logger = structlog.get_logger()
+
+
+class QueueFullError(Exception):
+    """Raised when both the in-flight pipeline and the wait queue are full."""
+
+
+class AdmissionController:
+    """
+    Limit concurrent RAG pipelines and shed load once the wait queue is full.
+
+    Callers first `reserve()` a place (cheap, synchronous, done inside the
+    slash-command request so the user gets an immediate answer), then run the
+    pipeline inside `slot()`, which waits for one of the in-flight permits.
+    Limits are per worker process.
+    """
+
+    def __init__(self, max_in_flight: int, max_queue: int):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_queue = max(0, max_queue)
+        self._permits = asyncio.Semaphore(self.max_in_flight)
+
+        self.pending = 0  # reserved: running + waiting
+        self.running = 0
+
+        # Metrics
+        self.admitted_total = 0
+        self.shed_total = 0
+        self.queued_total = 0
+        self.waits_total = 0
+        self.queue_wait_total = 0.0
+        self.queue_wait_max = 0.0
+        self.queue_wait_last = 0.0
+
+    @property
+    def waiting(self) -> int:
+        return self.pending - self.running
+
+    def reserve(self) -> int:
+        """
+        Reserve a pipeline place.
+
+        Returns:
+            Queue position (0 = starts immediately, N = N-th in the wait queue).
+
+        Raises:
+            QueueFullError: in-flight limit and wait queue are both exhausted.
+        """
+        if self.pending >= self.max_in_flight + self.max_queue:
+            self.shed_total += 1
+            logger.warning(
+                "admission_shed", running=self.running, waiting=self.waiting
+            )
+            raise QueueFullError("RAG pipeline is at capacity")
+
+        self.pending += 1
+        self.admitted_total += 1
+        position = max(0, self.pending - self.max_in_flight)
+        if position:
+            self.queued_total += 1
+        return position
+
+    @asynccontextmanager
+    async def slot(self):
+        """Wait for an in-flight permit for a previously reserved place."""
+        enqueued_at = time.monotonic()
+        try:
+            async with self._permits:
+                waited = time.monotonic() - enqueued_at
+                self.queue_wait_last = waited
+                self.waits_total += 1
+                self.queue_wait_total += waited
+                self.queue_wait_max = max(self.queue_wait_max, waited)
+                if waited > 1.0:
+                    logger.info("admission_queue_wait", wait_s=round(waited, 2))
+
+                self.running += 1
+                try:
+                    yield waited
+                finally:
+                    self.running -= 1
+        finally:
+            self.pending -= 1
+
+    def stats(self) -> dict:
+        """Admission snapshot for /health."""
+        return {
+            "max_in_flight": self.max_in_flight,
+            "max_queue": self.max_queue,
+            "running": self.running,
+            "waiting": self.waiting,
+            "admitted_total": self.admitted_total,
+            "queued_total": self.queued_total,
+            "shed_total": self.shed_total,
+            "queue_wait_avg_ms": round(
+                1000 * self.queue_wait_total / self.waits_total, 1
+            )
+            if self.waits_total
+            else 0.0,
+            "queue_wait_max_ms": round(1000 * self.queue_wait_max, 1),
+        }
+
+
+admission = AdmissionController(
+    max_in_flight=int(os.getenv("MAX_CONCURRENT_REQUESTS", "10")),
+    max_queue=int(os.getenv("MAX_QUEUED_REQUESTS", "50")),
+)
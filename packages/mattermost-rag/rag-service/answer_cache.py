@@ -0,0 +1,237 @@
+"""Semantic answer cache in front of retrieve_and_synthesize."""
+
+import hashlib
+import os
+import re
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Optional, Sequence
+
+import numpy as np
+import structlog
+
+logger = structlog.get_logger()
+
+_WHITESPACE = re.compile(r"\s+")
+_EDGE_PUNCTUATION = re.compile(r"^[\s\W_]+|[\s\W_]+$")
+
+
+def normalize_question(text: str) -> str:
+    """Normalize a question for cache keys: case, whitespace, edge punctuation."""
+    text = _WHITESPACE.sub(" ", text.lower())
+    return _EDGE_PUNCTUATION.sub("", text)
+
+
+def question_key(text: str) -> str:
+    """Stable hash of the normalized question."""
+    return hashlib.sha256(normalize_question(text).encode("utf-8")).hexdigest()
+
+
+@dataclass
+class _Entry:
+    value: tuple
+    created_at: float
+    size: int
+    row: Optional[int] = None
+
+
+class AnswerCache:
+    """
+    TTL + LRU cache of pipeline results, bounded by entry count and bytes.
+
+    Exact hits are looked up by the hash of the normalized question. Near hits
+    compare the question embedding against the embeddings of cached questions
+    (cosine similarity, vectorized over a preallocated float32 matrix) and
+    accept the best match above `similarity_threshold`.
+    """
+
+    def __init__(
+        self,
+        max_entries: int = 1000,
+        max_bytes: int = 32 * 1024 * 1024,
+        ttl_seconds: float = 3600,
+        similarity_threshold: float = 0.95,
+    ):
+        self.max_entries = max(1, max_entries)
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+
+        self._entries: OrderedDict[str, _Entry] = OrderedDict()
+        self._bytes = 0
+
+        # Embedding rows of cached questions, allocated on first use
+        self._matrix: Optional[np.ndarray] = None
+        self._row_keys: list[Optional[str]] = []
+        self._free_rows: list[int] = []
+
+        self._source_version: Optional[str] = None
+
+        # Metrics
+        self.exact_hits = 0
+        self.near_hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.invalidations = 0
+
+    # ---------- lookups ----------
+
+    def get(self, question: str) -> Optional[tuple]:
+        """Exact lookup by normalized-question hash."""
+        key = question_key(question)
+        entry = self._live_entry(key)
+        if entry is None:
+            return None
+        self.exact_hits += 1
+        return entry.value
+
+    def get_similar(self, embedding: Sequence[float]) -> Optional[tuple]:
+        """Near lookup: best cached question with cosine similarity >= threshold."""
+        if self._matrix is None or len(self._free_rows) == len(self._row_keys):
+            return None
+
+        query = self._unit(embedding)
+        if query is None or query.shape[0] != self._matrix.shape[1]:
+            return None
+
+        similarities = self._matrix @ query
+        # Free rows are zeroed, so they never clear a positive threshold
+        best_row = int(np.argmax(similarities))
+        best_score = float(similarities[best_row])
+        if best_score < self.similarity_threshold:
+            return None
+
+        key = self._row_keys[best_row]
+        entry = self._live_entry(key) if key else None
+        if entry is None:
+            return None
+
+        self.near_hits += 1
+        logger.info("answer_cache_near_hit", similarity=round(best_score, 4))
+        return entry.value
+
+    def record_miss(self):
+        self.misses += 1
+
+    # ---------- writes ----------
+
+    def put(
+        self,
+        question: str,
+        value: tuple,
+        embedding: Optional[Sequence[float]] = None,
+    ):
+        """Cache a pipeline result, optionally indexed by the question embedding."""
+        key = question_key(question)
+        if key in self._entries:
+            self._remove(key)
+
+        size = sum(len(str(part).encode("utf-8")) for part in value)
+        entry = _Entry(value=value, created_at=time.monotonic(), size=size)
+
+        vector = self._unit(embedding) if embedding is not None else None
+        if vector is not None:
+            row = self._allocate_row(vector.shape[0])
+            if row is not None:
+                self._matrix[row] = vector
+                self._row_keys[row] = key
+                entry.row = row
+                entry.size += vector.nbytes
+
+        self._entries[key] = entry
+        self._bytes += entry.size
+        self._evict()
+
+    def invalidate(self, reason: str = "manual"):
+        """Drop every cached answer."""
+        dropped = len(self._entries)
+        self._entries.clear()
+        self._bytes = 0
+        if self._matrix is not None:
+            self._matrix.fill(0.0)
+            self._row_keys = [None] * len(self._row_keys)
+            self._free_rows = list(range(len(self._row_keys) - 1, -1, -1))
+        self.invalidations += 1
+        logger.info("answer_cache_invalidated", reason=reason, dropped=dropped)
+
+    def observe_source_version(self, version: str):
+        """Invalidate when the knowledge-base version (opex_embedding_sources) changes."""
+        if self._source_version is not None and version != self._source_version:
+            self.invalidate(reason="sources_changed")
+        self._source_version = version
+
+    # ---------- internals ----------
+
+    def _live_entry(self, key: str) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if time.monotonic() - entry.created_at > self.ttl_seconds:
+            self._remove(key)
+            return None
+        self._entries.move_to_end(key)
+        return entry
+
+    def _remove(self, key: str):
+        entry = self._entries.pop(key, None)
+        if entry is None:
+            return
+        self._bytes -= entry.size
+        if entry.row is not None:
+            self._matrix[entry.row] = 0.0
+            self._row_keys[entry.row] = None
+            self._free_rows.append(entry.row)
+
+    def _evict(self):
+        while self._entries and (
+            len(self._entries) > self.max_entries or self._bytes > self.max_bytes
+        ):
+            oldest = next(iter(self._entries))
+            self._remove(oldest)
+            self.evictions += 1
+
+    def _allocate_row(self, dim: int) -> Optional[int]:
+        if self._matrix is None:
+            self._matrix = np.zeros((self.max_entries, dim), dtype=np.float32)
+            self._row_keys = [None] * self.max_entries
+            self._free_rows = list(range(self.max_entries - 1, -1, -1))
+        if dim != self._matrix.shape[1]:
+            return None
+        while not self._free_rows and self._entries:
+            # Every row is taken: evict LRU entries to make room
+            self._remove(next(iter(self._entries)))
+            self.evictions += 1
+        return self._free_rows.pop() if self._free_rows else None
+
+    @staticmethod
+    def _unit(embedding: Sequence[float]) -> Optional[np.ndarray]:
+        vector = np.asarray(embedding, dtype=np.float32)
+        norm = float(np.linalg.norm(vector))
+        if vector.ndim != 1 or norm == 0.0:
+            return None
+        return vector / norm
+
+    def stats(self) -> dict:
+        """Hit-rate snapshot for /health."""
+        lookups = self.exact_hits + self.near_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "exact_hits": self.exact_hits,
+            "near_hits": self.near_hits,
+            "misses": self.misses,
+            "hit_ratio": round((self.exact_hits + self.near_hits) / lookups, 3)
+            if lookups
+            else 0.0,
+            "evictions": self.evictions,
+            "invalidations": self.invalidations,
+        }
+
+
+answer_cache = AnswerCache(
+    max_entries=int(os.getenv("ANSWER_CACHE_MAX_ENTRIES", "1000")),
+    max_bytes=int(os.getenv("ANSWER_CACHE_MAX_BYTES", str(32 * 1024 * 1024))),
+    ttl_seconds=float(os.getenv("ANSWER_CACHE_TTL_SECONDS", "3600")),
+    similarity_threshold=float(os.getenv("ANSWER_CACHE_SIMILARITY", "0.95")),
+)
@@ -0,0 +1,172 @@
+"""
+Calibrated answer confidence from retrieval scores.
+
+A fitted model (see fit_confidence.py) maps retrieval-score features to
+the probability that the answer is rated helpful; without one the legacy
+0.7 x top + 0.3 x mean formula is used with the 0.85 / 0.65 cut-offs.
+"""
+
+import json
+import os
+from typing import Optional
+
+import numpy as np
+import structlog
+
+logger = structlog.get_logger()
+
+# Features computed from the retrieved docs' similarity scores
+FEATURES = ("top", "mean", "gap", "count")
+# Score count is scaled by this so all features sit roughly in 0-1
+_COUNT_SCALE = 5.0
+
+
+def score_features(scores: np.ndarray) -> np.ndarray:
+    """
+    Feature rows for one or many retrievals.
+
+    `scores` is a (n_queries, n_docs) array padded with NaN (or a 1-d array
+    for a single retrieval); returns (n_queries, len(FEATURES)).
+    """
+    scores = np.atleast_2d(np.asarray(scores, dtype=np.float64))
+    count = np.sum(~np.isnan(scores), axis=1)
+    filled = np.where(np.isnan(scores), -np.inf, scores)
+    ordered = -np.sort(-filled, axis=1)
+    top = np.where(count > 0, ordered[:, 0], 0.0)
+    second = ordered[:, 1] if scores.shape[1] > 1 else np.full(len(scores), -np.inf)
+    second = np.where(count > 1, second, top)
+    mean = np.where(count > 0, np.nansum(scores, axis=1) / np.maximum(count, 1), 0.0)
+    return np.column_stack([top, mean, top - second, count / _COUNT_SCALE])
+
+
+def legacy_score(features: np.ndarray) -> np.ndarray:
+    return 0.7 * features[:, 0] + 0.3 * features[:, 1]
+
+
+def fit_logistic(X: np.ndarray, y: np.ndarray, l2: float = 1e-2, iterations: int = 50):
+    """L2-regularized logistic regression by Newton/IRLS; returns (coef, intercept)."""
+    Xb = np.column_stack([X, np.ones(len(X))])
+    w = np.zeros(Xb.shape[1])
+    penalty = l2 * np.eye(Xb.shape[1])
+    penalty[-1, -1] = 0.0  # don't shrink the intercept
+    for _ in range(iterations):
+        p = 1.0 / (1.0 + np.exp(-Xb @ w))
+        gradient = Xb.T @ (p - y) + penalty @ w
+        hessian = (Xb * (p * (1 - p))[:, None]).T @ Xb + penalty
+        step = np.linalg.solve(hessian, gradient)
+        w -= step
+        if np.max(np.abs(step)) < 1e-8:
+            break
+    return w[:-1], float(w[-1])
+
+
+def fit_isotonic(x: np.ndarray, y: np.ndarray) -> tuple[np.ndarray, np.ndarray]:
+    """Monotone step fit (pool adjacent violators); returns (x knots, y values)."""
+    order = np.argsort(x, kind="stable")
+    x, y = x[order], y[order].astype(np.float64)
+    values, weights, starts = [], [], []
+    for i, target in enumerate(y):
+        values.append(target)
+        weights.append(1.0)
+        starts.append(i)
+        while len(values) > 1 and values[-2] >= values[-1]:
+            w = weights[-2] + weights[-1]
+            values[-2] = (values[-2] * weights[-2] + values[-1] * weights[-1]) / w
+            weights[-2] = w
+            values.pop()
+            weights.pop()
+            starts.pop()
+    # One knot at each block's lowest and highest x, so interp is a step fit
+    knots_x, knots_y = [], []
+    ends = starts[1:] + [len(x)]
+    for start, end, value in zip(starts, ends, values):
+        knots_x += [x[start], x[end - 1]]
+        knots_y += [value, value]
+    return np.array(knots_x), np.array(knots_y)
+
+
+class ConfidenceCalibrator:
+    """Turn retrieval scores into a confidence score, level and early-exit decision."""
+
+    def __init__(
+        self,
+        high: float = 0.85,
+        medium: float = 0.65,
+        escalate_below: Optional[float] = None,
+    ):
+        self.method = "legacy"
+        self.high = high
+        self.medium = medium
+        # Below this confidence the LLM is skipped and the user sent to /ask-human
+        self.escalate_below = escalate_below
+        self._coef: Optional[np.ndarray] = None
+        self._intercept = 0.0
+        self._knots: Optional[tuple[np.ndarray, np.ndarray]] = None
+        self.fitted_on: Optional[int] = None
+        self.early_exits = 0
+
+    def load(self, path: str) -> bool:
+        try:
+            with open(path) as f:
+                model = json.load(f)
+            method = model["method"]
+            if method == "logistic":
+                self._coef = np.array(model["coef"], dtype=np.float64)
+                self._intercept = float(model["intercept"])
+            elif method == "isotonic":
+                self._knots = (np.array(model["x"]), np.array(model["y"]))
+            else:
+                raise ValueError(f"unknown method {method!r}")
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("confidence_model_load_failed", path=path, error=str(e))
+            return False
+
+        thresholds = model.get("thresholds", {})
+        self.method = method
+        self.high = thresholds.get("high", self.high)
+        self.medium = thresholds.get("medium", self.medium)
+        if self.escalate_below is None:
+            self.escalate_below = thresholds.get("escalate")
+        self.fitted_on = model.get("samples")
+        logger.info("confidence_model_loaded", path=path, **self.stats())
+        return True
+
+    def predict(self, features: np.ndarray) -> np.ndarray:
+        if self.method == "logistic":
+            return 1.0 / (1.0 + np.exp(-(features @ self._coef + self._intercept)))
+        if self.method == "isotonic":
+            return np.interp(legacy_score(features), *self._knots)
+        return legacy_score(features)
+
+    def assess(self, docs: list[dict]) -> tuple[float, str]:
+        # Keyword-only hybrid hits have no similarity score and don't count
+        scores = np.fromiter((d["score"] for d in docs if "score" in d), dtype=np.float64)
+        if not len(scores):
+            return 0.0, "low"
+        confidence = float(self.predict(score_features(scores))[0])
+        if confidence >= self.high:
+            return confidence, "high"
+        if confidence >= self.medium:
+            return confidence, "medium"
+        return confidence, "low"
+
+    def should_escalate(self, confidence: float) -> bool:
+        return self.escalate_below is not None and confidence < self.escalate_below
+
+    def stats(self) -> dict:
+        return {
+            "method": self.method,
+            "high": self.high,
+            "medium": self.medium,
+            "escalate_below": self.escalate_below,
+            "fitted_on": self.fitted_on,
+            "early_exits": self.early_exits,
+        }
+
+
+_escalate_below = os.getenv("CONFIDENCE_ESCALATE_BELOW")
+CONFIDENCE_MODEL_PATH = os.getenv("CONFIDENCE_MODEL_PATH") or None
+
+calibrator = ConfidenceCalibrator(
+    escalate_below=float(_escalate_below) if _escalate_below else None,
+)
@@ -0,0 +1,194 @@
+"""Per-dependency circuit breakers and a global retry budget."""
+
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable
+
+import structlog
+
+logger = structlog.get_logger()
+
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class CircuitOpenError(Exception):
+    """Raised instead of calling a dependency whose breaker is open."""
+
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker.
+
+    closed    - calls pass; `failure_threshold` consecutive failures open it
+    open      - calls fail fast with CircuitOpenError for `reset_timeout` seconds
+    half_open - up to `half_open_max_calls` trial calls; one success closes
+                the breaker, one failure opens it again
+    """
+
+    def __init__(
+        self,
+        name: str,
+        failure_threshold: int = 5,
+        reset_timeout: float = 30.0,
+        half_open_max_calls: int = 1,
+    ):
+        self.name = name
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self.half_open_max_calls = half_open_max_calls
+
+        self._state = CLOSED
+        self._consecutive_failures = 0
+        self._opened_at = 0.0
+        self._half_open_calls = 0
+
+        self.failures_total = 0
+        self.rejected_total = 0
+
+    @property
+    def state(self) -> str:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.reset_timeout:
+            self._state = HALF_OPEN
+            self._half_open_calls = 0
+        return self._state
+
+    def allow(self) -> bool:
+        state = self.state
+        if state == CLOSED:
+            return True
+        if state == HALF_OPEN and self._half_open_calls < self.half_open_max_calls:
+            self._half_open_calls += 1
+            return True
+        self.rejected_total += 1
+        return False
+
+    def release(self):
+        """Give back a trial slot whose call ended without an outcome (cancelled)."""
+        if self._state == HALF_OPEN and self._half_open_calls > 0:
+            self._half_open_calls -= 1
+
+    def record_success(self):
+        if self._state != CLOSED:
+            logger.info("circuit_closed", breaker=self.name)
+        self._state = CLOSED
+        self._consecutive_failures = 0
+
+    def record_failure(self):
+        self.failures_total += 1
+        self._consecutive_failures += 1
+        if self._state == HALF_OPEN or self._consecutive_failures >= self.failure_threshold:
+            if self._state != OPEN:
+                logger.warning(
+                    "circuit_opened",
+                    breaker=self.name,
+                    consecutive_failures=self._consecutive_failures,
+                )
+            self._state = OPEN
+            self._opened_at = time.monotonic()
+
+    def stats(self) -> dict:
+        return {
+            "state": self.state,
+            "consecutive_failures": self._consecutive_failures,
+            "failures_total": self.failures_total,
+            "rejected_total": self.rejected_total,
+        }
+
+
+class RetryBudget:
+    """
+    Cap retries to a fraction of traffic.
+
+    Every first attempt deposits `ratio` tokens and every retry spends one, so
+    retries can never exceed `ratio` x requests (plus a small time-based floor
+    of `min_per_second` so low-traffic periods can still retry).
+    """
+
+    def __init__(self, ratio: float = 0.1, min_per_second: float = 0.5, max_tokens: float = 10.0):
+        self.ratio = ratio
+        self.min_per_second = min_per_second
+        self.max_tokens = max_tokens
+        self._tokens = max_tokens
+        self._refilled_at = time.monotonic()
+
+        self.retries_total = 0
+        self.exhausted_total = 0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(
+            self.max_tokens, self._tokens + (now - self._refilled_at) * self.min_per_second
+        )
+        self._refilled_at = now
+
+    def record_request(self):
+        self._refill()
+        self._tokens = min(self.max_tokens, self._tokens + self.ratio)
+
+    def try_spend(self) -> bool:
+        self._refill()
+        if self._tokens >= 1.0:
+            self._tokens -= 1.0
+            self.retries_total += 1
+            return True
+        self.exhausted_total += 1
+        return False
+
+    def stats(self) -> dict:
+        self._refill()
+        return {
+            "tokens": round(self._tokens, 2),
+            "retries_total": self.retries_total,
+            "exhausted_total": self.exhausted_total,
+        }
+
+
+_FAILURE_THRESHOLD = int(os.getenv("BREAKER_FAILURE_THRESHOLD", "5"))
+_RESET_SECONDS = float(os.getenv("BREAKER_RESET_SECONDS", "30"))
+
+breakers = {
+    name: CircuitBreaker(name, _FAILURE_THRESHOLD, _RESET_SECONDS)
+    for name in ("rag_backend", "supabase_rpc", "openai_embeddings", "openai_chat")
+}
+
+retry_budget = RetryBudget(
+    ratio=float(os.getenv("RETRY_BUDGET_RATIO", "0.1")),
+    min_per_second=float(os.getenv("RETRY_BUDGET_MIN_PER_SECOND", "0.5")),
+)
+
+
+async def call_with_breaker(
+    breaker: CircuitBreaker,
+    fn: Callable[[], Awaitable[Any]],
+    attempts: int = 1,
+    backoff: float = 0.5,
+) -> Any:
+    """
+    Call `fn` through `breaker`, retrying up to `attempts` times.
+
+    Retries need a token from the global retry budget; an open breaker fails
+    immediately with CircuitOpenError instead of waiting on a dead dependency.
+    """
+    retry_budget.record_request()
+    for attempt in range(1, attempts + 1):
+        if not breaker.allow():
+            raise CircuitOpenError(f"{breaker.name} circuit is open")
+        try:
+            result = await fn()
+        except asyncio.CancelledError:
+            # e.g. the losing side of a hedged request: neither success nor
+            # failure, but a half-open trial slot must not stay taken
+            breaker.release()
+            raise
+        except Exception as e:
+            breaker.record_failure()
+            if attempt == attempts or not retry_budget.try_spend():
+                raise
+            logger.info("retrying_call", breaker=breaker.name, attempt=attempt, error=str(e))
+            await asyncio.sleep(backoff * 2 ** (attempt - 1))
+        else:
+            breaker.record_success()
+            return result
@@ -0,0 +1,119 @@
+"""Fit retrieved documents into a fixed prompt-token budget."""
+
+import os
+import re
+from typing import Callable
+
+import structlog
+
+logger = structlog.get_logger()
+
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+|\n+")
+_WORDS = re.compile(r"\w+|[^\w\s]")
+
+
+def _load_tokenizer(model: str) -> Callable[[str], int]:
+    """tiktoken encoding for the chat model if available, else an estimate."""
+    try:
+        import tiktoken
+
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("o200k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception as e:
+        # Not installed, or the BPE file can't be downloaded: words and
+        # punctuation marks are roughly one token each
+        logger.warning("tokenizer_unavailable", model=model, error=str(e))
+        return lambda text: len(_WORDS.findall(text))
+
+
+# Same model as rag_client.CHAT_MODEL
+count_tokens = _load_tokenizer("gpt-4o-mini")
+
+# Token budget for the context documents section of the RAG prompt
+CONTEXT_TOKEN_BUDGET = int(os.getenv("CONTEXT_TOKEN_BUDGET", "1500"))
+
+
+def _shingles(text: str, size: int = 3) -> frozenset:
+    words = re.findall(r"\w+", text.lower())
+    if len(words) < size:
+        return frozenset([tuple(words)])
+    return frozenset(zip(*(words[i:] for i in range(size))))
+
+
+def split_sentences(text: str) -> list[str]:
+    return [s for s in _SENTENCE_END.split(text) if s.strip()]
+
+
+def _trim_to_budget(text: str, budget: int) -> tuple[str, int]:
+    """Longest prefix of whole sentences that fits in `budget` tokens."""
+    kept, used = [], 0
+    for sentence in split_sentences(text):
+        tokens = count_tokens(sentence) + 1
+        if used + tokens > budget:
+            break
+        kept.append(sentence)
+        used += tokens
+    return " ".join(kept), used
+
+
+def pack_context(
+    docs: list[dict],
+    token_budget: int,
+    block_overhead: int = 20,
+    dedupe_threshold: float = 0.8,
+    min_tokens: int = 30,
+) -> list[dict]:
+    """
+    Greedily pack docs, in the order given, into `token_budget` tokens.
+
+    `docs` are expected in retrieval order (reranked, fused or by
+    similarity) and keep it: packing only trims and drops. Docs whose
+    snippet is near-identical (word 3-gram Jaccard >= `dedupe_threshold`)
+    to an already packed one are skipped; a doc that doesn't fit is trimmed
+    at a sentence boundary, or dropped if less than `min_tokens` would be
+    left. `block_overhead` covers the per-document
+    header (title, source, score) in the prompt.
+    """
+    packed: list[dict] = []
+    seen: list[frozenset] = []
+    remaining = token_budget
+    dropped = duplicates = trimmed = 0
+
+    for doc in docs:
+        content = doc.get("snippet", doc.get("content", ""))
+        shingles = _shingles(content)
+        if any(len(shingles & s) >= dedupe_threshold * len(shingles | s) for s in seen):
+            duplicates += 1
+            continue
+
+        available = remaining - block_overhead - count_tokens(doc.get("title", ""))
+        tokens = count_tokens(content)
+        if tokens > available:
+            if available < min_tokens:
+                dropped += 1
+                continue
+            content, tokens = _trim_to_budget(content, available)
+            if tokens < min_tokens:
+                dropped += 1
+                continue
+            trimmed += 1
+            doc = dict(doc, snippet=content)
+
+        packed.append(doc)
+        seen.append(shingles)
+        remaining = available - tokens
+
+    if duplicates or dropped or trimmed:
+        logger.info(
+            "context_packed",
+            docs=len(docs),
+            packed=len(packed),
+            duplicates=duplicates,
+            trimmed=trimmed,
+            dropped=dropped,
+            tokens=token_budget - remaining,
+        )
+    return packed
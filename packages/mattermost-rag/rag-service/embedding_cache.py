@@ -0,0 +1,193 @@
+"""Query-embedding memo: float32 array storage, byte cap, LRU, optional mmap persistence."""
+
+import fcntl
+import hashlib
+import json
+import os
+from collections import OrderedDict
+from typing import Optional, Sequence
+
+import numpy as np
+import structlog
+
+from answer_cache import normalize_question
+
+logger = structlog.get_logger()
+
+_INDEX_FILE = "index.json"
+_VECTORS_FILE = "embeddings.f32"
+_FINGERPRINTS_FILE = "fingerprints.u64"
+_LOCK_FILE = "lock"
+
+
+def _fingerprint(key: tuple[str, str]) -> int:
+    digest = hashlib.sha256(f"{key[0]}\0{key[1]}".encode("utf-8")).digest()
+    return int.from_bytes(digest[:8], "little")
+
+
+class EmbeddingCache:
+    """
+    LRU memo of query embeddings keyed by (model, normalized text).
+
+    Vectors live in one preallocated float32 matrix sized from `max_bytes`, so
+    memory use is fixed and entries cost 4 bytes per dimension. When `path` is
+    set the matrix is a np.memmap under that directory and the key index is
+    written alongside it on `flush()`, so warm restarts keep the cache. Each
+    row also stores a fingerprint of its key, which lets a reload drop index
+    entries whose rows were reused after the last flush. Only one process may
+    own the directory; other workers fall back to an in-memory cache.
+    """
+
+    def __init__(
+        self,
+        dim: int = 1536,
+        max_bytes: int = 16 * 1024 * 1024,
+        path: Optional[str] = None,
+        flush_every: int = 100,
+    ):
+        self.dim = dim
+        self.capacity = max(1, max_bytes // (dim * 4))
+        self.path = path
+        self.flush_every = flush_every
+
+        self._rows: OrderedDict[tuple[str, str], int] = OrderedDict()
+        self._free_rows = list(range(self.capacity - 1, -1, -1))
+        self._dirty = 0
+
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+        self._lock_file = None
+        if path and self._acquire(path):
+            self._open(path)
+        else:
+            self.path = None
+            self._vectors = np.zeros((self.capacity, dim), dtype=np.float32)
+            self._fingerprints = np.zeros(self.capacity, dtype=np.uint64)
+
+    # ---------- public API ----------
+
+    def get(self, model: str, text: str) -> Optional[list[float]]:
+        key = (model, normalize_question(text))
+        row = self._rows.get(key)
+        if row is None:
+            self.misses += 1
+            return None
+        self._rows.move_to_end(key)
+        self.hits += 1
+        return self._vectors[row].tolist()
+
+    def put(self, model: str, text: str, embedding: Sequence[float]):
+        if len(embedding) != self.dim:
+            logger.warning("embedding_dim_mismatch", expected=self.dim, got=len(embedding))
+            return
+
+        key = (model, normalize_question(text))
+        row = self._rows.pop(key, None)
+        if row is None:
+            if not self._free_rows:
+                _, row = self._rows.popitem(last=False)
+                self.evictions += 1
+            else:
+                row = self._free_rows.pop()
+
+        self._vectors[row] = np.asarray(embedding, dtype=np.float32)
+        self._fingerprints[row] = _fingerprint(key)
+        self._rows[key] = row
+
+        self._dirty += 1
+        if self.path and self._dirty >= self.flush_every:
+            self.flush()
+
+    def flush(self):
+        """Persist vectors and the LRU-ordered key index (no-op without `path`)."""
+        if not self.path or not self._dirty:
+            return
+        self._vectors.flush()
+        self._fingerprints.flush()
+
+        index = {
+            "dim": self.dim,
+            "capacity": self.capacity,
+            "entries": [[model, text, row] for (model, text), row in self._rows.items()],
+        }
+        tmp_path = os.path.join(self.path, _INDEX_FILE + ".tmp")
+        with open(tmp_path, "w") as f:
+            json.dump(index, f)
+        os.replace(tmp_path, os.path.join(self.path, _INDEX_FILE))
+        self._dirty = 0
+
+    def stats(self) -> dict:
+        lookups = self.hits + self.misses
+        return {
+            "entries": len(self._rows),
+            "capacity": self.capacity,
+            "bytes": int(self._vectors.nbytes),
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_ratio": round(self.hits / lookups, 3) if lookups else 0.0,
+            "evictions": self.evictions,
+            "persistent": bool(self.path),
+        }
+
+    # ---------- persistence ----------
+
+    def _acquire(self, path: str) -> bool:
+        os.makedirs(path, exist_ok=True)
+        lock_file = open(os.path.join(path, _LOCK_FILE), "w")
+        try:
+            fcntl.flock(lock_file, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except OSError:
+            lock_file.close()
+            logger.info("embedding_cache_in_memory", reason="path owned by another worker")
+            return False
+        self._lock_file = lock_file
+        return True
+
+    def _open(self, path: str):
+        vectors_path = os.path.join(path, _VECTORS_FILE)
+        fingerprints_path = os.path.join(path, _FINGERPRINTS_FILE)
+        index = self._read_index(os.path.join(path, _INDEX_FILE))
+
+        reuse = (
+            index is not None
+            and index.get("dim") == self.dim
+            and index.get("capacity") == self.capacity
+            and os.path.exists(vectors_path)
+            and os.path.exists(fingerprints_path)
+        )
+        mode = "r+" if reuse else "w+"
+        self._vectors = np.memmap(
+            vectors_path, dtype=np.float32, mode=mode, shape=(self.capacity, self.dim)
+        )
+        self._fingerprints = np.memmap(
+            fingerprints_path, dtype=np.uint64, mode=mode, shape=(self.capacity,)
+        )
+        if not reuse:
+            return
+
+        used = set()
+        for model, text, row in index.get("entries", []):
+            key = (model, text)
+            if 0 <= row < self.capacity and row not in used:
+                if int(self._fingerprints[row]) == _fingerprint(key):
+                    self._rows[key] = row
+                    used.add(row)
+        self._free_rows = [r for r in range(self.capacity - 1, -1, -1) if r not in used]
+        logger.info("embedding_cache_loaded", entries=len(self._rows), path=path)
+
+    @staticmethod
+    def _read_index(index_path: str) -> Optional[dict]:
+        try:
+            with open(index_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+
+embedding_cache = EmbeddingCache(
+    dim=int(os.getenv("EMBEDDING_DIM", "1536")),
+    max_bytes=int(os.getenv("EMBEDDING_CACHE_MAX_BYTES", str(16 * 1024 * 1024))),
+    path=os.getenv("EMBEDDING_CACHE_PATH") or None,
+)
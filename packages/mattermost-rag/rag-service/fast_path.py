@@ -0,0 +1,123 @@
+"""Extractive answers straight from the top hit, skipping the LLM for FAQ-style questions."""
+
+import json
+import os
+from fnmatch import fnmatch
+from typing import Optional
+
+import numpy as np
+import structlog
+
+from calibration import calibrator
+from context_packer import split_sentences
+from lexical_index import lexical_index, tokenize
+
+logger = structlog.get_logger()
+
+DEFAULT_SETTINGS = {
+    "enabled": True,
+    # Calibrated confidence (see calibration.py) required to skip the LLM
+    "min_confidence": 0.9,
+    # Similarity of the top hit, and its lead over the runner-up
+    "min_score": 0.88,
+    "min_gap": 0.05,
+    "max_sentences": 3,
+}
+
+
+class ExtractiveFastPath:
+    """
+    Answer from the best-matching sentences of a single dominant hit.
+
+    Settings are per domain: `domains` maps title glob patterns (matched
+    against the top hit's title, e.g. "*FAQ*") to overrides of the defaults;
+    the first matching pattern wins.
+    """
+
+    def __init__(self, enabled: bool = False, domains: Optional[dict] = None, **defaults):
+        self.enabled = enabled
+        self.defaults = dict(DEFAULT_SETTINGS, **defaults)
+        self.domains = domains or {}
+        self.answers = 0
+        self.declined = 0
+
+    def settings_for(self, title: str) -> dict:
+        for pattern, overrides in self.domains.items():
+            if fnmatch(title.lower(), pattern.lower()):
+                return dict(self.defaults, **overrides)
+        return self.defaults
+
+    def select_sentences(self, question: str, text: str, limit: int) -> list[str]:
+        """Up to `limit` sentences sharing the most IDF-weighted query terms, in text order."""
+        query = list(dict.fromkeys(tokenize(question)))
+        sentences = split_sentences(text)
+        if not query or not sentences:
+            return []
+        idf = lexical_index.idf(query)
+        columns = {t: i for i, t in enumerate(query)}
+        matches = np.zeros((len(sentences), len(query)), dtype=np.float32)
+        for row, sentence in enumerate(sentences):
+            for token in tokenize(sentence):
+                col = columns.get(token)
+                if col is not None:
+                    matches[row, col] = 1.0
+        scores = matches @ idf
+        best = np.argsort(-scores, kind="stable")[:limit]
+        return [sentences[i].strip() for i in sorted(best) if scores[i] > 0]
+
+    def answer(self, question: str, docs: list[dict]) -> Optional[tuple[str, float, str]]:
+        """(answer, confidence_score, confidence_level), or None to use the LLM."""
+        if not self.enabled or not docs:
+            return None
+        ranked = sorted(docs, key=lambda d: d.get("score", 0.0), reverse=True)
+        top = ranked[0]
+        settings = self.settings_for(top.get("title", ""))
+        if not settings["enabled"]:
+            return None
+
+        confidence, level = calibrator.assess(docs)
+        gap = top.get("score", 0.0) - (ranked[1].get("score", 0.0) if len(ranked) > 1 else 0.0)
+        if (
+            confidence < settings["min_confidence"]
+            or top.get("score", 0.0) < settings["min_score"]
+            or gap < settings["min_gap"]
+        ):
+            return None
+
+        sentences = self.select_sentences(
+            question, top.get("snippet", ""), settings["max_sentences"]
+        )
+        if not sentences:
+            self.declined += 1
+            return None
+
+        self.answers += 1
+        logger.info(
+            "fast_path_answer",
+            question=question[:100],
+            title=top.get("title"),
+            score=round(top.get("score", 0.0), 3),
+            confidence=round(confidence, 3),
+            sentences=len(sentences),
+        )
+        answer = "\n".join(f"> {s}" for s in sentences)
+        answer += "\n\n[source: Document 1]\n\n_Quoted from the top source without AI synthesis._"
+        return answer, confidence, level
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "domains": len(self.domains),
+            "answers": self.answers,
+            "declined": self.declined,
+        }
+
+
+fast_path = ExtractiveFastPath(
+    enabled=os.getenv("FAST_PATH_ENABLED", "false").lower() == "true",
+    domains=json.loads(os.getenv("FAST_PATH_DOMAINS") or "{}"),
+    min_confidence=float(os.getenv("FAST_PATH_MIN_CONFIDENCE", "0.9")),
+    min_score=float(os.getenv("FAST_PATH_MIN_SCORE", "0.88")),
+    min_gap=float(os.getenv("FAST_PATH_MIN_GAP", "0.05")),
+    max_sentences=int(os.getenv("FAST_PATH_MAX_SENTENCES", "3")),
+)
@@ -0,0 +1,136 @@
+"""
+Fit the confidence calibration model from rated RAG queries.
+
+Reads opex.rag_queries rows that have a rating (written by the rag-feedback
+function) and the per-hit retrieval scores of the answer, fits P(helpful |
+retrieval scores) and writes the JSON model loaded via CONFIDENCE_MODEL_PATH:
+
+    SUPABASE_URL=... SUPABASE_SERVICE_ROLE_KEY=... \\
+        python fit_confidence.py --method logistic --out confidence_model.json
+
+Retrieval scores are taken from metadata.retrieval_scores (written for every
+answer by the rag-service, see query_log.py) or evaluation_metadata.
+retrieval_scores, falling back to the `score` of each citation. Ratings are
+the `rating` column (packages/db/migrations/002 carries over the legacy
+`feedback_rating`). `--input rows.jsonl` fits from an exported file instead.
+"""
+
+import argparse
+import json
+import os
+import sys
+from datetime import datetime, timezone
+
+import numpy as np
+
+from calibration import FEATURES, fit_isotonic, fit_logistic, legacy_score, score_features
+
+
+def fetch_rows(page: int = 1000) -> list[dict]:
+    from supabase import create_client
+    from supabase.lib.client_options import ClientOptions
+
+    client = create_client(
+        os.environ["SUPABASE_URL"],
+        os.environ["SUPABASE_SERVICE_ROLE_KEY"],
+        options=ClientOptions(schema="opex"),
+    )
+    rows, offset = [], 0
+    while True:
+        result = (
+            client.table("rag_queries")
+            .select("id, rating, metadata, evaluation_metadata, citations")
+            .not_.is_("rating", "null")
+            .order("id")
+            .range(offset, offset + page - 1)
+            .execute()
+        )
+        rows.extend(result.data)
+        if len(result.data) < page:
+            return rows
+        offset += page
+
+
+def retrieval_scores(row: dict) -> list[float]:
+    for column in ("metadata", "evaluation_metadata"):
+        scores = (row.get(column) or {}).get("retrieval_scores")
+        if scores:
+            return [float(s) for s in scores]
+    return [float(c["score"]) for c in row.get("citations") or [] if isinstance(c, dict) and "score" in c]
+
+
+def build_dataset(rows: list[dict], helpful_min: int) -> tuple[np.ndarray, np.ndarray]:
+    usable = [(retrieval_scores(r), r["rating"]) for r in rows]
+    usable = [(s, rating) for s, rating in usable if s]
+    if not usable:
+        return np.empty((0, len(FEATURES))), np.empty(0)
+    width = max(len(s) for s, _ in usable)
+    scores = np.full((len(usable), width), np.nan)
+    for i, (s, _) in enumerate(usable):
+        scores[i, : len(s)] = s
+    labels = np.array([rating >= helpful_min for _, rating in usable], dtype=np.float64)
+    return score_features(scores), labels
+
+
+def brier(p: np.ndarray, y: np.ndarray) -> float:
+    return float(np.mean((p - y) ** 2))
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("--method", choices=("logistic", "isotonic"), default="logistic")
+    parser.add_argument("--input", help="JSON lines export of rag_queries rows")
+    parser.add_argument("--out", default="confidence_model.json")
+    parser.add_argument("--helpful-min", type=int, default=4, help="rating counted as helpful")
+    parser.add_argument("--high", type=float, default=0.8, help="P(helpful) for 'high'")
+    parser.add_argument("--medium", type=float, default=0.5, help="P(helpful) for 'medium'")
+    parser.add_argument(
+        "--escalate", type=float, default=0.15, help="skip the LLM below this P(helpful)"
+    )
+    parser.add_argument("--min-samples", type=int, default=50)
+    parser.add_argument("--holdout", type=float, default=0.2)
+    args = parser.parse_args()
+
+    if args.input:
+        with open(args.input) as f:
+            rows = [json.loads(line) for line in f if line.strip()]
+    else:
+        rows = fetch_rows()
+    X, y = build_dataset(rows, args.helpful_min)
+    print(f"{len(rows)} rated queries, {len(y)} with retrieval scores, {int(y.sum())} helpful")
+    if len(y) < args.min_samples or y.min() == y.max():
+        sys.exit(f"❌ Need at least {args.min_samples} rated queries with both outcomes")
+
+    # Report held-out Brier scores before fitting on everything
+    rng = np.random.default_rng(0)
+    test = rng.random(len(y)) < args.holdout
+    if test.any() and (~test).any():
+        legacy = brier(legacy_score(X[test]), y[test])
+        if args.method == "logistic":
+            coef, intercept = fit_logistic(X[~test], y[~test])
+            fitted = 1.0 / (1.0 + np.exp(-(X[test] @ coef + intercept)))
+        else:
+            fitted = np.interp(legacy_score(X[test]), *fit_isotonic(legacy_score(X[~test]), y[~test]))
+        print(f"Held-out Brier score: legacy {legacy:.4f} → {args.method} {brier(fitted, y[test]):.4f}")
+
+    model = {
+        "method": args.method,
+        "features": list(FEATURES),
+        "thresholds": {"high": args.high, "medium": args.medium, "escalate": args.escalate},
+        "samples": int(len(y)),
+        "fitted_at": datetime.now(timezone.utc).isoformat(),
+    }
+    if args.method == "logistic":
+        coef, intercept = fit_logistic(X, y)
+        model.update(coef=coef.tolist(), intercept=intercept)
+    else:
+        knots_x, knots_y = fit_isotonic(legacy_score(X), y)
+        model.update(x=knots_x.tolist(), y=knots_y.tolist())
+
+    with open(args.out, "w") as f:
+        json.dump(model, f, indent=2)
+    print(f"✅ Wrote {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,156 @@
+"""Shared pooled HTTP client for outbound calls (Mattermost API, webhooks)."""
+
+import os
+import time
+from typing import Optional
+from urllib.parse import urlsplit
+
+import httpx
+import structlog
+
+logger = structlog.get_logger()
+
+
+def _parse_host_timeouts(raw: str) -> dict[str, float]:
+    """Parse "host=seconds,host=seconds" into a lookup table."""
+    timeouts = {}
+    for item in raw.split(","):
+        host, _, seconds = item.strip().partition("=")
+        if host and seconds:
+            try:
+                timeouts[host.strip().lower()] = float(seconds)
+            except ValueError:
+                logger.warning("invalid_host_timeout", entry=item)
+    return timeouts
+
+
+class HTTPPool:
+    """
+    Lifecycle-managed httpx.AsyncClient shared by the whole service.
+
+    One client (and therefore one connection pool) is created at app startup
+    and closed on shutdown, so repeated calls to the same host reuse warm
+    keep-alive / HTTP/2 connections instead of paying a fresh TCP+TLS
+    handshake every time.
+    """
+
+    def __init__(self):
+        self.max_connections = int(os.getenv("HTTP_MAX_CONNECTIONS", "100"))
+        self.max_keepalive = int(os.getenv("HTTP_MAX_KEEPALIVE", "20"))
+        self.keepalive_expiry = float(os.getenv("HTTP_KEEPALIVE_EXPIRY", "30"))
+        self.pool_timeout = float(os.getenv("HTTP_POOL_TIMEOUT", "5"))
+        self.default_timeout = float(os.getenv("HTTP_DEFAULT_TIMEOUT", "10"))
+        self.http2 = os.getenv("HTTP2_ENABLED", "true").lower() == "true"
+        self.host_timeouts = _parse_host_timeouts(os.getenv("HTTP_HOST_TIMEOUTS", ""))
+
+        self._client: Optional[httpx.AsyncClient] = None
+
+        # Saturation metrics
+        self.in_flight = 0
+        self.peak_in_flight = 0
+        self.requests_total = 0
+        self.errors_total = 0
+        self.pool_timeouts_total = 0
+        self.total_request_seconds = 0.0
+
+    async def start(self):
+        """Create the shared client. Safe to call more than once."""
+        if self._client is not None:
+            return
+
+        http2 = self.http2
+        if http2:
+            try:
+                import h2  # noqa: F401
+            except ImportError:
+                logger.warning("http2_unavailable", reason="h2 package not installed")
+                http2 = False
+
+        self._client = httpx.AsyncClient(
+            http2=http2,
+            limits=httpx.Limits(
+                max_connections=self.max_connections,
+                max_keepalive_connections=self.max_keepalive,
+                keepalive_expiry=self.keepalive_expiry,
+            ),
+            timeout=httpx.Timeout(self.default_timeout, pool=self.pool_timeout),
+        )
+        logger.info(
+            "http_pool_started",
+            http2=http2,
+            max_connections=self.max_connections,
+            max_keepalive=self.max_keepalive,
+        )
+
+    async def close(self):
+        """Close the shared client and release all pooled connections."""
+        if self._client is None:
+            return
+        await self._client.aclose()
+        self._client = None
+        logger.info("http_pool_closed", requests_total=self.requests_total)
+
+    def _timeout_for(self, url: str, timeout: Optional[float]) -> httpx.Timeout:
+        """Resolve the timeout for a request: host override > call default > pool default."""
+        host = (urlsplit(url).hostname or "").lower()
+        seconds = self.host_timeouts.get(host)
+        if seconds is None:
+            seconds = timeout if timeout is not None else self.default_timeout
+        return httpx.Timeout(seconds, pool=self.pool_timeout)
+
+    async def request(
+        self, method: str, url: str, timeout: Optional[float] = None, **kwargs
+    ) -> httpx.Response:
+        """Send a request through the shared pool."""
+        if self._client is None:
+            await self.start()
+
+        self.in_flight += 1
+        self.peak_in_flight = max(self.peak_in_flight, self.in_flight)
+        self.requests_total += 1
+        started = time.perf_counter()
+        try:
+            return await self._client.request(
+                method, url, timeout=self._timeout_for(url, timeout), **kwargs
+            )
+        except httpx.PoolTimeout:
+            self.pool_timeouts_total += 1
+            self.errors_total += 1
+            logger.warning("http_pool_exhausted", url=url, in_flight=self.in_flight)
+            raise
+        except httpx.HTTPError:
+            self.errors_total += 1
+            raise
+        finally:
+            self.in_flight -= 1
+            self.total_request_seconds += time.perf_counter() - started
+
+    async def post(self, url: str, timeout: Optional[float] = None, **kwargs) -> httpx.Response:
+        return await self.request("POST", url, timeout=timeout, **kwargs)
+
+    async def put(self, url: str, timeout: Optional[float] = None, **kwargs) -> httpx.Response:
+        return await self.request("PUT", url, timeout=timeout, **kwargs)
+
+    def stats(self) -> dict:
+        """Pool saturation snapshot for /health."""
+        return {
+            "started": self._client is not None,
+            "in_flight": self.in_flight,
+            "peak_in_flight": self.peak_in_flight,
+            "max_connections": self.max_connections,
+            "saturation": round(self.in_flight / self.max_connections, 3)
+            if self.max_connections
+            else 0.0,
+            "requests_total": self.requests_total,
+            "errors_total": self.errors_total,
+            "pool_timeouts_total": self.pool_timeouts_total,
+            "avg_request_ms": round(
+                1000 * self.total_request_seconds / self.requests_total, 1
+            )
+            if self.requests_total
+            else 0.0,
+        }
+
+
+# Singleton instance
+http_pool = HTTPPool()
@@ -0,0 +1,549 @@
+"""Durable work queue for /ask processing (SQLite or Postgres table) + worker pool."""
+
+import asyncio
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import time
+import uuid
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Awaitable, Callable, Optional
+
+import structlog
+
+from answer_cache import normalize_question
+
+logger = structlog.get_logger()
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+DEAD = "dead"
+
+
+@dataclass
+class Job:
+    id: str
+    payload: dict
+    attempts: int
+    enqueued_at: float
+    # Identifies this claim; updates from a worker whose lease expired (and
+    # the job was re-claimed) match no row
+    claim_token: str
+
+
+def idempotency_key(user_id: str, channel_id: str, text: str, bucket_seconds: int = 60) -> str:
+    """Same user + channel + question within one time bucket maps to one job."""
+    bucket = int(time.time() // bucket_seconds)
+    raw = f"{user_id}\0{channel_id}\0{normalize_question(text)}\0{bucket}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class JobQueue(ABC):
+    """
+    Queue interface.
+
+    Jobs are claimed with a visibility timeout: a claimed job that is neither
+    completed nor failed before the timeout (worker crash, deploy) becomes
+    claimable again. Failed jobs are retried with backoff until
+    `max_attempts`, then dead-lettered (status "dead", last error kept).
+
+    Every claim gets a fresh token; `extend`, `complete` and `fail` only
+    apply while the caller's token is still current and return False
+    otherwise. Workers extend the lease while a job runs, so long answers
+    are not re-claimed mid-flight.
+    """
+
+    def __init__(
+        self,
+        visibility_timeout: float = 120.0,
+        max_attempts: int = 3,
+        retry_backoff: float = 5.0,
+        retention: float = 86400.0,
+    ):
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_backoff = retry_backoff
+        # Done jobs older than this (seconds) are purged; 0 keeps them
+        self.retention = retention
+
+    @abstractmethod
+    async def setup(self):
+        """Create the jobs table if needed."""
+
+    @abstractmethod
+    async def enqueue(self, payload: dict, key: str) -> tuple[str, bool]:
+        """Insert a job unless `key` already exists. Returns (job_id, created)."""
+
+    @abstractmethod
+    async def claim(self) -> Optional[Job]:
+        """Take the next visible job (None if there is none)."""
+
+    @abstractmethod
+    async def extend(self, job: Job) -> bool:
+        """Push a running job's visibility timeout out by another full period."""
+
+    @abstractmethod
+    async def complete(self, job: Job) -> bool:
+        """Mark a claimed job done."""
+
+    @abstractmethod
+    async def fail(self, job: Job, error: str) -> bool:
+        """Requeue a claimed job with backoff, or dead-letter it after max_attempts."""
+
+    @abstractmethod
+    async def purge(self) -> int:
+        """Delete done jobs finished more than `retention` seconds ago; returns the count."""
+
+    @abstractmethod
+    async def depth(self) -> dict[str, int]:
+        """Job counts by status (queued / running / done / dead)."""
+
+    async def close(self):
+        pass
+
+
+class SQLiteJobQueue(JobQueue):
+    """Single-host backend: a WAL-mode SQLite file shared by worker processes."""
+
+    def __init__(self, path: str, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path
+
+    def _connect(self) -> sqlite3.Connection:
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA busy_timeout=30000")
+        return conn
+
+    def _run(self, fn):
+        conn = self._connect()
+        try:
+            return fn(conn)
+        finally:
+            conn.close()
+
+    async def setup(self):
+        def create(conn):
+            conn.executescript(
+                """
+                CREATE TABLE IF NOT EXISTS rag_jobs (
+                    id TEXT PRIMARY KEY,
+                    idempotency_key TEXT NOT NULL UNIQUE,
+                    payload TEXT NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    visible_at REAL NOT NULL,
+                    enqueued_at REAL NOT NULL,
+                    last_error TEXT,
+                    claim_token TEXT,
+                    finished_at REAL
+                );
+                CREATE INDEX IF NOT EXISTS idx_rag_jobs_claim ON rag_jobs(status, visible_at);
+                """
+            )
+            columns = {row[1] for row in conn.execute("PRAGMA table_info(rag_jobs)")}
+            if "claim_token" not in columns:
+                conn.execute("ALTER TABLE rag_jobs ADD COLUMN claim_token TEXT")
+            if "finished_at" not in columns:
+                conn.execute("ALTER TABLE rag_jobs ADD COLUMN finished_at REAL")
+
+        await asyncio.to_thread(self._run, create)
+
+    async def enqueue(self, payload: dict, key: str) -> tuple[str, bool]:
+        def insert(conn):
+            now = time.time()
+            job_id = uuid.uuid4().hex
+            cursor = conn.execute(
+                "INSERT OR IGNORE INTO rag_jobs (id, idempotency_key, payload, visible_at, enqueued_at) "
+                "VALUES (?, ?, ?, ?, ?)",
+                (job_id, key, json.dumps(payload), now, now),
+            )
+            if cursor.rowcount:
+                return job_id, True
+            row = conn.execute(
+                "SELECT id FROM rag_jobs WHERE idempotency_key = ?", (key,)
+            ).fetchone()
+            return row[0], False
+
+        return await asyncio.to_thread(self._run, insert)
+
+    async def claim(self) -> Optional[Job]:
+        def take(conn):
+            now = time.time()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                row = conn.execute(
+                    "SELECT id, payload, attempts, enqueued_at FROM rag_jobs "
+                    "WHERE status IN ('queued', 'running') AND visible_at <= ? "
+                    "ORDER BY visible_at LIMIT 1",
+                    (now,),
+                ).fetchone()
+                if row is None:
+                    conn.execute("COMMIT")
+                    return None
+                token = uuid.uuid4().hex
+                conn.execute(
+                    "UPDATE rag_jobs SET status = 'running', attempts = attempts + 1, "
+                    "visible_at = ?, claim_token = ? WHERE id = ?",
+                    (now + self.visibility_timeout, token, row[0]),
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            return Job(
+                id=row[0],
+                payload=json.loads(row[1]),
+                attempts=row[2] + 1,
+                enqueued_at=row[3],
+                claim_token=token,
+            )
+
+        return await asyncio.to_thread(self._run, take)
+
+    async def extend(self, job: Job) -> bool:
+        cursor = await asyncio.to_thread(
+            self._run,
+            lambda conn: conn.execute(
+                "UPDATE rag_jobs SET visible_at = ? "
+                "WHERE id = ? AND claim_token = ? AND status = 'running'",
+                (time.time() + self.visibility_timeout, job.id, job.claim_token),
+            ),
+        )
+        return cursor.rowcount > 0
+
+    async def complete(self, job: Job) -> bool:
+        cursor = await asyncio.to_thread(
+            self._run,
+            lambda conn: conn.execute(
+                "UPDATE rag_jobs SET status = 'done', last_error = NULL, finished_at = ? "
+                "WHERE id = ? AND claim_token = ?",
+                (time.time(), job.id, job.claim_token),
+            ),
+        )
+        return cursor.rowcount > 0
+
+    async def fail(self, job: Job, error: str) -> bool:
+        dead = job.attempts >= self.max_attempts
+        visible_at = time.time() + self.retry_backoff * 2 ** (job.attempts - 1)
+        cursor = await asyncio.to_thread(
+            self._run,
+            lambda conn: conn.execute(
+                "UPDATE rag_jobs SET status = ?, visible_at = ?, last_error = ? "
+                "WHERE id = ? AND claim_token = ?",
+                (DEAD if dead else QUEUED, visible_at, error[:1000], job.id, job.claim_token),
+            ),
+        )
+        return cursor.rowcount > 0
+
+    async def purge(self) -> int:
+        cursor = await asyncio.to_thread(
+            self._run,
+            lambda conn: conn.execute(
+                "DELETE FROM rag_jobs WHERE status = 'done' AND finished_at < ?",
+                (time.time() - self.retention,),
+            ),
+        )
+        return cursor.rowcount
+
+    async def depth(self) -> dict[str, int]:
+        rows = await asyncio.to_thread(
+            self._run,
+            lambda conn: conn.execute(
+                "SELECT status, COUNT(*) FROM rag_jobs GROUP BY status"
+            ).fetchall(),
+        )
+        return {status: count for status, count in rows}
+
+
+class PostgresJobQueue(JobQueue):
+    """
+    Multi-host backend: a Postgres table claimed with FOR UPDATE SKIP LOCKED.
+
+    Requires the optional `psycopg[binary,pool]` package.
+    """
+
+    def __init__(self, dsn: str, **kwargs):
+        super().__init__(**kwargs)
+        self.dsn = dsn
+        self._pool = None
+
+    async def setup(self):
+        try:
+            from psycopg_pool import AsyncConnectionPool
+        except ImportError as e:
+            raise RuntimeError(
+                "JOB_QUEUE_BACKEND=postgres requires psycopg: pip install 'psycopg[binary,pool]'"
+            ) from e
+
+        self._pool = AsyncConnectionPool(self.dsn, min_size=1, max_size=4, open=False)
+        await self._pool.open()
+        async with self._pool.connection() as conn:
+            await conn.execute(
+                """
+                CREATE TABLE IF NOT EXISTS rag_jobs (
+                    id UUID PRIMARY KEY,
+                    idempotency_key TEXT NOT NULL UNIQUE,
+                    payload JSONB NOT NULL,
+                    status TEXT NOT NULL DEFAULT 'queued',
+                    attempts INT NOT NULL DEFAULT 0,
+                    visible_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                    enqueued_at TIMESTAMPTZ NOT NULL DEFAULT NOW(),
+                    last_error TEXT,
+                    claim_token UUID,
+                    finished_at TIMESTAMPTZ
+                )
+                """
+            )
+            await conn.execute("ALTER TABLE rag_jobs ADD COLUMN IF NOT EXISTS claim_token UUID")
+            await conn.execute(
+                "ALTER TABLE rag_jobs ADD COLUMN IF NOT EXISTS finished_at TIMESTAMPTZ"
+            )
+            await conn.execute(
+                "CREATE INDEX IF NOT EXISTS idx_rag_jobs_claim ON rag_jobs(status, visible_at)"
+            )
+
+    async def enqueue(self, payload: dict, key: str) -> tuple[str, bool]:
+        async with self._pool.connection() as conn:
+            cursor = await conn.execute(
+                "INSERT INTO rag_jobs (id, idempotency_key, payload) VALUES (%s, %s, %s) "
+                "ON CONFLICT (idempotency_key) DO NOTHING RETURNING id",
+                (uuid.uuid4(), key, json.dumps(payload)),
+            )
+            row = await cursor.fetchone()
+            if row:
+                return str(row[0]), True
+            cursor = await conn.execute(
+                "SELECT id FROM rag_jobs WHERE idempotency_key = %s", (key,)
+            )
+            return str((await cursor.fetchone())[0]), False
+
+    async def claim(self) -> Optional[Job]:
+        async with self._pool.connection() as conn:
+            cursor = await conn.execute(
+                """
+                UPDATE rag_jobs SET status = 'running', attempts = attempts + 1,
+                    visible_at = NOW() + make_interval(secs => %s), claim_token = %s
+                WHERE id = (
+                    SELECT id FROM rag_jobs
+                    WHERE status IN ('queued', 'running') AND visible_at <= NOW()
+                    ORDER BY visible_at
+                    FOR UPDATE SKIP LOCKED
+                    LIMIT 1
+                )
+                RETURNING id, payload, attempts, EXTRACT(EPOCH FROM enqueued_at), claim_token
+                """,
+                (self.visibility_timeout, uuid.uuid4()),
+            )
+            row = await cursor.fetchone()
+        if row is None:
+            return None
+        payload = row[1] if isinstance(row[1], dict) else json.loads(row[1])
+        return Job(
+            id=str(row[0]),
+            payload=payload,
+            attempts=row[2],
+            enqueued_at=float(row[3]),
+            claim_token=str(row[4]),
+        )
+
+    async def extend(self, job: Job) -> bool:
+        async with self._pool.connection() as conn:
+            cursor = await conn.execute(
+                "UPDATE rag_jobs SET visible_at = NOW() + make_interval(secs => %s) "
+                "WHERE id = %s AND claim_token = %s AND status = 'running'",
+                (self.visibility_timeout, job.id, job.claim_token),
+            )
+            return cursor.rowcount > 0
+
+    async def complete(self, job: Job) -> bool:
+        async with self._pool.connection() as conn:
+            cursor = await conn.execute(
+                "UPDATE rag_jobs SET status = 'done', last_error = NULL, finished_at = NOW() "
+                "WHERE id = %s AND claim_token = %s",
+                (job.id, job.claim_token),
+            )
+            return cursor.rowcount > 0
+
+    async def fail(self, job: Job, error: str) -> bool:
+        dead = job.attempts >= self.max_attempts
+        async with self._pool.connection() as conn:
+            cursor = await conn.execute(
+                "UPDATE rag_jobs SET status = %s, last_error = %s, "
+                "visible_at = NOW() + make_interval(secs => %s) "
+                "WHERE id = %s AND claim_token = %s",
+                (
+                    DEAD if dead else QUEUED,
+                    error[:1000],
+                    self.retry_backoff * 2 ** (job.attempts - 1),
+                    job.id,
+                    job.claim_token,
+                ),
+            )
+            return cursor.rowcount > 0
+
+    async def purge(self) -> int:
+        async with self._pool.connection() as conn:
+            cursor = await conn.execute(
+                "DELETE FROM rag_jobs WHERE status = 'done' "
+                "AND finished_at < NOW() - make_interval(secs => %s)",
+                (self.retention,),
+            )
+            return cursor.rowcount
+
+    async def depth(self) -> dict[str, int]:
+        async with self._pool.connection() as conn:
+            cursor = await conn.execute("SELECT status, COUNT(*) FROM rag_jobs GROUP BY status")
+            return {status: count for status, count in await cursor.fetchall()}
+
+    async def close(self):
+        if self._pool is not None:
+            await self._pool.close()
+
+
+class WorkerPool:
+    """`concurrency` asyncio workers claiming jobs from a JobQueue."""
+
+    def __init__(
+        self,
+        queue: JobQueue,
+        handler: Callable[[Job], Awaitable[None]],
+        concurrency: int = 4,
+        poll_interval: float = 0.5,
+        purge_interval: float = 600.0,
+    ):
+        self.queue = queue
+        self.handler = handler
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.purge_interval = purge_interval
+        self._purged_at = 0.0
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+
+        self._tasks: list[asyncio.Task] = []
+        self.busy = 0
+        self.processed_total = 0
+        self.failed_total = 0
+        self.last_depth: dict[str, int] = {}
+
+    async def start(self):
+        self._tasks = [
+            asyncio.create_task(self._work(i)) for i in range(self.concurrency)
+        ]
+        logger.info("job_workers_started", worker=self.worker_id, concurrency=self.concurrency)
+
+    async def stop(self):
+        for task in self._tasks:
+            task.cancel()
+        await asyncio.gather(*self._tasks, return_exceptions=True)
+        self._tasks = []
+
+    async def _work(self, index: int):
+        while True:
+            try:
+                job = await self.queue.claim()
+            except Exception as e:
+                logger.warning("job_claim_failed", error=str(e))
+                job = None
+
+            if job is None:
+                if index == 0:
+                    await self._refresh_depth()
+                    await self._purge_if_due()
+                await asyncio.sleep(self.poll_interval)
+                continue
+
+            if job.attempts > self.queue.max_attempts:
+                # Reappeared after visibility timeouts (workers died mid-job)
+                await self.queue.fail(job, "visibility timeout exceeded max attempts")
+                logger.error("job_dead_lettered", job_id=job.id, attempts=job.attempts)
+                continue
+
+            self.busy += 1
+            heartbeat = asyncio.create_task(self._keep_leased(job))
+            try:
+                await self.handler(job)
+                if not await self.queue.complete(job):
+                    logger.warning("job_lease_lost", job_id=job.id, attempts=job.attempts)
+                self.processed_total += 1
+            except asyncio.CancelledError:
+                # Shutdown: the visibility timeout hands the job to another worker
+                raise
+            except Exception as e:
+                self.failed_total += 1
+                logger.error("job_failed", job_id=job.id, attempts=job.attempts, error=str(e))
+                if not await self.queue.fail(job, str(e)):
+                    logger.warning("job_lease_lost", job_id=job.id, attempts=job.attempts)
+            finally:
+                heartbeat.cancel()
+                self.busy -= 1
+
+    async def _keep_leased(self, job: Job):
+        """Extend the job's visibility timeout every third of it while the handler runs."""
+        interval = self.queue.visibility_timeout / 3
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                if not await self.queue.extend(job):
+                    logger.warning("job_lease_lost", job_id=job.id, attempts=job.attempts)
+                    return
+            except Exception as e:
+                # Try again next interval; the lease still has two thirds left
+                logger.warning("job_lease_extend_failed", job_id=job.id, error=str(e))
+
+    async def _purge_if_due(self):
+        if self.queue.retention <= 0 or time.monotonic() - self._purged_at < self.purge_interval:
+            return
+        self._purged_at = time.monotonic()
+        try:
+            purged = await self.queue.purge()
+            if purged:
+                logger.info("jobs_purged", purged=purged, retention_s=self.queue.retention)
+        except Exception as e:
+            logger.warning("job_purge_failed", error=str(e))
+
+    async def _refresh_depth(self):
+        try:
+            self.last_depth = await self.queue.depth()
+        except Exception as e:
+            logger.warning("job_depth_failed", error=str(e))
+
+    def stats(self) -> dict:
+        return {
+            "worker": self.worker_id,
+            "concurrency": self.concurrency,
+            "busy": self.busy,
+            "processed_total": self.processed_total,
+            "failed_total": self.failed_total,
+            "depth": self.last_depth,
+        }
+
+
+def create_job_queue() -> Optional[JobQueue]:
+    """Build the queue selected by JOB_QUEUE_BACKEND (unset = FastAPI BackgroundTasks)."""
+    backend = os.getenv("JOB_QUEUE_BACKEND", "").lower()
+    options = {
+        "visibility_timeout": float(os.getenv("JOB_VISIBILITY_TIMEOUT", "120")),
+        "max_attempts": int(os.getenv("JOB_MAX_ATTEMPTS", "3")),
+        "retry_backoff": float(os.getenv("JOB_RETRY_BACKOFF", "5")),
+        "retention": float(os.getenv("JOB_RETENTION_SECONDS", "86400")),
+    }
+    if backend == "sqlite":
+        # A path inside the container's working directory is lost on redeploy
+        path = os.getenv("JOB_QUEUE_SQLITE_PATH")
+        if not path:
+            raise RuntimeError(
+                "JOB_QUEUE_BACKEND=sqlite requires JOB_QUEUE_SQLITE_PATH on a persistent "
+                "volume (e.g. /data/rag_jobs.db)"
+            )
+        return SQLiteJobQueue(path, **options)
+    if backend == "postgres":
+        return PostgresJobQueue(os.environ["JOB_QUEUE_DATABASE_URL"], **options)
+    return None
+
+
+job_queue = create_job_queue()
@@ -0,0 +1,34 @@
+"""Rolling latency windows used to tune hedged retrieval."""
+
+from collections import deque
+
+import numpy as np
+
+
+class LatencyTracker:
+    """Keep the most recent `window` latencies (seconds) and answer percentile queries."""
+
+    def __init__(self, window: int = 200):
+        self._samples: deque[float] = deque(maxlen=window)
+        self.count = 0
+
+    def observe(self, seconds: float):
+        self._samples.append(seconds)
+        self.count += 1
+
+    def __len__(self) -> int:
+        return len(self._samples)
+
+    def percentile(self, p: float) -> float:
+        """p-th percentile (0-100) of the current window; 0.0 when empty."""
+        if not self._samples:
+            return 0.0
+        return float(np.percentile(np.fromiter(self._samples, dtype=np.float64), p))
+
+    def stats(self) -> dict:
+        return {
+            "count": self.count,
+            "p50_ms": round(1000 * self.percentile(50), 1),
+            "p95_ms": round(1000 * self.percentile(95), 1),
+            "p99_ms": round(1000 * self.percentile(99), 1),
+        }
@@ -0,0 +1,288 @@
+"""In-process BM25 inverted index over opex_documents text, synced incrementally."""
+
+import json
+import os
+import re
+import threading
+import time
+from array import array
+from typing import Optional
+
+import numpy as np
+import structlog
+
+logger = structlog.get_logger()
+
+# Identifier-friendly tokens: "WHT-2", "1601-C", "create-deployment" and
+# "infra/do/app.yaml" stay whole (plus their parts), so exact codes match.
+_TOKEN = re.compile(r"[a-z0-9]+(?:[-_./:][a-z0-9]+)*")
+_SEPARATORS = re.compile(r"[-_./:]")
+_STOPWORDS = frozenset(
+    "a an and are as at be by do does for from how i in is it of on or that the this to "
+    "what when where which who why with you your".split()
+)
+
+
+def tokenize(text: str) -> list[str]:
+    tokens = []
+    for match in _TOKEN.finditer(text.lower()):
+        token = match.group()
+        if token in _STOPWORDS:
+            continue
+        tokens.append(token)
+        if _SEPARATORS.search(token):
+            tokens.extend(p for p in _SEPARATORS.split(token) if p and p not in _STOPWORDS)
+    return tokens
+
+
+def _json_bytes(value) -> np.ndarray:
+    return np.frombuffer(json.dumps(value).encode("utf-8"), dtype=np.uint8)
+
+
+class LexicalIndex:
+    """
+    BM25 (k1, b) over chunk text.
+
+    Postings are typed arrays per term (uint32 doc numbers, uint16 term
+    frequencies), so the index costs ~6 bytes per (term, chunk) pair.
+    `sync` diffs a snapshot against the indexed document IDs: only new
+    chunks are tokenized, removed ones are tombstoned and dropped at the
+    next compaction. With `path` set the index is saved as one .npz file
+    and reloaded on start.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        k1: float = 1.2,
+        b: float = 0.75,
+        compact_ratio: float = 0.2,
+    ):
+        self.path = path
+        self.k1 = k1
+        self.b = b
+        self.compact_ratio = compact_ratio
+
+        self._lock = threading.Lock()
+        self._reset()
+        self.version: Optional[str] = None
+        self.searches = 0
+
+    def _reset(self):
+        self._terms: dict[str, int] = {}
+        self._postings_docs: list[array] = []
+        self._postings_tfs: list[array] = []
+        self._doc_lens = array("I")
+        self._alive = bytearray()
+        self._documents: list[Optional[dict]] = []
+        self._doc_numbers: dict[str, int] = {}
+        self._total_len = 0
+
+    @property
+    def ready(self) -> bool:
+        return bool(self._doc_numbers)
+
+    # ---------- indexing ----------
+
+    @staticmethod
+    def _term_counts(text: str) -> tuple[dict[str, int], int]:
+        tokens = tokenize(text or "")
+        counts: dict[str, int] = {}
+        for token in tokens:
+            counts[token] = counts.get(token, 0) + 1
+        return counts, len(tokens)
+
+    def _add(self, row: dict, counts: dict[str, int], length: int):
+        number = len(self._documents)
+        self._documents.append(row)
+        self._doc_numbers[row["document_id"]] = number
+        self._doc_lens.append(length)
+        self._alive.append(1)
+        self._total_len += length
+
+        for token, count in counts.items():
+            term = self._terms.get(token)
+            if term is None:
+                term = self._terms[token] = len(self._postings_docs)
+                self._postings_docs.append(array("I"))
+                self._postings_tfs.append(array("H"))
+            self._postings_docs[term].append(number)
+            self._postings_tfs[term].append(min(count, 65535))
+
+    def _remove(self, document_id: str):
+        number = self._doc_numbers.pop(document_id)
+        self._alive[number] = 0
+        self._documents[number] = None
+        self._total_len -= self._doc_lens[number]
+
+    def sync(self, rows: list[dict], version: Optional[str] = None) -> tuple[int, int]:
+        """Index new rows and drop rows no longer present; returns (added, removed)."""
+        started = time.perf_counter()
+        incoming = {row["document_id"]: row for row in rows}
+        # Tokenize outside the lock so searches keep running during a sync
+        new_rows = [
+            ({k: v for k, v in row.items() if k != "embedding"}, *self._term_counts(row.get("text")))
+            for document_id, row in incoming.items()
+            if document_id not in self._doc_numbers
+        ]
+        with self._lock:
+            removed = [d for d in self._doc_numbers if d not in incoming]
+            for document_id in removed:
+                self._remove(document_id)
+            for row, counts, length in new_rows:
+                if row["document_id"] not in self._doc_numbers:
+                    self._add(row, counts, length)
+            added = len(new_rows)
+            if len(self._documents) - len(self._doc_numbers) > self.compact_ratio * len(
+                self._documents
+            ):
+                self._compact()
+            self.version = version
+
+        if self.path and (added or removed):
+            self.save()
+        logger.info(
+            "lexical_index_synced",
+            added=added,
+            removed=len(removed),
+            documents=len(self._doc_numbers),
+            terms=len(self._terms),
+            duration_ms=round(1000 * (time.perf_counter() - started), 1),
+        )
+        return added, len(removed)
+
+    def _compact(self):
+        """Rebuild without tombstoned documents (re-tokenizes the live ones)."""
+        live = [row for row in self._documents if row is not None]
+        self._reset()
+        for row in live:
+            self._add(row, *self._term_counts(row.get("text")))
+
+    # ---------- search ----------
+
+    def search(self, query: str, k: int = 20) -> list[dict]:
+        """Top-k rows by BM25, each with its raw `bm25` score."""
+        terms = set(tokenize(query))
+        with self._lock:
+            n_docs = len(self._doc_numbers)
+            if not n_docs or not terms:
+                return []
+            self.searches += 1
+            doc_lens = np.frombuffer(self._doc_lens, dtype=np.uint32)
+            avg_len = self._total_len / n_docs
+            scores = np.zeros(len(self._documents), dtype=np.float32)
+
+            for token in terms:
+                term = self._terms.get(token)
+                if term is None:
+                    continue
+                docs = np.frombuffer(self._postings_docs[term], dtype=np.uint32)
+                tfs = np.frombuffer(self._postings_tfs[term], dtype=np.uint16).astype(np.float32)
+                df = len(docs)
+                idf = np.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+                norm = self.k1 * (1 - self.b + self.b * doc_lens[docs] / avg_len)
+                scores[docs] += idf * tfs * (self.k1 + 1) / (tfs + norm)
+
+            scores *= np.frombuffer(self._alive, dtype=np.uint8)
+            candidates = np.flatnonzero(scores > 0)
+            if len(candidates) > k:
+                candidates = candidates[np.argpartition(-scores[candidates], k)[:k]]
+            ranked = candidates[np.argsort(-scores[candidates])]
+            return [dict(self._documents[i], bm25=float(scores[i])) for i in ranked]
+
+    def idf(self, tokens: list[str]) -> np.ndarray:
+        """BM25 IDF per token (unseen tokens get the maximum; all 1.0 when empty)."""
+        with self._lock:
+            n_docs = len(self._doc_numbers)
+            if not n_docs:
+                return np.ones(len(tokens), dtype=np.float32)
+            df = np.array(
+                [
+                    len(self._postings_docs[self._terms[t]]) if t in self._terms else 0
+                    for t in tokens
+                ],
+                dtype=np.float32,
+            )
+        return np.log(1 + (n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+
+    # ---------- persistence ----------
+
+    def save(self):
+        """Write live postings (tombstones dropped, doc numbers remapped) to one .npz."""
+        with self._lock:
+            alive = np.frombuffer(self._alive, dtype=np.uint8).astype(bool)
+            remap = (np.cumsum(alive) - 1).astype(np.uint32)
+            terms, doc_parts, tf_parts, lengths = [], [], [], []
+            for token, term in self._terms.items():
+                docs = np.frombuffer(self._postings_docs[term], dtype=np.uint32)
+                keep = alive[docs]
+                if not keep.any():
+                    continue
+                terms.append(token)
+                doc_parts.append(remap[docs[keep]])
+                tf_parts.append(np.frombuffer(self._postings_tfs[term], dtype=np.uint16)[keep])
+                lengths.append(int(keep.sum()))
+            payload = {
+                "terms": _json_bytes(terms),
+                "offsets": np.concatenate([[0], np.cumsum(lengths, dtype=np.int64)]).astype(np.int64),
+                "docs": np.concatenate(doc_parts or [np.empty(0, dtype=np.uint32)]),
+                "tfs": np.concatenate(tf_parts or [np.empty(0, dtype=np.uint16)]),
+                "doc_lens": np.frombuffer(self._doc_lens, dtype=np.uint32)[alive],
+                "documents": _json_bytes([d for d in self._documents if d is not None]),
+                "version": _json_bytes(self.version),
+            }
+
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp_path = self.path + ".tmp.npz"
+        np.savez(tmp_path, **payload)
+        os.replace(tmp_path, self.path)
+
+    def load(self) -> bool:
+        if not self.path or not os.path.exists(self.path):
+            return False
+        try:
+            with np.load(self.path) as data:
+                terms = json.loads(data["terms"].tobytes())
+                offsets, docs, tfs = data["offsets"], data["docs"], data["tfs"]
+                doc_lens = data["doc_lens"]
+                documents = json.loads(data["documents"].tobytes())
+                version = json.loads(data["version"].tobytes())
+        except (OSError, ValueError, KeyError) as e:
+            logger.warning("lexical_index_load_failed", path=self.path, error=str(e))
+            return False
+
+        with self._lock:
+            self._reset()
+            self._terms = {t: i for i, t in enumerate(terms)}
+            for i in range(len(terms)):
+                self._postings_docs.append(array("I", docs[offsets[i] : offsets[i + 1]].tobytes()))
+                self._postings_tfs.append(array("H", tfs[offsets[i] : offsets[i + 1]].tobytes()))
+            self._doc_lens = array("I", doc_lens.astype(np.uint32).tobytes())
+            self._alive = bytearray(b"\x01" * len(documents))
+            self._documents = documents
+            self._doc_numbers = {row["document_id"]: i for i, row in enumerate(documents)}
+            self._total_len = int(doc_lens.sum())
+            self.version = version
+        logger.info("lexical_index_loaded", documents=len(documents), terms=len(terms))
+        return True
+
+    def stats(self) -> dict:
+        postings = sum(len(p) for p in self._postings_docs)
+        return {
+            "ready": self.ready,
+            "documents": len(self._doc_numbers),
+            "terms": len(self._terms),
+            "postings": postings,
+            "postings_bytes": postings * 6,
+            "version": self.version,
+            "searches": self.searches,
+        }
+
+
+HYBRID_SEARCH_ENABLED = os.getenv("HYBRID_SEARCH_ENABLED", "false").lower() == "true"
+
+lexical_index = LexicalIndex(
+    path=os.getenv("LEXICAL_INDEX_PATH") or None,
+    k1=float(os.getenv("BM25_K1", "1.2")),
+    b=float(os.getenv("BM25_B", "0.75")),
+)
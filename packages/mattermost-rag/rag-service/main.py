@@ -1,18 +1,45 @@
 """FastAPI slash-command handler for Mattermost RAG integration."""
 
+import asyncio
+import json
 import os
+import time
 from typing import Optional
 
 import httpx
 import structlog
-from fastapi import FastAPI, BackgroundTasks, Form, HTTPException, Request
-from fastapi.responses import JSONResponse
-
-from rag_client import retrieve_and_synthesize
+from fastapi import FastAPI, BackgroundTasks, Form, Header, HTTPException, Request
+from fastapi.responses import JSONResponse, Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+from pydantic import BaseModel, Field, constr
+
+from admission import QueueFullError, admission
+from answer_cache import answer_cache
+from calibration import CONFIDENCE_MODEL_PATH, calibrator
+from circuit_breaker import breakers, retry_budget
+from embedding_cache import embedding_cache
+from fast_path import fast_path
+from http_pool import http_pool
+from job_queue import Job, WorkerPool, idempotency_key, job_queue
+from lexical_index import HYBRID_SEARCH_ENABLED, lexical_index
+from metrics import STAGE_ERRORS, STAGE_SECONDS, register_service_stats, stage_timer
+from query_log import query_log
+from rag_client import (
+    answer_batch,
+    rag_client,
+    retrieve_and_synthesize,
+    start_sources_poller,
+    stop_sources_poller,
+)
+from reranker import reranker
+from singleflight import pipeline_flights
+from tracing import current_traceparent, exporter, trace_context
+from vector_index import VECTOR_INDEX_MODE, vector_index
 
 # Configure structured logging
 structlog.configure(
     processors=[
+        structlog.contextvars.merge_contextvars,
         structlog.processors.TimeStamper(fmt="iso"),
         structlog.stdlib.add_log_level,
         structlog.processors.JSONRenderer(),
@@ -22,11 +49,34 @@ logger = structlog.get_logger()
 
 app = FastAPI(title="Mattermost RAG Service", version="1.0.0")
 
+register_service_stats(
+    admission=admission,
+    answer_cache=answer_cache,
+    embedding_cache=embedding_cache,
+    http_pool=http_pool,
+    breakers=breakers,
+)
+
 # Configuration
 MM_SITE_URL = os.getenv("MM_SITE_URL", "http://mattermost:8065").rstrip("/")
 MM_BOT_TOKEN = os.getenv("MM_BOT_TOKEN", "")
 MM_SLASH_TOKEN = os.getenv("MM_SLASH_TOKEN", "")
-MAX_CONCURRENT = int(os.getenv("MAX_CONCURRENT_REQUESTS", "10"))
+STREAM_ANSWERS = os.getenv("STREAM_ANSWERS", "false").lower() == "true"
+STREAM_EDIT_INTERVAL = float(os.getenv("STREAM_EDIT_INTERVAL_MS", "750")) / 1000
+
+# Durable job queue (JOB_QUEUE_BACKEND=sqlite|postgres); unset = BackgroundTasks
+JOB_WORKERS = int(os.getenv("JOB_WORKERS", "4"))
+JOB_IDEMPOTENCY_BUCKET = int(os.getenv("JOB_IDEMPOTENCY_BUCKET_SECONDS", "60"))
+job_workers: Optional[WorkerPool] = None
+
+# Longest question accepted from /ask and the batch API
+MAX_QUESTION_CHARS = 500
+
+# Bulk question answering (POST /rag/batch); disabled unless a token is set
+RAG_BATCH_TOKEN = os.getenv("RAG_BATCH_TOKEN", "")
+RAG_BATCH_MAX_QUESTIONS = int(os.getenv("RAG_BATCH_MAX_QUESTIONS", "500"))
+RAG_BATCH_SEARCH_CONCURRENCY = int(os.getenv("RAG_BATCH_SEARCH_CONCURRENCY", "32"))
+RAG_BATCH_SYNTHESIS_CONCURRENCY = int(os.getenv("RAG_BATCH_SYNTHESIS_CONCURRENCY", "4"))
 
 
 # ---------- Mattermost API helpers ----------
@@ -42,15 +92,57 @@ async def mm_post_message(
     if root_id:
         payload["root_id"] = root_id
 
-    async with httpx.AsyncClient(timeout=20) as client:
-        try:
-            response = await client.post(url, json=payload, headers=headers)
+    try:
+        with stage_timer("mm_post_message"):
+            response = await http_pool.post(url, json=payload, headers=headers, timeout=20)
             response.raise_for_status()
-            logger.info("message_posted", channel_id=channel_id, root_id=root_id)
-            return response.json()
-        except httpx.HTTPError as e:
-            logger.error("mm_post_failed", error=str(e), status=e.response.status_code if hasattr(e, 'response') else None)
-            raise
+        logger.info("message_posted", channel_id=channel_id, root_id=root_id)
+        return response.json()
+    except httpx.HTTPError as e:
+        logger.error("mm_post_failed", error=str(e), status=e.response.status_code if hasattr(e, 'response') else None)
+        raise
+
+
+async def mm_patch_post(post_id: str, message: str) -> dict:
+    """Replace the message of an existing bot post."""
+    url = f"{MM_SITE_URL}/api/v4/posts/{post_id}/patch"
+    headers = {"Authorization": f"Bearer {MM_BOT_TOKEN}"}
+
+    try:
+        with stage_timer("mm_patch_post"):
+            response = await http_pool.put(url, json={"message": message}, headers=headers, timeout=10)
+            response.raise_for_status()
+        return response.json()
+    except httpx.HTTPError as e:
+        logger.warning("mm_patch_failed", post_id=post_id, error=str(e))
+        raise
+
+
+class StreamingPost:
+    """Bot post that is edited in place as answer tokens arrive (rate-limited)."""
+
+    def __init__(self, post_id: str, min_interval: float = STREAM_EDIT_INTERVAL):
+        self.post_id = post_id
+        self.min_interval = min_interval
+        self._last_edit = 0.0
+        self.edits = 0
+
+    async def update(self, partial_answer: str):
+        """Show the partial answer, at most once per `min_interval`."""
+        now = time.monotonic()
+        if now - self._last_edit < self.min_interval:
+            return
+        self._last_edit = now
+        try:
+            await mm_patch_post(self.post_id, f"{partial_answer} ▌")
+            self.edits += 1
+        except httpx.HTTPError:
+            # Intermediate edits are best-effort; the final edit still runs
+            pass
+
+    async def finish(self, message: str) -> dict:
+        """Replace the streamed text with the final rendered answer."""
+        return await mm_patch_post(self.post_id, message)
 
 
 async def mm_add_reaction(post_id: str, emoji_name: str):
@@ -59,13 +151,13 @@ async def mm_add_reaction(post_id: str, emoji_name: str):
     headers = {"Authorization": f"Bearer {MM_BOT_TOKEN}"}
     payload = {"post_id": post_id, "emoji_name": emoji_name}
 
-    async with httpx.AsyncClient(timeout=10) as client:
-        try:
-            response = await client.post(url, json=payload, headers=headers)
+    try:
+        with stage_timer("mm_add_reaction"):
+            response = await http_pool.post(url, json=payload, headers=headers, timeout=10)
             response.raise_for_status()
-            logger.info("reaction_added", post_id=post_id, emoji=emoji_name)
-        except httpx.HTTPError as e:
-            logger.warning("reaction_failed", error=str(e))
+        logger.info("reaction_added", post_id=post_id, emoji=emoji_name)
+    except httpx.HTTPError as e:
+        logger.warning("reaction_failed", error=str(e))
 
 
 # ---------- Core RAG workflow ----------
@@ -77,8 +169,17 @@ async def process_question(
     question: str,
     root_id: Optional[str],
     trigger_id: Optional[str],
+    reraise: bool = False,
+    final_attempt: bool = True,
 ):
-    """Background task: RAG pipeline + post answer to Mattermost."""
+    """
+    Background task: RAG pipeline + post answer to Mattermost.
+
+    Errors are posted to the channel on the final attempt only. With
+    `reraise` (durable queue jobs) the error is raised afterwards so the
+    queue can retry or dead-letter the job.
+    """
+    stream = None
     try:
         logger.info(
             "processing_question",
@@ -87,18 +188,35 @@ async def process_question(
             question=question[:100],
         )
 
+        # Streaming mode: post a placeholder now, edit it as tokens arrive
+        if STREAM_ANSWERS:
+            try:
+                placeholder = await mm_post_message(
+                    channel_id=channel_id,
+                    message=f"🔍 _Searching knowledge base for:_ {question[:200]}",
+                    root_id=root_id,
+                )
+                stream = StreamingPost(placeholder["id"])
+            except httpx.HTTPError:
+                logger.warning("stream_placeholder_failed", channel_id=channel_id)
+
         # Run RAG pipeline
         answer, citations, confidence_score, confidence_level = (
-            await retrieve_and_synthesize(question, user_id)
+            await retrieve_and_synthesize(
+                question, user_id, on_token=stream.update if stream else None
+            )
         )
 
         # Format response
         response_text = render_answer(answer, citations, confidence_score, confidence_level)
 
-        # Post to channel
-        post = await mm_post_message(
-            channel_id=channel_id, message=response_text, root_id=root_id
-        )
+        # Post to channel (or finalize the streamed post with citations + footer)
+        if stream:
+            post = await stream.finish(response_text)
+        else:
+            post = await mm_post_message(
+                channel_id=channel_id, message=response_text, root_id=root_id
+            )
 
         # Add confidence indicator emoji
         if confidence_level == "high":
@@ -117,6 +235,9 @@ async def process_question(
 
     except Exception as e:
         logger.error("processing_failed", error=str(e), question=question[:100])
+        if not reraise:
+            # Re-raised errors are counted by the caller's stage_timer
+            STAGE_ERRORS.labels(stage="process_question").inc()
         # Post error to channel
         error_msg = f"""Sorry, I encountered an error processing your question:
 
@@ -128,7 +249,100 @@ Please try:
 - Rephrasing your question
 - Using `/ask-human` to escalate to a human expert"""
 
-        await mm_post_message(channel_id=channel_id, message=error_msg, root_id=root_id)
+        if not final_attempt:
+            # The queue retries the job; don't leave a stale placeholder behind
+            if stream:
+                await stream.finish("⏳ _Hit an error, retrying shortly..._")
+        elif stream:
+            await stream.finish(error_msg)
+        else:
+            await mm_post_message(channel_id=channel_id, message=error_msg, root_id=root_id)
+        if reraise:
+            raise
+
+
+async def run_traced_question(
+    user_id: str,
+    channel_id: str,
+    question: str,
+    root_id: Optional[str],
+    trigger_id: Optional[str],
+    traceparent: Optional[str] = None,
+    queue_wait: float = 0.0,
+    reraise: bool = False,
+    final_attempt: bool = True,
+):
+    """Run process_question inside the request's trace."""
+    with trace_context(traceparent):
+        with stage_timer(
+            "process_question",
+            user_id=user_id,
+            channel_id=channel_id,
+            queue_wait_ms=round(1000 * queue_wait, 1),
+        ):
+            await process_question(
+                user_id, channel_id, question, root_id, trigger_id, reraise, final_attempt
+            )
+
+
+async def process_admitted_question(
+    user_id: str,
+    channel_id: str,
+    question: str,
+    root_id: Optional[str],
+    trigger_id: Optional[str],
+    traceparent: Optional[str] = None,
+):
+    """Background task: wait for an admission slot, then run process_question."""
+    async with admission.slot() as waited:
+        STAGE_SECONDS.labels(stage="admission_wait").observe(waited)
+        await run_traced_question(
+            user_id, channel_id, question, root_id, trigger_id, traceparent, waited
+        )
+
+
+async def process_queued_job(job: Job):
+    """Durable-queue handler: one /ask job claimed by a worker."""
+    queue_wait = max(0.0, time.time() - job.enqueued_at)
+    STAGE_SECONDS.labels(stage="job_queue_wait").observe(queue_wait)
+    # Failures propagate to the worker pool, which retries or dead-letters
+    await run_traced_question(
+        **job.payload,
+        queue_wait=queue_wait,
+        reraise=True,
+        final_attempt=job.attempts >= job_queue.max_attempts,
+    )
+
+
+async def enqueue_question(
+    user_id: str,
+    channel_id: str,
+    question: str,
+    root_id: Optional[str],
+    trigger_id: Optional[str],
+) -> dict:
+    """Durable path for /ask: enqueue (idempotently) and acknowledge."""
+    key = idempotency_key(user_id, channel_id, question, JOB_IDEMPOTENCY_BUCKET)
+    payload = {
+        "user_id": user_id,
+        "channel_id": channel_id,
+        "question": question,
+        "root_id": root_id,
+        "trigger_id": trigger_id,
+        "traceparent": current_traceparent(),
+    }
+    job_id, created = await job_queue.enqueue(payload, key)
+    logger.info("question_enqueued", job_id=job_id, duplicate=not created)
+
+    if not created:
+        return {
+            "response_type": "ephemeral",
+            "text": f"⏳ Already working on this question:\n> {question}",
+        }
+    return {
+        "response_type": "ephemeral",
+        "text": f"🔍 Searching knowledge base for:\n> {question}\n\n_This may take a few seconds..._",
+    }
 
 
 def render_answer(answer: str, citations: str, confidence: float, level: str) -> str:
@@ -157,7 +371,37 @@ def render_answer(answer: str, citations: str, confidence: float, level: str) ->
 @app.get("/health")
 async def health_check():
     """Health check endpoint for Docker healthcheck."""
-    return {"status": "healthy", "service": "mattermost-rag"}
+    return {
+        "status": "healthy",
+        "service": "mattermost-rag",
+        "supabase": rag_client.supabase_health(),
+        "http_pool": http_pool.stats(),
+        "admission": admission.stats(),
+        "answer_cache": answer_cache.stats(),
+        "embedding_cache": embedding_cache.stats(),
+        "single_flight": pipeline_flights.stats(),
+        "breakers": {name: breaker.stats() for name, breaker in breakers.items()},
+        "retry_budget": retry_budget.stats(),
+        "tracing": exporter.stats(),
+        "job_workers": job_workers.stats() if job_workers else None,
+        "vector_index": dict(vector_index.stats(), mode=VECTOR_INDEX_MODE),
+        "lexical_index": dict(lexical_index.stats(), enabled=HYBRID_SEARCH_ENABLED),
+        "reranker": reranker.stats(),
+        "confidence": calibrator.stats(),
+        "fast_path": fast_path.stats(),
+        "query_log": query_log.stats(),
+        "retrieval": {
+            "mode": rag_client.retrieval_mode,
+            "hedge_delay_ms": round(1000 * rag_client.hedge_delay()),
+            "latency": {name: t.stats() for name, t in rag_client.latency.items()},
+        },
+    }
+
+
+@app.get("/metrics")
+async def metrics():
+    """Prometheus scrape endpoint."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
 
 
 @app.post("/mm/ask")
@@ -180,45 +424,71 @@ async def mm_ask(
     3. Process question in background
     4. Post answer to channel as bot
     """
-    # Verify token
-    if MM_SLASH_TOKEN and token != MM_SLASH_TOKEN:
-        logger.warning("invalid_token_attempt", user_id=user_id)
-        raise HTTPException(status_code=403, detail="Invalid slash command token")
+    with trace_context(), stage_timer("mm_ask", user_id=user_id, channel_id=channel_id):
+        # Verify token
+        if MM_SLASH_TOKEN and token != MM_SLASH_TOKEN:
+            logger.warning("invalid_token_attempt", user_id=user_id)
+            raise HTTPException(status_code=403, detail="Invalid slash command token")
 
-    question = text.strip()
+        question = text.strip()
 
-    # Validate input
-    if not question:
-        return {
-            "response_type": "ephemeral",
-            "text": "**Usage**: `/ask <your question>`\n\nExample: `/ask how do I rotate database credentials?`",
-        }
+        # Validate input
+        if not question:
+            return {
+                "response_type": "ephemeral",
+                "text": "**Usage**: `/ask <your question>`\n\nExample: `/ask how do I rotate database credentials?`",
+            }
 
-    # Length validation
-    if len(question) > 500:
-        return {
-            "response_type": "ephemeral",
-            "text": "⚠️ Question too long (max 500 characters). Please shorten your question.",
-        }
+        # Length validation
+        if len(question) > MAX_QUESTION_CHARS:
+            return {
+                "response_type": "ephemeral",
+                "text": f"⚠️ Question too long (max {MAX_QUESTION_CHARS} characters). Please shorten your question.",
+            }
 
-    # Log request
-    logger.info(
-        "slash_command_received",
-        user_id=user_id,
-        channel_id=channel_id,
-        question=question[:100],
-    )
+        # Log request
+        logger.info(
+            "slash_command_received",
+            user_id=user_id,
+            channel_id=channel_id,
+            question=question[:100],
+        )
 
-    # Start background processing
-    background_tasks.add_task(
-        process_question, user_id, channel_id, question, root_id, trigger_id
-    )
+        # Durable queue: survives restarts and spreads work across replicas
+        if job_queue is not None:
+            return await enqueue_question(user_id, channel_id, question, root_id, trigger_id)
 
-    # Immediate ephemeral response
-    return {
-        "response_type": "ephemeral",
-        "text": f"🔍 Searching knowledge base for:\n> {question}\n\n_This may take a few seconds..._",
-    }
+        # Admission control: shed load when the wait queue is full
+        try:
+            position = admission.reserve()
+        except QueueFullError:
+            return {
+                "response_type": "ephemeral",
+                "text": "🚦 The knowledge base is busy right now. Please try again in a minute, or use `/ask-human` if it's urgent.",
+            }
+
+        # Start background processing; hand the trace over so the detached
+        # task's spans join this request
+        background_tasks.add_task(
+            process_admitted_question,
+            user_id,
+            channel_id,
+            question,
+            root_id,
+            trigger_id,
+            current_traceparent(),
+        )
+
+        # Immediate ephemeral response
+        if position:
+            return {
+                "response_type": "ephemeral",
+                "text": f"⏳ Busy — your question is queued at position {position}:\n> {question}\n\n_I'll post the answer as soon as it's ready._",
+            }
+        return {
+            "response_type": "ephemeral",
+            "text": f"🔍 Searching knowledge base for:\n> {question}\n\n_This may take a few seconds..._",
+        }
 
 
 @app.post("/mm/ask-human")
@@ -264,6 +534,63 @@ async def mm_ask_human(
     }
 
 
+# ---------- Batch API ----------
+
+
+class BatchRequest(BaseModel):
+    # Same limits as /ask; oversized batches or questions are rejected with 422
+    questions: list[
+        constr(strip_whitespace=True, min_length=1, max_length=MAX_QUESTION_CHARS)
+    ] = Field(..., min_length=1, max_length=RAG_BATCH_MAX_QUESTIONS)
+    user_id: str = "batch"
+    # False: ignore cached answers (eval runs); answers are still cached
+    use_cache: bool = True
+
+
+@app.post("/rag/batch")
+async def rag_batch(body: BatchRequest, authorization: str = Header("")):
+    """
+    Answer many questions (nightly evals, cache warm-up), streaming one NDJSON
+    line per question as it finishes, then a summary line.
+
+    Requires `Authorization: Bearer $RAG_BATCH_TOKEN`.
+    """
+    if not RAG_BATCH_TOKEN:
+        raise HTTPException(status_code=404, detail="Batch API is disabled")
+    if authorization != f"Bearer {RAG_BATCH_TOKEN}":
+        raise HTTPException(status_code=401, detail="Invalid token")
+    logger.info("batch_started", questions=len(body.questions), user_id=body.user_id)
+
+    async def lines():
+        started = time.perf_counter()
+        answered = failed = cached = 0
+        async for item in answer_batch(
+            body.questions,
+            body.user_id,
+            search_concurrency=RAG_BATCH_SEARCH_CONCURRENCY,
+            synthesis_concurrency=RAG_BATCH_SYNTHESIS_CONCURRENCY,
+            use_cache=body.use_cache,
+        ):
+            if "error" in item:
+                failed += 1
+            else:
+                answered += 1
+                cached += item["cached"]
+            yield json.dumps(item) + "\n"
+
+        summary = {
+            "done": True,
+            "answered": answered,
+            "failed": failed,
+            "cached": cached,
+            "duration_ms": round(1000 * (time.perf_counter() - started), 1),
+        }
+        logger.info("batch_finished", **summary)
+        yield json.dumps(summary) + "\n"
+
+    return StreamingResponse(lines(), media_type="application/x-ndjson")
+
+
 @app.exception_handler(Exception)
 async def global_exception_handler(request: Request, exc: Exception):
     """Global exception handler for unhandled errors."""
@@ -293,6 +620,7 @@ async def handle_incoming_webhook(request: Request):
         elif notification_type == "system_alert":
             await post_system_alert(data)
         elif notification_type == "document_update":
+            answer_cache.invalidate(reason="document_update")
             await post_document_update(data)
 
         return {"status": "processed", "type": notification_type}
@@ -369,13 +697,12 @@ async def send_webhook_message(message: str, channel: str = None):
     if channel:
         payload["channel"] = channel
 
-    async with httpx.AsyncClient(timeout=10) as client:
-        try:
-            response = await client.post(webhook_url, json=payload)
-            response.raise_for_status()
-            logger.info("webhook_message_sent", channel=channel)
-        except httpx.HTTPError as e:
-            logger.error("webhook_send_failed", error=str(e))
+    try:
+        response = await http_pool.post(webhook_url, json=payload, timeout=10)
+        response.raise_for_status()
+        logger.info("webhook_message_sent", channel=channel)
+    except httpx.HTTPError as e:
+        logger.error("webhook_send_failed", error=str(e))
 
 
 @app.post("/mm/outgoing-webhook")
@@ -400,7 +727,13 @@ async def handle_outgoing_webhook(request: Request):
         # Process natural language queries
         if any(trigger in text.lower() for trigger in ["@opex", "@rag", "ask about"]):
             query = clean_query(text)
-            answer, citations, confidence_score, confidence_level = await retrieve_and_synthesize(query, user_name)
+            try:
+                admission.reserve()
+            except QueueFullError:
+                return {"text": f"@{user_name} I'm handling a lot of questions right now, please try again in a minute."}
+            with trace_context(), stage_timer("outgoing_webhook", user=user_name):
+                async with admission.slot():
+                    answer, citations, confidence_score, confidence_level = await retrieve_and_synthesize(query, user_name)
 
             response_text = render_answer(answer, citations, confidence_score, confidence_level)
 
@@ -432,8 +765,36 @@ def clean_query(text: str) -> str:
     return text
 
 
+async def start_job_workers(concurrency: int):
+    """Set up the durable queue and start `concurrency` workers in this process."""
+    global job_workers
+    if job_queue is None:
+        return
+    await job_queue.setup()
+    if concurrency > 0:
+        job_workers = WorkerPool(job_queue, process_queued_job, concurrency=concurrency)
+        await job_workers.start()
+
+
+async def start_background_services():
+    """Startup shared by the API and worker.py; shutdown_event stops it all."""
+    await http_pool.start()
+    await exporter.start()
+    await start_sources_poller()
+    if HYBRID_SEARCH_ENABLED:
+        await asyncio.to_thread(lexical_index.load)
+    await asyncio.to_thread(reranker.warm_up)
+    if CONFIDENCE_MODEL_PATH:
+        calibrator.load(CONFIDENCE_MODEL_PATH)
+    if VECTOR_INDEX_MODE != "off" or HYBRID_SEARCH_ENABLED:
+        # One refresh loop keeps both local indexes in sync
+        await vector_index.start(rag_client.refresh_local_indexes)
+
+
 @app.on_event("startup")
 async def startup_event():
+    await start_background_services()
+    await start_job_workers(JOB_WORKERS)
     logger.info(
         "service_starting",
         mm_site_url=MM_SITE_URL,
@@ -444,6 +805,21 @@ async def startup_event():
     )
 
 
+@app.on_event("shutdown")
+async def shutdown_event():
+    if job_workers:
+        await job_workers.stop()
+    if job_queue is not None:
+        await job_queue.close()
+    await vector_index.close()
+    await stop_sources_poller()
+    await query_log.close()
+    await exporter.close()
+    await http_pool.close()
+    embedding_cache.flush()
+    logger.info("service_stopped")
+
+
 if __name__ == "__main__":
     import uvicorn
 
@@ -0,0 +1,150 @@
+"""
+Prometheus metrics for the RAG pipeline, served on /metrics.
+
+The default registry is per process, so the service runs one uvicorn worker
+per container (see Dockerfile) and each scrape sees all of its traffic.
+"""
+
+import time
+from contextlib import contextmanager
+
+from prometheus_client import REGISTRY, Counter, Histogram
+from prometheus_client.core import CounterMetricFamily, GaugeMetricFamily
+
+from tracing import current_span, span
+
+# Latency buckets from 5ms up to 60s: covers cache hits through slow LLM answers
+_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60)
+
+STAGE_SECONDS = Histogram(
+    "rag_stage_duration_seconds",
+    "Latency of each RAG pipeline stage",
+    ["stage"],
+    buckets=_BUCKETS,
+)
+STAGE_ERRORS = Counter(
+    "rag_stage_errors_total",
+    "Errors raised by each RAG pipeline stage",
+    ["stage"],
+)
+RETRIEVAL_BACKEND_SECONDS = Histogram(
+    "rag_retrieval_backend_duration_seconds",
+    "Latency of each retrieval backend call",
+    ["backend", "outcome"],
+    buckets=_BUCKETS,
+)
+LLM_TOKENS = Counter(
+    "rag_llm_tokens_total",
+    "LLM tokens consumed",
+    ["model", "kind"],
+)
+
+
+@contextmanager
+def stage_timer(stage: str, **attributes):
+    """
+    Observe the duration of a pipeline stage; count it as an error if it raises.
+
+    Also records a trace span for the stage and yields it, so callers can
+    attach attributes (hits, scores, ...).
+    """
+    started = time.perf_counter()
+    try:
+        with span(stage, **attributes) as stage_span:
+            yield stage_span
+    except Exception:
+        STAGE_ERRORS.labels(stage=stage).inc()
+        raise
+    finally:
+        STAGE_SECONDS.labels(stage=stage).observe(time.perf_counter() - started)
+
+
+def _field(obj, name: str):
+    """Read a usage field from a typed object or a plain dict (0 when absent)."""
+    if isinstance(obj, dict):
+        return obj.get(name) or 0
+    return getattr(obj, name, 0) or 0
+
+
+def record_token_usage(model: str, usage) -> None:
+    """
+    Count prompt/completion tokens from an OpenAI usage object (if present).
+
+    Streamed chunks carry usage as a plain dict on the pinned openai client
+    (ChatCompletionChunk has no typed `usage` field), so both forms are read.
+    """
+    if usage is None:
+        return
+    prompt_tokens = _field(usage, "prompt_tokens")
+    completion_tokens = _field(usage, "completion_tokens")
+    LLM_TOKENS.labels(model=model, kind="prompt").inc(prompt_tokens)
+    LLM_TOKENS.labels(model=model, kind="completion").inc(completion_tokens)
+
+    # Prompt tokens served from the provider's prefix cache (a subset of prompt)
+    cached_tokens = _field(_field(usage, "prompt_tokens_details") or {}, "cached_tokens")
+    LLM_TOKENS.labels(model=model, kind="cached_prompt").inc(cached_tokens)
+
+    active = current_span()
+    if active is not None:
+        active.set(
+            prompt_tokens=prompt_tokens,
+            completion_tokens=completion_tokens,
+            cached_tokens=cached_tokens,
+        )
+
+
+class ServiceStatsCollector:
+    """
+    Export the in-process stats objects (admission queue, caches, HTTP pool,
+    breakers) at scrape time, so they are not counted twice.
+    """
+
+    def __init__(self, sources: dict):
+        self.sources = sources
+
+    def collect(self):
+        admission = self.sources["admission"].stats()
+        queue = GaugeMetricFamily("rag_admission_requests", "Admitted pipelines", labels=["state"])
+        queue.add_metric(["running"], admission["running"])
+        queue.add_metric(["waiting"], admission["waiting"])
+        yield queue
+        shed = CounterMetricFamily("rag_admission_shed", "Questions rejected by load shedding")
+        shed.add_metric([], admission["shed_total"])
+        yield shed
+
+        lookups = CounterMetricFamily(
+            "rag_cache_lookups", "Cache lookups by result", labels=["cache", "result"]
+        )
+        ratio = GaugeMetricFamily("rag_cache_hit_ratio", "Cache hit ratio", labels=["cache"])
+        answers = self.sources["answer_cache"].stats()
+        lookups.add_metric(["answer", "exact_hit"], answers["exact_hits"])
+        lookups.add_metric(["answer", "near_hit"], answers["near_hits"])
+        lookups.add_metric(["answer", "miss"], answers["misses"])
+        ratio.add_metric(["answer"], answers["hit_ratio"])
+        embeddings = self.sources["embedding_cache"].stats()
+        lookups.add_metric(["embedding", "hit"], embeddings["hits"])
+        lookups.add_metric(["embedding", "miss"], embeddings["misses"])
+        ratio.add_metric(["embedding"], embeddings["hit_ratio"])
+        yield lookups
+        yield ratio
+
+        pool = self.sources["http_pool"].stats()
+        in_flight = GaugeMetricFamily("rag_http_pool_in_flight", "Outbound HTTP requests in flight")
+        in_flight.add_metric([], pool["in_flight"])
+        yield in_flight
+        saturation = GaugeMetricFamily(
+            "rag_http_pool_saturation", "In-flight requests / max connections"
+        )
+        saturation.add_metric([], pool["saturation"])
+        yield saturation
+
+        state = GaugeMetricFamily(
+            "rag_circuit_open", "1 when the breaker is open or half-open", labels=["dependency"]
+        )
+        for name, breaker in self.sources["breakers"].items():
+            state.add_metric([name], 0 if breaker.state == "closed" else 1)
+        yield state
+
+
+def register_service_stats(**sources) -> None:
+    REGISTRY.register(ServiceStatsCollector(sources))
@@ -1,10 +1,12 @@
 """RAG prompt templates for Claude."""
 
+from calibration import calibrator
+
 SYSTEM_PROMPT = """You are an expert technical assistant for OpEx operations.
 
 Your role:
 - Answer questions based ONLY on the provided context documents
-- Cite sources using [source: doc_title] format
+- Cite sources using [source: Document N] format
 - If context doesn't contain the answer, say "I don't have information about this"
 - Be concise and actionable
 - Use technical accuracy over brevity
@@ -22,45 +24,78 @@ Always include:
 """
 
 
-def build_rag_prompt(question: str, context_docs: list[dict]) -> str:
-    """Build RAG prompt with context documents."""
+# Answer format rules: static, so they live in the system message
+ANSWER_INSTRUCTIONS = """
+Each request gives numbered context documents followed by the question:
+1. Answer the question using ONLY the context documents
+2. Cite sources using [source: Document N] format
+3. If context is insufficient, say so clearly
+4. Assess your confidence in the answer (high/medium/low)
+5. Suggest next steps if helpful
+"""
 
-    if not context_docs:
-        return f"""Question: {question}
+_DOC_BLOCK = """[Document {index}] {title} ({match})
+Source: {url}
+Content:
+{content}
+---""".format
 
-Context: No relevant documents found.
+_WITH_CONTEXT = """Context Documents:
+{context}
 
-Please respond that you don't have information to answer this question and suggest using /ask-human for escalation."""
+Question: {question}
 
-    # Format context documents
-    context_blocks = []
-    for i, doc in enumerate(context_docs, 1):
-        title = doc.get("title", "Untitled")
-        content = doc.get("snippet", doc.get("content", ""))
-        url = doc.get("url", "")
-        score = doc.get("score", 0.0)
+Your response:""".format
 
-        context_blocks.append(f"""[Document {i}] {title} (confidence: {score:.2f})
-Source: {url}
-Content:
-{content}
----""")
+_WITHOUT_CONTEXT = """Context: No relevant documents found.
 
-    context_text = "\n\n".join(context_blocks)
+Question: {question}
 
-    return f"""Question: {question}
+Please respond that you don't have information to answer this question and suggest using /ask-human for escalation.""".format
 
-Context Documents:
-{context_text}
 
-Instructions:
-1. Answer the question using ONLY the context above
-2. Cite sources using [source: Document N] format
-3. If context is insufficient, say so clearly
-4. Assess your confidence in the answer (high/medium/low)
-5. Suggest next steps if helpful
+def _match_label(doc: dict) -> str:
+    """Similarity of a hit, or a keyword-match label for BM25-only hybrid hits."""
+    if "score" not in doc and "bm25" in doc:
+        return "keyword match"
+    return f"confidence: {doc.get('score', 0.0):.2f}"
+
+
+class RagPromptTemplate:
+    """
+    Chat messages for a RAG question: static rules first, variable parts last.
+
+    The system message (role, rules, answer format) is assembled once and is
+    identical on every call; the user message carries the context documents,
+    then the question. The static part is a few hundred tokens, below
+    OpenAI's 1024-token prompt-caching minimum, so gpt-4o-mini does not get
+    cached-prefix hits from it.
+    """
+
+    def __init__(self, system_prompt: str, instructions: str):
+        self.system = system_prompt.rstrip() + "\n" + instructions
+        self.system_message = {"role": "system", "content": self.system}
 
-Your response:"""
+    def render(self, question: str, context_docs: list[dict]) -> str:
+        if not context_docs:
+            return _WITHOUT_CONTEXT(question=question)
+        context = "\n\n".join(
+            _DOC_BLOCK(
+                index=i,
+                title=doc.get("title", "Untitled"),
+                match=_match_label(doc),
+                url=doc.get("url", ""),
+                content=doc.get("snippet", doc.get("content", "")),
+            )
+            for i, doc in enumerate(context_docs, 1)
+        )
+        return _WITH_CONTEXT(context=context, question=question)
+
+    def messages(self, question: str, context_docs: list[dict]) -> list[dict]:
+        return [self.system_message, {"role": "user", "content": self.render(question, context_docs)}]
+
+
+RAG_PROMPT = RagPromptTemplate(SYSTEM_PROMPT, ANSWER_INSTRUCTIONS)
 
 
 RAG_EXAMPLES = [
@@ -112,26 +147,16 @@ def format_citations(docs: list[dict]) -> str:
     for i, doc in enumerate(docs[:5], 1):  # Top 5 sources
         title = doc.get("title", "Untitled")
         url = doc.get("url", "#")
-        score = doc.get("score", 0.0)
-        citations.append(f"{i}. [{title}]({url}) (confidence: {score:.2f})")
+        citations.append(f"{i}. [{title}]({url}) ({_match_label(doc)})")
 
     return "\n".join(citations)
 
 
 def assess_confidence(docs: list[dict]) -> tuple[float, str]:
-    """Assess overall confidence based on retrieval scores."""
-    if not docs:
-        return 0.0, "low"
-
-    top_score = max(doc.get("score", 0.0) for doc in docs)
-    avg_score = sum(doc.get("score", 0.0) for doc in docs) / len(docs)
-
-    # Weighted average: top score 70%, average 30%
-    confidence = 0.7 * top_score + 0.3 * avg_score
+    """
+    Assess overall confidence based on retrieval scores.
 
-    if confidence >= 0.85:
-        return confidence, "high"
-    elif confidence >= 0.65:
-        return confidence, "medium"
-    else:
-        return confidence, "low"
+    Uses the fitted calibration model when one is loaded (see calibration.py),
+    else 0.7 x top + 0.3 x average score with 0.85 / 0.65 cut-offs.
+    """
+    return calibrator.assess(docs)
@@ -0,0 +1,118 @@
+"""
+Log answered questions to opex.rag_queries for analytics and confidence fitting.
+
+Each row carries metadata.retrieval_scores (the vector similarity of every
+retrieved hit, in retrieval order) so fit_confidence.py can fit the
+calibration model once the rag-feedback function has added ratings.
+"""
+
+import asyncio
+import os
+import uuid
+from typing import Optional
+
+import structlog
+
+logger = structlog.get_logger()
+
+ASSISTANT_NAME = "opex-assistant"
+
+
+def build_row(
+    question: str,
+    answer: str,
+    user_id: str,
+    context_docs: list[dict],
+    confidence_score: float,
+    confidence_level: str,
+    fast_path: bool = False,
+) -> dict:
+    """A rag_queries row; Mattermost user ids are not UUIDs, so they go in metadata."""
+    return {
+        "id": str(uuid.uuid4()),
+        "assistant_name": ASSISTANT_NAME,
+        "question": question,
+        "answer": answer,
+        "domain": "knowledge_base",
+        "success": True,
+        "metadata": {
+            "source": "mattermost-rag",
+            "mm_user_id": user_id,
+            # Keyword-only hybrid hits have no similarity and are left out, as in calibration
+            "retrieval_scores": [d["score"] for d in context_docs if "score" in d],
+            "confidence_score": round(confidence_score, 4),
+            "confidence_level": confidence_level,
+            "fast_path": fast_path,
+        },
+        "citations": [
+            {"title": d.get("title"), "url": d.get("url"), "score": d.get("score")}
+            for d in context_docs
+        ],
+    }
+
+
+class QueryLog:
+    """Best-effort background inserts: answers never wait on (or fail with) the log."""
+
+    def __init__(self, url: str, key: str, enabled: bool = True, max_pending: int = 100):
+        self.url = url
+        self.key = key
+        self.enabled = enabled and bool(url and key)
+        self.max_pending = max_pending
+        self._client = None
+        self._pending: set[asyncio.Task] = set()
+        self.logged = 0
+        self.failed = 0
+        self.dropped = 0
+
+    def record(self, **fields) -> Optional[str]:
+        """Queue a row insert (see build_row for the fields); returns the row id."""
+        if not self.enabled:
+            return None
+        if len(self._pending) >= self.max_pending:
+            self.dropped += 1
+            return None
+        row = build_row(**fields)
+        task = asyncio.create_task(self._insert(row))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+        return row["id"]
+
+    async def _insert(self, row: dict):
+        try:
+            await asyncio.to_thread(self._insert_sync, row)
+            self.logged += 1
+        except Exception as e:
+            self.failed += 1
+            self._client = None
+            logger.warning("query_log_failed", error=str(e))
+
+    def _insert_sync(self, row: dict):
+        if self._client is None:
+            from supabase import create_client
+            from supabase.lib.client_options import ClientOptions
+
+            # Own client: switching the shared one's schema would leak into retrieval
+            self._client = create_client(self.url, self.key, options=ClientOptions(schema="opex"))
+        self._client.table("rag_queries").insert(row).execute()
+
+    async def close(self):
+        """Wait (briefly) for queued inserts."""
+        if self._pending:
+            await asyncio.wait(list(self._pending), timeout=5)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "logged": self.logged,
+            "failed": self.failed,
+            "dropped": self.dropped,
+            "pending": len(self._pending),
+        }
+
+
+query_log = QueryLog(
+    url=os.getenv("SUPABASE_URL", ""),
+    key=os.getenv("SUPABASE_SERVICE_ROLE_KEY", ""),
+    enabled=os.getenv("QUERY_LOG_ENABLED", "true").lower() == "true",
+)
@@ -1,22 +1,72 @@
 """RAG client for hybrid search across Supabase, Notion, and GitHub."""
 
+import asyncio
 import os
-from typing import Optional
+import time
+from typing import AsyncIterator, Awaitable, Callable, Optional
 
-import httpx
 import structlog
-from openai import OpenAI
-from tenacity import retry, stop_after_attempt, wait_exponential
-
-from prompts import SYSTEM_PROMPT, build_rag_prompt, format_citations, assess_confidence
+from openai import AsyncOpenAI
+
+from answer_cache import answer_cache, question_key
+from calibration import calibrator
+from circuit_breaker import breakers, call_with_breaker
+from context_packer import CONTEXT_TOKEN_BUDGET, pack_context
+from embedding_cache import embedding_cache
+from fast_path import fast_path
+from http_pool import http_pool
+from latency import LatencyTracker
+from lexical_index import HYBRID_SEARCH_ENABLED, lexical_index
+from metrics import RETRIEVAL_BACKEND_SECONDS, record_token_usage, stage_timer
+from reranker import reranker
+from singleflight import pipeline_flights
+from tracing import span
+from vector_index import VECTOR_INDEX_MODE, vector_index
+from prompts import RAG_PROMPT, format_citations, assess_confidence
+from query_log import query_log
 
 logger = structlog.get_logger()
 
-# Initialize OpenAI client
-openai_client = OpenAI(
-    api_key=os.getenv("OPENAI_API_KEY")
+# Initialize OpenAI client (async, so LLM round trips never block the event loop)
+# Retries are handled by call_with_breaker + the global retry budget, so the
+# SDK's own retry loop is disabled.
+openai_client = AsyncOpenAI(
+    api_key=os.getenv("OPENAI_API_KEY"),
+    max_retries=0,
 )
 
+# Concurrency budget for in-flight OpenAI calls (embeddings + completions)
+OPENAI_MAX_CONCURRENCY = int(os.getenv("OPENAI_MAX_CONCURRENCY", "8"))
+openai_slots = asyncio.Semaphore(OPENAI_MAX_CONCURRENCY)
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+# Inputs per embeddings request when embedding many questions (API max 2048)
+EMBEDDING_BATCH_SIZE = int(os.getenv("EMBEDDING_BATCH_SIZE", "256"))
+CHAT_MODEL = "gpt-4o-mini"
+
+# Minimum cosine similarity for vector hits (pgvector RPC and local index)
+MATCH_THRESHOLD = float(os.getenv("MATCH_THRESHOLD", "0.7"))
+
+# Returned instead of an LLM answer when calibrated confidence is hopeless
+ESCALATION_ANSWER = """I couldn't find documentation that answers this reliably, so I won't guess.
+
+Please use `/ask-human` to escalate to a human expert, or rephrase your question with more specific terms."""
+
+# Chunk text kept per hit; the prompt is bounded by CONTEXT_TOKEN_BUDGET
+SNIPPET_MAX_CHARS = int(os.getenv("SNIPPET_MAX_CHARS", "2000"))
+
+# Hybrid retrieval: candidates per stage before reciprocal rank fusion
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "20"))
+RRF_K = int(os.getenv("RRF_K", "60"))
+
+# Answer cache: exact hits always, near hits by question-embedding similarity
+ANSWER_CACHE_ENABLED = os.getenv("ANSWER_CACHE_ENABLED", "true").lower() == "true"
+ANSWER_CACHE_SEMANTIC = os.getenv("ANSWER_CACHE_SEMANTIC", "true").lower() == "true"
+SOURCES_POLL_SECONDS = float(os.getenv("ANSWER_CACHE_SOURCES_POLL_SECONDS", "60"))
+
+# Coalesce concurrent identical questions into one pipeline run
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+
 
 class RAGClient:
     """Hybrid RAG client for OpEx knowledge base."""
@@ -27,85 +77,386 @@ class RAGClient:
         self.supabase_key = os.getenv("SUPABASE_SERVICE_ROLE_KEY", "")
         self.timeout = int(os.getenv("REQUEST_TIMEOUT", "30"))
 
-    @retry(
-        stop=stop_after_attempt(3),
-        wait=wait_exponential(multiplier=1, min=2, max=10),
-        reraise=True,
-    )
-    async def retrieve(self, question: str, user_id: str, limit: int = 5) -> list[dict]:
+        # Long-lived Supabase client, created lazily and rebuilt after failures
+        self._supabase = None
+        self._supabase_lock = asyncio.Lock()
+        self._supabase_healthy: Optional[bool] = None
+        self._supabase_checked_at = 0.0
+        self.supabase_health_ttl = float(os.getenv("SUPABASE_HEALTH_TTL_SECONDS", "30"))
+
+        # Retrieval strategy across the RAG backend and pgvector
+        self.retrieval_mode = os.getenv("RETRIEVAL_MODE", "hedged").lower()
+        self.hedge_delay_default = float(os.getenv("HEDGE_DELAY_MS", "750")) / 1000
+        self.hedge_min = float(os.getenv("HEDGE_MIN_MS", "100")) / 1000
+        self.hedge_max = float(os.getenv("HEDGE_MAX_MS", "5000")) / 1000
+        self.hedge_min_samples = int(os.getenv("HEDGE_MIN_SAMPLES", "20"))
+        self.latency = {
+            "rag_backend": LatencyTracker(),
+            "supabase": LatencyTracker(),
+            "local_index": LatencyTracker(),
+            "bm25": LatencyTracker(),
+        }
+
+    async def retrieve(
+        self,
+        question: str,
+        user_id: str,
+        limit: int = 5,
+        query_embedding: Optional[list[float]] = None,
+    ) -> list[dict]:
         """
         Retrieve relevant documents using hybrid search.
 
         Priority:
         1. RAG backend (if configured) - for hybrid search
         2. Supabase pgvector search - for document embeddings
-        3. Fallback to dummy context for development
+        3. Local vector index snapshot (VECTOR_INDEX_MODE=fallback)
+        4. Fallback to dummy context for development
+
+        With VECTOR_INDEX_MODE=primary the local index is tried first and
+        acts as a hot cache in front of 1 and 2.
+
+        RETRIEVAL_MODE controls how 1 and 2 are combined:
+        - sequential: try the RAG backend, then Supabase (legacy behaviour)
+        - hedged: start the RAG backend, and start Supabase too if no good
+          result arrived within the hedge delay; first good result wins
+        - parallel: query both at once and merge the hits
+
+        With hybrid search (HYBRID_SEARCH_ENABLED and a synced BM25 index) the
+        vector stage above and a BM25 stage run concurrently, each fetching
+        HYBRID_CANDIDATES, and are merged by reciprocal rank fusion.
+
+        With RERANK_MODE set, RERANK_CANDIDATES are fetched and rescored and
+        the best `limit` kept (first-stage order if over the rerank budget).
         """
-        # Try RAG backend first
+        use_lexical = HYBRID_SEARCH_ENABLED and lexical_index.ready
+        fetch = max(limit, HYBRID_CANDIDATES) if use_lexical else limit
+        if reranker.enabled:
+            fetch = max(fetch, reranker.candidates)
+
+        backends = []
         if self.rag_backend_url:
-            try:
-                async with httpx.AsyncClient(timeout=self.timeout) as client:
-                    response = await client.post(
-                        f"{self.rag_backend_url}/retrieve",
-                        json={"query": question, "user_id": user_id, "limit": limit},
-                    )
-                    response.raise_for_status()
-                    data = response.json()
-                    logger.info("rag_backend_success", hits=len(data.get("hits", [])))
-                    return data.get("hits", [])
-            except Exception as e:
-                logger.warning("rag_backend_failed", error=str(e))
-
-        # Try Supabase pgvector search
+            backends.append(
+                ("rag_backend", lambda: self._backend_search(question, user_id, fetch))
+            )
         if self.supabase_url and self.supabase_key:
-            try:
-                hits = await self._supabase_search(question, limit)
-                if hits:
-                    logger.info("supabase_search_success", hits=len(hits))
-                    return hits
-            except Exception as e:
-                logger.warning("supabase_search_failed", error=str(e))
+            backends.append(
+                ("supabase", lambda: self._supabase_search(question, fetch, query_embedding))
+            )
+        use_local_index = VECTOR_INDEX_MODE in ("primary", "fallback") and vector_index.ready
+
+        def local_search():
+            return self._local_search(question, fetch, query_embedding)
+
+        async def vector_stage() -> list[dict]:
+            hits = []
+            if use_local_index and VECTOR_INDEX_MODE == "primary":
+                hits = await self._timed_search("local_index", local_search)
+            if not hits and backends:
+                if self.retrieval_mode == "parallel" and len(backends) > 1:
+                    hits = await self._parallel_retrieve(backends, fetch)
+                elif self.retrieval_mode == "hedged" and len(backends) > 1:
+                    hits = await self._hedged_retrieve(backends)
+                else:
+                    hits = await self._sequential_retrieve(backends)
+            if not hits and use_local_index and VECTOR_INDEX_MODE == "fallback":
+                hits = await self._timed_search("local_index", local_search)
+            return hits
+
+        hits = []
+        if backends or use_local_index or use_lexical:
+            with stage_timer(
+                "retrieve", mode=self.retrieval_mode, hybrid=use_lexical
+            ) as retrieve_span:
+                if use_lexical:
+                    vector_hits, lexical_hits = await asyncio.gather(
+                        vector_stage(),
+                        self._timed_search("bm25", lambda: self._lexical_search(question, fetch)),
+                    )
+                    with span("retrieve.fusion"):
+                        hits = reciprocal_rank_fusion([vector_hits, lexical_hits], fetch, RRF_K)
+                    retrieve_span.set(vector_hits=len(vector_hits), lexical_hits=len(lexical_hits))
+                else:
+                    hits = await vector_stage()
+                if reranker.enabled and len(hits) > 1:
+                    with span("retrieve.rerank", mode=reranker.mode, candidates=len(hits)):
+                        hits = await reranker.rerank(question, hits, limit)
+                hits = hits[:limit]
+                retrieve_span.set(
+                    hits=len(hits),
+                    top_score=max((h.get("score", 0.0) for h in hits), default=0.0),
+                )
+
+        if hits:
+            return hits
 
         # Fallback: return development dummy context
         logger.info("using_fallback_context")
         return self._get_fallback_context(question)
 
-    async def _supabase_search(self, question: str, limit: int) -> list[dict]:
-        """Search Supabase using pgvector similarity."""
-        from supabase import create_client
+    async def _backend_search(self, question: str, user_id: str, limit: int) -> list[dict]:
+        """Query the external RAG backend's /retrieve endpoint."""
+
+        async def request():
+            response = await http_pool.post(
+                f"{self.rag_backend_url}/retrieve",
+                json={"query": question, "user_id": user_id, "limit": limit},
+                timeout=self.timeout,
+            )
+            response.raise_for_status()
+            return response.json().get("hits", [])
+
+        # No retries: hedging / fallback to pgvector covers a failed backend
+        return await call_with_breaker(breakers["rag_backend"], request)
+
+    async def _timed_search(self, name: str, search) -> list[dict]:
+        """Run one backend search, recording successful latencies per backend."""
+        started = time.perf_counter()
+
+        def observe(outcome: str) -> float:
+            elapsed = time.perf_counter() - started
+            RETRIEVAL_BACKEND_SECONDS.labels(backend=name, outcome=outcome).observe(elapsed)
+            return elapsed
 
         try:
-            # Initialize Supabase client
-            supabase = create_client(self.supabase_url, self.supabase_key)
-
-            # Generate embedding for question using OpenAI
-            logger.info("generating_question_embedding", question=question[:100])
-            embedding_response = openai_client.embeddings.create(
-                model="text-embedding-3-small",
-                input=question
+            with span(f"retrieve.{name}") as backend_span:
+                hits = await search()
+                backend_span.set(hits=len(hits))
+        except asyncio.CancelledError:
+            observe("cancelled")
+            logger.info("retrieval_cancelled", backend=name)
+            raise
+        except Exception as e:
+            observe("error")
+            logger.warning(f"{name}_failed", error=str(e))
+            return []
+
+        elapsed = observe("hit" if hits else "empty")
+        if hits:
+            self.latency[name].observe(elapsed)
+            logger.info(f"{name}_success", hits=len(hits))
+        return hits
+
+    def hedge_delay(self) -> float:
+        """
+        Seconds to wait on the primary backend before hedging.
+
+        Adaptive: the primary's recent p95 latency once enough samples exist,
+        clamped to [HEDGE_MIN_MS, HEDGE_MAX_MS]; HEDGE_DELAY_MS until then.
+        """
+        primary = self.latency["rag_backend"]
+        if len(primary) < self.hedge_min_samples:
+            return self.hedge_delay_default
+        return min(max(primary.percentile(95), self.hedge_min), self.hedge_max)
+
+    async def _sequential_retrieve(self, backends) -> list[dict]:
+        for name, search in backends:
+            hits = await self._timed_search(name, search)
+            if hits:
+                return hits
+        return []
+
+    async def _hedged_retrieve(self, backends) -> list[dict]:
+        (primary_name, primary_search), (secondary_name, secondary_search) = backends[:2]
+        primary = asyncio.create_task(self._timed_search(primary_name, primary_search))
+
+        delay = self.hedge_delay()
+        done, _ = await asyncio.wait({primary}, timeout=delay)
+        if primary in done and primary.result():
+            return primary.result()
+
+        logger.info("retrieval_hedged", after_ms=round(1000 * delay), backend=secondary_name)
+        secondary = asyncio.create_task(self._timed_search(secondary_name, secondary_search))
+        pending = {secondary} if primary in done else {primary, secondary}
+
+        try:
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.result():
+                        return task.result()
+            return []
+        finally:
+            for task in pending:
+                task.cancel()
+
+    async def _parallel_retrieve(self, backends, limit: int) -> list[dict]:
+        results = await asyncio.gather(
+            *(self._timed_search(name, search) for name, search in backends)
+        )
+
+        # Merge: keep the best score per chunk, then rank by score
+        merged: dict[str, dict] = {}
+        for hits in results:
+            for hit in hits:
+                key = _hit_key(hit)
+                if key not in merged or hit.get("score", 0.0) > merged[key].get("score", 0.0):
+                    merged[key] = hit
+        ranked = sorted(merged.values(), key=lambda h: h.get("score", 0.0), reverse=True)
+        return ranked[:limit]
+
+    async def embed_query(self, question: str) -> list[float]:
+        """Embed a question with the retrieval embedding model (memoized)."""
+        cached = embedding_cache.get(EMBEDDING_MODEL, question)
+        if cached is not None:
+            return cached
+
+        logger.info("generating_question_embedding", question=question[:100])
+
+        async def create():
+            async with openai_slots:
+                with stage_timer("embedding"):
+                    return await openai_client.embeddings.create(
+                        model=EMBEDDING_MODEL,
+                        input=question
+                    )
+
+        embedding_response = await call_with_breaker(
+            breakers["openai_embeddings"], create, attempts=2
+        )
+        record_token_usage(EMBEDDING_MODEL, embedding_response.usage)
+        embedding = embedding_response.data[0].embedding
+        embedding_cache.put(EMBEDDING_MODEL, question, embedding)
+        return embedding
+
+    async def embed_queries(self, questions: list[str]) -> list[list[float]]:
+        """Embed many questions with one embeddings call per EMBEDDING_BATCH_SIZE misses."""
+        embeddings: list[Optional[list[float]]] = [
+            embedding_cache.get(EMBEDDING_MODEL, q) for q in questions
+        ]
+        missing = [i for i, e in enumerate(embeddings) if e is None]
+
+        for start in range(0, len(missing), EMBEDDING_BATCH_SIZE):
+            batch = missing[start : start + EMBEDDING_BATCH_SIZE]
+
+            async def create():
+                async with openai_slots:
+                    with stage_timer("embedding", batch=len(batch)):
+                        return await openai_client.embeddings.create(
+                            model=EMBEDDING_MODEL,
+                            input=[questions[i] for i in batch],
+                        )
+
+            response = await call_with_breaker(breakers["openai_embeddings"], create, attempts=2)
+            record_token_usage(EMBEDDING_MODEL, response.usage)
+            for item in response.data:
+                index = batch[item.index]
+                embeddings[index] = item.embedding
+                embedding_cache.put(EMBEDDING_MODEL, questions[index], item.embedding)
+
+        return embeddings
+
+    async def _get_supabase(self):
+        """Return the shared Supabase client, creating it on first use."""
+        if self._supabase is not None:
+            return self._supabase
+
+        async with self._supabase_lock:
+            if self._supabase is None:
+                from supabase import create_client
+
+                self._supabase = await asyncio.to_thread(
+                    create_client, self.supabase_url, self.supabase_key
+                )
+                logger.info("supabase_client_created")
+        return self._supabase
+
+    async def _supabase_call(self, operation):
+        """
+        Run a blocking Supabase operation in a worker thread.
+
+        Calls go through the supabase_rpc breaker. On failure the shared
+        client is discarded, so the retry (budget permitting) runs on a
+        freshly built client (reconnect-on-failure).
+        """
+
+        async def attempt():
+            client = None
+            try:
+                client = await self._get_supabase()
+                result = await asyncio.to_thread(operation, client)
+            except Exception:
+                self._supabase_healthy = False
+                if client is not None and self._supabase is client:
+                    self._supabase = None
+                raise
+            self._supabase_healthy = True
+            return result
+
+        return await call_with_breaker(breakers["supabase_rpc"], attempt, attempts=2)
+
+    def supabase_health(self) -> str:
+        """
+        Supabase connectivity for /health: disabled, unknown, ok or down.
+
+        Never blocks: returns the last known state and, when it is older than
+        SUPABASE_HEALTH_TTL_SECONDS, refreshes it with a probe in the background.
+        """
+        if not (self.supabase_url and self.supabase_key):
+            return "disabled"
+
+        now = time.monotonic()
+        if now - self._supabase_checked_at >= self.supabase_health_ttl:
+            self._supabase_checked_at = now
+            asyncio.create_task(self._probe_supabase())
+
+        if self._supabase_healthy is None:
+            return "unknown"
+        return "ok" if self._supabase_healthy else "down"
+
+    async def _probe_supabase(self):
+        try:
+            await self._supabase_call(
+                lambda supabase: supabase.table("opex_embedding_sources")
+                .select("id")
+                .limit(1)
+                .execute()
             )
-            query_embedding = embedding_response.data[0].embedding
+        except Exception as e:
+            logger.warning("supabase_health_failed", error=str(e))
+
+    async def sources_version(self) -> Optional[str]:
+        """Fingerprint of opex_embedding_sources (row count + latest update)."""
+        if not (self.supabase_url and self.supabase_key):
+            return None
+
+        result = await self._supabase_call(
+            lambda supabase: supabase.table("opex_embedding_sources")
+            .select("updated_at", count="exact")
+            .order("updated_at", desc=True)
+            .limit(1)
+            .execute()
+        )
+        latest = result.data[0]["updated_at"] if result.data else ""
+        return f"{result.count}:{latest}"
+
+    async def _supabase_search(
+        self,
+        question: str,
+        limit: int,
+        query_embedding: Optional[list[float]] = None,
+    ) -> list[dict]:
+        """Search Supabase using pgvector similarity."""
+        try:
+            # Generate embedding for question using OpenAI (unless precomputed)
+            if query_embedding is None:
+                query_embedding = await self.embed_query(question)
 
             # Call match_opex_documents RPC function
             logger.info("calling_vector_search", limit=limit)
-            result = supabase.rpc(
-                'match_opex_documents',
-                {
-                    'query_embedding': query_embedding,
-                    'match_threshold': 0.7,
-                    'match_count': limit
-                }
-            ).execute()
-
-            # Format results to match expected structure
-            hits = []
-            for doc in result.data:
-                hits.append({
-                    'title': doc['title'] or 'Untitled Document',
-                    'snippet': doc['text'][:500],  # Truncate to 500 chars
-                    'url': f"opex:source:{doc['source_id']}",
-                    'score': doc['similarity']
-                })
+            with stage_timer("vector_search_rpc"):
+                result = await self._supabase_call(
+                    lambda supabase: supabase.rpc(
+                        'match_opex_documents',
+                        {
+                            'query_embedding': query_embedding,
+                            'match_threshold': MATCH_THRESHOLD,
+                            'match_count': limit
+                        }
+                    ).execute()
+                )
+
+            hits = [_format_match(doc) for doc in result.data]
 
             logger.info("vector_search_complete", hits=len(hits))
             return hits
@@ -115,6 +466,79 @@ class RAGClient:
             # Return empty to trigger fallback
             return []
 
+    async def _local_search(
+        self,
+        question: str,
+        limit: int,
+        query_embedding: Optional[list[float]] = None,
+    ) -> list[dict]:
+        """Top-k from the in-process vector index (no database round trip)."""
+        if query_embedding is None:
+            query_embedding = await self.embed_query(question)
+        matches = await asyncio.to_thread(
+            vector_index.search, query_embedding, limit, MATCH_THRESHOLD
+        )
+        return [_format_match(doc) for doc in matches]
+
+    async def _lexical_search(self, question: str, limit: int) -> list[dict]:
+        """Top-k from the in-process BM25 index."""
+        matches = await asyncio.to_thread(lexical_index.search, question, limit)
+        return [_format_match(doc) for doc in matches]
+
+    async def refresh_local_indexes(self):
+        """
+        Sync the local vector and BM25 indexes with Supabase when
+        opex_embedding_sources changed (one paged snapshot feeds both).
+        """
+        refresh_vectors = VECTOR_INDEX_MODE != "off"
+        refresh_lexical = HYBRID_SEARCH_ENABLED
+        version = await self.sources_version()
+        if version is None:
+            return
+        if refresh_vectors and version == vector_index.version and vector_index.ready:
+            refresh_vectors = False
+        if refresh_lexical and version == lexical_index.version and lexical_index.ready:
+            refresh_lexical = False
+        if not (refresh_vectors or refresh_lexical):
+            return
+
+        columns = (
+            "opex_documents!inner(source_id, text, metadata, "
+            "opex_embedding_sources!inner(title, status))"
+        )
+
+        rows = []
+        page = 1000
+        offset = 0
+        while True:
+            result = await self._supabase_call(
+                lambda supabase: supabase.table("opex_document_embeddings")
+                .select(f"document_id, {'embedding, ' if refresh_vectors else ''}{columns}")
+                .eq("model", EMBEDDING_MODEL)
+                .eq("opex_documents.opex_embedding_sources.status", "ready")
+                .order("document_id")
+                .range(offset, offset + page - 1)
+                .execute()
+            )
+            for row in result.data:
+                document = row["opex_documents"]
+                rows.append({
+                    "document_id": row["document_id"],
+                    "source_id": document["source_id"],
+                    "title": document["opex_embedding_sources"]["title"],
+                    "text": document["text"],
+                    "metadata": document.get("metadata") or {},
+                    "embedding": row.get("embedding"),
+                })
+            if len(result.data) < page:
+                break
+            offset += page
+
+        if refresh_vectors:
+            await asyncio.to_thread(vector_index.build, rows, version)
+        if refresh_lexical:
+            await asyncio.to_thread(lexical_index.sync, rows, version)
+
     def _get_fallback_context(self, question: str) -> list[dict]:
         """Development fallback context."""
         # Common OpEx topics with example content
@@ -155,26 +579,40 @@ class RAGClient:
                 }
             ]
 
-    @retry(
-        stop=stop_after_attempt(2),
-        wait=wait_exponential(multiplier=1, min=1, max=5),
-        reraise=True,
-    )
     async def synthesize(
-        self, question: str, context_docs: list[dict]
+        self,
+        question: str,
+        context_docs: list[dict],
+        on_token: Optional[Callable[[str], Awaitable[None]]] = None,
     ) -> tuple[str, list[str], float, str]:
         """
         Synthesize answer using OpenRouter (DeepSeek) with RAG context.
 
+        When `on_token` is given the completion is streamed and the callback
+        receives the answer text accumulated so far after every delta.
+
         Returns:
             (answer, citations, confidence_score, confidence_level)
         """
-        # Build prompt
-        prompt = build_rag_prompt(question, context_docs)
-
-        # Assess confidence before LLM call
+        # Assess confidence before LLM call (on everything retrieved)
         confidence_score, confidence_level = assess_confidence(context_docs)
 
+        if calibrator.should_escalate(confidence_score):
+            # Hopeless retrieval: skip packing and the LLM, route straight to a human
+            calibrator.early_exits += 1
+            logger.info(
+                "synthesis_skipped",
+                question=question[:100],
+                num_docs=len(context_docs),
+                confidence=round(confidence_score, 3),
+            )
+            return ESCALATION_ANSWER, "", confidence_score, "low"
+
+        # Fit the docs into the prompt-token budget; citations follow the
+        # packed docs so [Document N] numbering matches
+        context_docs = pack_context(context_docs, CONTEXT_TOKEN_BUDGET)
+        messages = RAG_PROMPT.messages(question, context_docs)
+
         logger.info(
             "synthesizing_answer",
             question=question[:100],
@@ -184,18 +622,16 @@ class RAGClient:
 
         # Call OpenAI with GPT-4o-mini
         try:
-            response = openai_client.chat.completions.create(
-                model="gpt-4o-mini",
-                messages=[
-                    {"role": "system", "content": SYSTEM_PROMPT},
-                    {"role": "user", "content": prompt}
-                ],
-                max_tokens=2048,
-                temperature=0.3,  # Lower temp for factual accuracy
-                stream=False
-            )
-
-            answer = response.choices[0].message.content
+            # A streamed answer cannot be retried once tokens were shown
+            with stage_timer(
+                "synthesize", num_docs=len(context_docs), streaming=on_token is not None
+            ) as synth_span:
+                answer = await call_with_breaker(
+                    breakers["openai_chat"],
+                    lambda: self._complete(messages, on_token),
+                    attempts=1 if on_token else 2,
+                )
+                synth_span.set(answer_length=len(answer))
 
             # Format citations
             citations = format_citations(context_docs)
@@ -220,29 +656,317 @@ Please try:
 Error: {str(e)[:100]}"""
             return fallback_answer, [], 0.0, "low"
 
+    async def _complete(
+        self,
+        messages: list[dict],
+        on_token: Optional[Callable[[str], Awaitable[None]]] = None,
+    ) -> str:
+        """Run the chat completion, streaming deltas to `on_token` if given."""
+        async with openai_slots:
+            response = await openai_client.chat.completions.create(
+                model=CHAT_MODEL,
+                messages=messages,
+                max_tokens=2048,
+                temperature=0.3,  # Lower temp for factual accuracy
+                stream=on_token is not None,
+                # Ask for a final usage chunk so streamed answers are metered too
+                extra_body={"stream_options": {"include_usage": True}} if on_token else None,
+            )
+
+            if on_token is None:
+                record_token_usage(CHAT_MODEL, response.usage)
+                return response.choices[0].message.content
+
+            parts = []
+            async for chunk in response:
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    parts.append(delta)
+                    await on_token("".join(parts))
+                record_token_usage(CHAT_MODEL, getattr(chunk, "usage", None))
+            return "".join(parts)
+
+
+def _format_match(doc: dict) -> dict:
+    """
+    Shape a match_opex_documents row (or local index row) as a retrieval hit.
+
+    `score` is the cosine similarity; BM25 rows have none and keep `bm25`.
+    """
+    title = doc['title'] or 'Untitled Document'
+    # Section breadcrumb recorded by the structure-aware chunker
+    heading_path = (doc.get('metadata') or {}).get('heading_path') or []
+    if heading_path:
+        title = f"{title} › {' > '.join(heading_path[-2:])}"
+    hit = {
+        'title': title,
+        'snippet': doc['text'][:SNIPPET_MAX_CHARS],
+        'url': f"opex:source:{doc['source_id']}",
+        'document_id': doc.get('document_id'),
+    }
+    if 'similarity' in doc:
+        hit['score'] = doc['similarity']
+    else:
+        hit['bm25'] = doc['bm25']
+    return hit
+
+
+def _hit_key(hit: dict) -> str:
+    """Identity of a chunk across backends (a source's chunks share one url)."""
+    return hit.get('document_id') or hit.get('url') or hit.get('title', '')
+
+
+def reciprocal_rank_fusion(result_lists: list[list[dict]], limit: int, k: int = 60) -> list[dict]:
+    """
+    Merge ranked hit lists by RRF: sum of 1 / (k + rank) over the lists a
+    chunk appears in. `score` keeps the best vector similarity seen for the
+    chunk, so keyword-only hits have none and confidence stays on the cosine
+    scale; `rrf_score` records the fusion.
+    """
+    fused: dict[str, dict] = {}
+    for hits in result_lists:
+        for rank, hit in enumerate(hits, 1):
+            key = _hit_key(hit)
+            entry = fused.get(key)
+            if entry is None:
+                entry = fused[key] = dict(hit, rrf_score=0.0)
+            else:
+                for field in ('score', 'bm25'):
+                    if field in hit and hit[field] > entry.get(field, float('-inf')):
+                        entry[field] = hit[field]
+            entry['rrf_score'] += 1.0 / (k + rank)
+    ranked = sorted(fused.values(), key=lambda h: h['rrf_score'], reverse=True)
+    return ranked[:limit]
+
 
 # Singleton instance
 rag_client = RAGClient()
 
+_sources_task: Optional[asyncio.Task] = None
+
+
+async def _poll_sources_version():
+    """Invalidate the answer cache when opex_embedding_sources changed."""
+    while True:
+        try:
+            version = await rag_client.sources_version()
+            if version is not None:
+                answer_cache.observe_source_version(version)
+        except Exception as e:
+            logger.warning("sources_version_check_failed", error=str(e))
+        await asyncio.sleep(SOURCES_POLL_SECONDS)
+
+
+async def start_sources_poller():
+    """Poll the sources version in the background, off the request path."""
+    global _sources_task
+    if ANSWER_CACHE_ENABLED and _sources_task is None:
+        _sources_task = asyncio.create_task(_poll_sources_version())
+
+
+async def stop_sources_poller():
+    global _sources_task
+    if _sources_task is not None:
+        _sources_task.cancel()
+        _sources_task = None
+
 
 async def retrieve_and_synthesize(
-    question: str, user_id: str
+    question: str,
+    user_id: str,
+    on_token: Optional[Callable[[str], Awaitable[None]]] = None,
 ) -> tuple[str, str, float, str]:
     """
-    Complete RAG pipeline: retrieve → synthesize → format.
+    Complete RAG pipeline: cache → retrieve → synthesize → format.
+
+    When the extractive fast path accepts the hits (see fast_path.py) the
+    answer is quoted from the top hit and the LLM is skipped.
+
+    `on_token` enables streaming synthesis (see RAGClient.synthesize); it is
+    never called for cached answers. Concurrent calls for the same normalized
+    question share one pipeline run; only the first caller's `on_token` sees
+    the stream, the others receive the finished result.
 
     Returns:
         (answer, citations_markdown, confidence_score, confidence_level)
     """
-    # Retrieve context
-    context_docs = await rag_client.retrieve(question, user_id)
+    if not SINGLE_FLIGHT_ENABLED:
+        return await _run_pipeline(question, user_id, on_token)
 
-    # Synthesize answer
-    answer, citations, confidence_score, confidence_level = await rag_client.synthesize(
-        question, context_docs
+    result, shared = await pipeline_flights.do(
+        question_key(question),
+        lambda: _run_pipeline(question, user_id, on_token),
     )
+    if shared:
+        logger.info("pipeline_result_shared", user_id=user_id, question=question[:100])
+    return result
+
+
+async def _run_pipeline(
+    question: str,
+    user_id: str,
+    on_token: Optional[Callable[[str], Awaitable[None]]],
+) -> tuple[str, str, float, str]:
+    cached, query_embedding = await _cached_answer(question)
+    if cached is not None:
+        return cached
+
+    # Retrieve context
+    context_docs = await rag_client.retrieve(
+        question, user_id, query_embedding=query_embedding
+    )
+    return await _answer(question, context_docs, query_embedding, on_token, user_id)
+
+
+async def _cached_answer(
+    question: str, query_embedding: Optional[list[float]] = None
+) -> tuple[Optional[tuple], Optional[list[float]]]:
+    """
+    Answer-cache lookup (exact, then near); returns (cached result or None,
+    question embedding if one was computed for the near lookup).
+    """
+    if not ANSWER_CACHE_ENABLED:
+        return None, query_embedding
+
+    cached = answer_cache.get(question)
+    if cached is not None:
+        logger.info("answer_cache_hit", kind="exact", question=question[:100])
+        return cached, query_embedding
+
+    if ANSWER_CACHE_SEMANTIC:
+        try:
+            if query_embedding is None:
+                query_embedding = await rag_client.embed_query(question)
+            cached = answer_cache.get_similar(query_embedding)
+            if cached is not None:
+                logger.info("answer_cache_hit", kind="near", question=question[:100])
+                return cached, query_embedding
+        except Exception as e:
+            logger.warning("question_embedding_failed", error=str(e))
+
+    answer_cache.record_miss()
+    return None, query_embedding
+
+
+async def _answer(
+    question: str,
+    context_docs: list[dict],
+    query_embedding: Optional[list[float]] = None,
+    on_token: Optional[Callable[[str], Awaitable[None]]] = None,
+    user_id: str = "",
+) -> tuple[str, str, float, str]:
+    """
+    Fast path or LLM synthesis over retrieved docs; caches real answers and
+    logs each one (with its retrieval scores) to rag_queries.
+    """
+    # FAQ-style questions with one dominant hit are answered extractively
+    with stage_timer("fast_path") as fast_span:
+        fast = fast_path.answer(question, context_docs)
+        fast_span.set(answered=fast is not None)
+    if fast is not None:
+        answer, confidence_score, confidence_level = fast
+        top = max(context_docs, key=lambda d: d.get("score", 0.0))
+        citations = format_citations([top])
+    else:
+        # Synthesize answer
+        answer, citations, confidence_score, confidence_level = await rag_client.synthesize(
+            question, context_docs, on_token=on_token
+        )
 
     # Format citations as markdown
     citations_md = f"**Sources**\n{citations}" if citations else "_No sources available._"
 
-    return answer, citations_md, confidence_score, confidence_level
+    result = (answer, citations_md, confidence_score, confidence_level)
+    query_log.record(
+        question=question,
+        answer=answer,
+        user_id=user_id,
+        context_docs=context_docs,
+        confidence_score=confidence_score,
+        confidence_level=confidence_level,
+        fast_path=fast is not None,
+    )
+
+    # Only cache real answers; synthesis errors come back without citations
+    if ANSWER_CACHE_ENABLED and citations:
+        answer_cache.put(question, result, query_embedding)
+
+    return result
+
+
+async def answer_batch(
+    questions: list[str],
+    user_id: str,
+    search_concurrency: int = 32,
+    synthesis_concurrency: int = 4,
+    use_cache: bool = True,
+) -> AsyncIterator[dict]:
+    """
+    Answer many questions, yielding one result dict per question as it finishes.
+
+    All questions are embedded up front in batched calls; cache lookups and
+    retrieval run `search_concurrency` wide while fast path / LLM synthesis
+    is limited to `synthesis_concurrency`, so a bulk run leaves LLM capacity
+    for interactive /ask users. Duplicate questions are answered once.
+    Answers are written to the answer cache (pre-warming it) either way;
+    `use_cache=False` only skips reading it.
+    """
+    unique: dict[str, list[int]] = {}
+    for index, question in enumerate(questions):
+        unique.setdefault(question_key(question), []).append(index)
+    firsts = [indices[0] for indices in unique.values()]
+
+    try:
+        embeddings = await rag_client.embed_queries([questions[i] for i in firsts])
+    except Exception as e:
+        logger.warning("batch_embedding_failed", error=str(e))
+        embeddings = [None] * len(firsts)
+
+    search_slots = asyncio.Semaphore(search_concurrency)
+    synthesis_slots = asyncio.Semaphore(synthesis_concurrency)
+
+    async def run(index: int, embedding: Optional[list[float]]) -> dict:
+        question = questions[index]
+        started = time.perf_counter()
+        cached = None
+        async with search_slots:
+            if use_cache:
+                cached, embedding = await _cached_answer(question, embedding)
+            if cached is None:
+                context_docs = await rag_client.retrieve(
+                    question, user_id, query_embedding=embedding
+                )
+        if cached is None:
+            async with synthesis_slots:
+                result = await _answer(question, context_docs, embedding, user_id=user_id)
+        else:
+            result = cached
+        answer, citations, confidence_score, confidence_level = result
+        return {
+            "index": index,
+            "question": question,
+            "answer": answer,
+            "citations": citations,
+            "confidence": round(confidence_score, 4),
+            "confidence_level": confidence_level,
+            "cached": cached is not None,
+            "duration_ms": round(1000 * (time.perf_counter() - started), 1),
+        }
+
+    async def guarded(index: int, embedding: Optional[list[float]]) -> dict:
+        try:
+            return await run(index, embedding)
+        except Exception as e:
+            logger.error("batch_question_failed", index=index, error=str(e))
+            return {"index": index, "question": questions[index], "error": str(e)[:200]}
+
+    tasks = [asyncio.create_task(guarded(i, e)) for i, e in zip(firsts, embeddings)]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            item = await next_done
+            for index in unique[question_key(questions[item["index"]])]:
+                yield dict(item, index=index, question=questions[index])
+    finally:
+        # Client went away: stop the remaining questions
+        for task in tasks:
+            task.cancel()
@@ -0,0 +1,221 @@
+"""Optional second-stage reranker for retrieved chunks, bounded by a latency budget."""
+
+import asyncio
+import json
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Optional
+
+import numpy as np
+import structlog
+
+from latency import LatencyTracker
+from lexical_index import lexical_index, tokenize
+
+logger = structlog.get_logger()
+
+# Linear weights of the lexical scorer's features; replace with fitted ones
+# through RERANK_WEIGHTS_PATH (a JSON object with the same keys)
+DEFAULT_WEIGHTS = {
+    "coverage": 2.0,  # IDF-weighted share of query terms found in the chunk
+    "bigrams": 1.0,  # share of adjacent query term pairs found adjacent
+    "identifiers": 1.5,  # share of codes/identifiers (1601-c, wht-2) found
+    "title": 0.5,  # IDF-weighted share of query terms in the title/heading
+    "prior": 1.0,  # first-stage similarity (0-1)
+}
+
+
+def _sigmoid(x: np.ndarray) -> np.ndarray:
+    return 1.0 / (1.0 + np.exp(-x))
+
+
+class Reranker:
+    """
+    Rescore over-fetched candidates and keep the best `limit`.
+
+    mode "lexical" is a vectorized feature scorer (no model, ~1 ms for 50
+    candidates); "cross-encoder" runs a sentence-transformers CrossEncoder
+    over (question, chunk) pairs in batches. If scoring does not finish
+    within `budget` seconds the first-stage order is returned unchanged.
+
+    Scoring runs on its own pool of `threads` threads, not the default
+    executor that Supabase calls share: a timed-out scoring call keeps its
+    thread until it finishes, and while every thread is taken reranking is
+    skipped instead of queued.
+    """
+
+    def __init__(
+        self,
+        mode: str = "off",
+        candidates: int = 50,
+        budget: float = 0.15,
+        min_ratio: float = 0.0,
+        model_name: str = "cross-encoder/ms-marco-MiniLM-L-6-v2",
+        batch_size: int = 32,
+        weights_path: Optional[str] = None,
+        threads: int = 2,
+    ):
+        self.mode = mode
+        self.candidates = candidates
+        self.budget = budget
+        # Drop reranked chunks scoring below min_ratio * best score
+        self.min_ratio = min_ratio
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.weights = dict(DEFAULT_WEIGHTS)
+        if weights_path:
+            with open(weights_path) as f:
+                self.weights.update(json.load(f))
+
+        self._model = None
+        self.threads = threads
+        self._executor = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="rerank")
+        self._busy = 0
+        self._busy_lock = threading.Lock()
+        self.latency = LatencyTracker()
+        self.reranks = 0
+        self.timeouts = 0
+        self.errors = 0
+        self.saturated = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.mode in ("lexical", "cross-encoder")
+
+    def warm_up(self):
+        """Load the cross-encoder (blocking); fall back to lexical if unavailable."""
+        if self.mode != "cross-encoder" or self._model is not None:
+            return
+        try:
+            from sentence_transformers import CrossEncoder
+
+            self._model = CrossEncoder(self.model_name, device="cpu")
+            self._model.predict([("warm up", "warm up")])
+            logger.info("reranker_loaded", model=self.model_name)
+        except Exception as e:
+            logger.warning("reranker_load_failed", model=self.model_name, error=str(e))
+            self.mode = "lexical"
+
+    # ---------- scoring ----------
+
+    def lexical_scores(self, question: str, hits: list[dict]) -> np.ndarray:
+        query = list(dict.fromkeys(tokenize(question)))
+        if not query:
+            return np.array([h.get("score", 0.0) for h in hits], dtype=np.float32)
+        term_ids = {t: i for i, t in enumerate(query)}
+        idf = lexical_index.idf(query)
+        idf_total = float(idf.sum())
+        is_identifier = np.array([any(c.isdigit() for c in t) or "-" in t for t in query])
+        query_bigrams = set(zip(query, query[1:]))
+
+        n = len(hits)
+        in_body = np.zeros((n, len(query)), dtype=np.float32)
+        in_title = np.zeros((n, len(query)), dtype=np.float32)
+        bigrams = np.zeros(n, dtype=np.float32)
+        for row, hit in enumerate(hits):
+            body = tokenize(hit.get("snippet", ""))
+            for token in body:
+                col = term_ids.get(token)
+                if col is not None:
+                    in_body[row, col] = 1.0
+            for token in tokenize(hit.get("title", "")):
+                col = term_ids.get(token)
+                if col is not None:
+                    in_title[row, col] = 1.0
+            if query_bigrams:
+                bigrams[row] = len(query_bigrams & set(zip(body, body[1:]))) / len(query_bigrams)
+
+        features = {
+            "coverage": in_body @ idf / idf_total,
+            "bigrams": bigrams,
+            "identifiers": (
+                in_body[:, is_identifier].mean(axis=1) if is_identifier.any() else np.zeros(n)
+            ),
+            "title": in_title @ idf / idf_total,
+            "prior": np.array([h.get("score", 0.0) for h in hits], dtype=np.float32),
+        }
+        return sum(self.weights.get(name, 0.0) * values for name, values in features.items())
+
+    def cross_encoder_scores(self, question: str, hits: list[dict]) -> np.ndarray:
+        pairs = [(question, f"{h.get('title', '')}\n{h.get('snippet', '')}") for h in hits]
+        logits = self._model.predict(pairs, batch_size=self.batch_size, show_progress_bar=False)
+        return _sigmoid(np.asarray(logits, dtype=np.float32))
+
+    def score(self, question: str, hits: list[dict]) -> np.ndarray:
+        if self.mode == "cross-encoder" and self._model is not None:
+            return self.cross_encoder_scores(question, hits)
+        return self.lexical_scores(question, hits)
+
+    def _score_on_pool(self, question: str, hits: list[dict]) -> np.ndarray:
+        try:
+            return self.score(question, hits)
+        finally:
+            with self._busy_lock:
+                self._busy -= 1
+
+    # ---------- rerank ----------
+
+    async def rerank(self, question: str, hits: list[dict], limit: int) -> list[dict]:
+        """Best `limit` hits by rerank score, or the first `limit` on timeout/error."""
+        if len(hits) < 2:
+            return hits[:limit]
+        with self._busy_lock:
+            if self._busy >= self.threads:
+                self.saturated += 1
+                return hits[:limit]
+            self._busy += 1
+        started = time.perf_counter()
+        try:
+            scores = await asyncio.wait_for(
+                asyncio.get_running_loop().run_in_executor(
+                    self._executor, self._score_on_pool, question, hits
+                ),
+                timeout=self.budget,
+            )
+        except asyncio.TimeoutError:
+            # The pool thread finishes in the background; its result is discarded
+            self.timeouts += 1
+            logger.warning("rerank_budget_exceeded", candidates=len(hits), budget_ms=1000 * self.budget)
+            return hits[:limit]
+        except Exception as e:
+            self.errors += 1
+            logger.warning("rerank_failed", error=str(e))
+            return hits[:limit]
+        self.latency.observe(time.perf_counter() - started)
+        self.reranks += 1
+
+        order = np.argsort(-scores, kind="stable")[:limit]
+        floor = self.min_ratio * float(scores[order[0]])
+        return [
+            dict(hits[i], rerank_score=float(scores[i]))
+            for i in order
+            if scores[i] >= floor
+        ]
+
+    def stats(self) -> dict:
+        return {
+            "mode": self.mode,
+            "candidates": self.candidates,
+            "budget_ms": round(1000 * self.budget),
+            "reranks": self.reranks,
+            "timeouts": self.timeouts,
+            "errors": self.errors,
+            "threads": self.threads,
+            "busy": self._busy,
+            "saturated": self.saturated,
+            "latency": self.latency.stats(),
+        }
+
+
+reranker = Reranker(
+    mode=os.getenv("RERANK_MODE", "off").lower(),
+    candidates=int(os.getenv("RERANK_CANDIDATES", "50")),
+    budget=float(os.getenv("RERANK_BUDGET_MS", "150")) / 1000,
+    min_ratio=float(os.getenv("RERANK_MIN_RATIO", "0")),
+    model_name=os.getenv("RERANK_MODEL", "cross-encoder/ms-marco-MiniLM-L-6-v2"),
+    batch_size=int(os.getenv("RERANK_BATCH_SIZE", "32")),
+    weights_path=os.getenv("RERANK_WEIGHTS_PATH") or None,
+    threads=int(os.getenv("RERANK_THREADS", "2")),
+)
@@ -0,0 +1,58 @@
+"""Single-flight request coalescing: concurrent identical calls share one execution."""
+
+import asyncio
+from typing import Any, Awaitable, Callable
+
+import structlog
+
+logger = structlog.get_logger()
+
+
+class SingleFlight:
+    """
+    Deduplicate concurrent work by key.
+
+    The first caller for a key (the leader) starts the work as a task; callers
+    arriving while it is still running await the same task. The task is
+    shielded, so a cancelled caller never cancels the shared work for others.
+    """
+
+    def __init__(self):
+        self._calls: dict[str, asyncio.Task] = {}
+        self.executed = 0
+        self.coalesced = 0
+
+    async def do(self, key: str, fn: Callable[[], Awaitable[Any]]) -> tuple[Any, bool]:
+        """
+        Run `fn` once per key among concurrent callers.
+
+        Returns:
+            (result, shared) - shared is True when the result came from
+            another caller's in-flight execution.
+        """
+        task = self._calls.get(key)
+        if task is not None:
+            self.coalesced += 1
+            logger.info("single_flight_coalesced", key=key[:12])
+            return await asyncio.shield(task), True
+
+        task = asyncio.ensure_future(fn())
+        self._calls[key] = task
+        self.executed += 1
+
+        def _forget(done: asyncio.Task):
+            if self._calls.get(key) is done:
+                del self._calls[key]
+
+        task.add_done_callback(_forget)
+        return await asyncio.shield(task), False
+
+    def stats(self) -> dict:
+        return {
+            "in_flight": len(self._calls),
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+        }
+
+
+pipeline_flights = SingleFlight()
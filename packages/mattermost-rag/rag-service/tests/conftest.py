@@ -0,0 +1,10 @@
+import os
+import sys
+
+_SERVICE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Service modules are flat files in rag-service/
+sys.path.insert(0, _SERVICE_DIR)
+# Ingestion CLIs (chunking, ingest_documents, ingest_corpus) live in ../scripts
+sys.path.insert(0, os.path.join(os.path.dirname(_SERVICE_DIR), "scripts"))
+os.environ.setdefault("OPENAI_API_KEY", "test")
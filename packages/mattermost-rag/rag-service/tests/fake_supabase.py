@@ -0,0 +1,141 @@
+"""In-memory stand-in for the supabase-py table API used by the ingestion scripts."""
+
+import uuid
+from types import SimpleNamespace
+
+_EMBEDDINGS = "opex_document_embeddings"
+
+
+class FakeSupabase:
+    def __init__(self):
+        self.tables: dict[str, list[dict]] = {}
+        self.in_sizes: list[int] = []
+        self.fail_inserts_into: set[str] = set()
+
+    def table(self, name: str) -> "_Query":
+        return _Query(self, name)
+
+    def rows(self, name: str) -> list[dict]:
+        return self.tables.setdefault(name, [])
+
+
+class _Query:
+    def __init__(self, db: FakeSupabase, name: str):
+        self.db = db
+        self.name = name
+        self.op = "select"
+        self.columns = "*"
+        self.filters = []
+        self.payload = None
+        self.on_conflict = None
+        self.order_by = None
+        self.window = None
+
+    def select(self, columns="*", count=None):
+        self.columns = columns
+        return self
+
+    def insert(self, rows):
+        self.op, self.payload = "insert", rows if isinstance(rows, list) else [rows]
+        return self
+
+    def upsert(self, rows, on_conflict=""):
+        self.op, self.payload, self.on_conflict = "upsert", rows, on_conflict.split(",")
+        return self
+
+    def update(self, values):
+        self.op, self.payload = "update", values
+        return self
+
+    def delete(self):
+        self.op = "delete"
+        return self
+
+    def eq(self, column, value):
+        self.filters.append(lambda row: row.get(column) == value)
+        return self
+
+    def in_(self, column, values):
+        values = list(values)
+        self.db.in_sizes.append(len(values))
+        self.filters.append(lambda row: row.get(column) in values)
+        return self
+
+    def order(self, column, desc=False):
+        self.order_by = (column, desc)
+        return self
+
+    def range(self, start, end):
+        self.window = (start, end + 1)
+        return self
+
+    def limit(self, n):
+        self.window = (0, n)
+        return self
+
+    def _matching(self):
+        return [row for row in self.db.rows(self.name) if all(f(row) for f in self.filters)]
+
+    def execute(self):
+        rows = self.db.rows(self.name)
+        if self.op in ("insert", "upsert") and self.name in self.db.fail_inserts_into:
+            raise RuntimeError(f"insert into {self.name} failed")
+        if self.op == "insert":
+            data = [dict(row, id=row.get("id") or str(uuid.uuid4())) for row in self.payload]
+            rows.extend(data)
+        elif self.op == "upsert":
+            data = []
+            for new in self.payload:
+                match = next(
+                    (r for r in rows if all(r.get(k) == new.get(k) for k in self.on_conflict)), None
+                )
+                if match is None:
+                    match = dict(new, id=str(uuid.uuid4()))
+                    rows.append(match)
+                else:
+                    match.update(new)
+                data.append(match)
+        elif self.op == "update":
+            data = self._matching()
+            for row in data:
+                row.update(self.payload)
+        elif self.op == "delete":
+            data = self._matching()
+            ids = {row["id"] for row in data}
+            self.db.tables[self.name] = [r for r in rows if r["id"] not in ids]
+            # ON DELETE CASCADE
+            self.db.tables[_EMBEDDINGS] = [
+                e for e in self.db.rows(_EMBEDDINGS) if e["document_id"] not in ids
+            ]
+        else:
+            data = [dict(row) for row in self._matching()]
+            if _EMBEDDINGS in self.columns:
+                for row in data:
+                    row[_EMBEDDINGS] = [
+                        e for e in self.db.rows(_EMBEDDINGS) if e["document_id"] == row["id"]
+                    ]
+            if self.order_by:
+                column, desc = self.order_by
+                data.sort(key=lambda r: r.get(column) or "", reverse=desc)
+            if self.window:
+                data = data[self.window[0] : self.window[1]]
+        return SimpleNamespace(data=data, count=len(data))
+
+
+class FakeEmbeddings:
+    """AsyncOpenAI().embeddings stand-in: deterministic vectors, records inputs."""
+
+    def __init__(self):
+        self.inputs: list[str] = []
+
+    async def create(self, model, input):
+        self.inputs.extend(input)
+        data = [
+            SimpleNamespace(index=i, embedding=[float(len(text)), float(i)])
+            for i, text in enumerate(input)
+        ]
+        return SimpleNamespace(data=data)
+
+
+def fake_openai() -> SimpleNamespace:
+    return SimpleNamespace(embeddings=FakeEmbeddings())
@@ -0,0 +1,71 @@
+import asyncio
+
+import pytest
+
+from admission import AdmissionController, QueueFullError
+
+
+def test_reserve_reports_queue_position_then_sheds():
+    admission = AdmissionController(max_in_flight=2, max_queue=1)
+
+    assert [admission.reserve() for _ in range(3)] == [0, 0, 1]
+    with pytest.raises(QueueFullError):
+        admission.reserve()
+
+    stats = admission.stats()
+    assert stats["admitted_total"] == 3
+    assert stats["queued_total"] == 1
+    assert stats["shed_total"] == 1
+
+
+def test_queued_request_waits_for_a_permit_and_frees_its_place():
+    admission = AdmissionController(max_in_flight=1, max_queue=1)
+    order = []
+
+    async def run(name, release=None, started=None):
+        async with admission.slot():
+            order.append(f"{name} start")
+            if started:
+                started.set()
+            if release:
+                await release.wait()
+            order.append(f"{name} end")
+
+    async def main():
+        release, started = asyncio.Event(), asyncio.Event()
+        assert admission.reserve() == 0
+        first = asyncio.create_task(run("first", release, started))
+        await started.wait()
+
+        assert admission.reserve() == 1
+        second = asyncio.create_task(run("second"))
+        await asyncio.sleep(0.01)
+        assert admission.running == 1
+        assert admission.waiting == 1
+        with pytest.raises(QueueFullError):
+            admission.reserve()
+
+        release.set()
+        await asyncio.gather(first, second)
+
+    asyncio.run(main())
+
+    assert order == ["first start", "first end", "second start", "second end"]
+    assert admission.pending == 0
+    assert admission.running == 0
+    assert admission.reserve() == 0
+
+
+def test_slot_releases_its_place_when_the_pipeline_fails():
+    admission = AdmissionController(max_in_flight=1, max_queue=0)
+
+    async def fail():
+        async with admission.slot():
+            raise RuntimeError("boom")
+
+    admission.reserve()
+    with pytest.raises(RuntimeError):
+        asyncio.run(fail())
+
+    assert admission.pending == 0
+    assert admission.reserve() == 0
@@ -0,0 +1,41 @@
+import pytest
+from fastapi.testclient import TestClient
+
+import main
+
+
+@pytest.fixture
+def client(monkeypatch):
+    monkeypatch.setattr(main, "RAG_BATCH_TOKEN", "secret")
+
+    async def answer_batch(questions, user_id, **kwargs):
+        for index, question in enumerate(questions):
+            yield {"index": index, "question": question, "answer": "a", "cached": False}
+
+    monkeypatch.setattr(main, "answer_batch", answer_batch)
+    return TestClient(main.app)
+
+
+def post(client, questions):
+    return client.post(
+        "/rag/batch", json={"questions": questions}, headers={"Authorization": "Bearer secret"}
+    )
+
+
+@pytest.mark.parametrize(
+    "questions",
+    [
+        [],
+        ["ok", "   "],
+        ["ok", "x" * (main.MAX_QUESTION_CHARS + 1)],
+        ["q"] * (main.RAG_BATCH_MAX_QUESTIONS + 1),
+    ],
+)
+def test_rejects_invalid_batches(client, questions):
+    assert post(client, questions).status_code == 422
+
+
+def test_accepts_valid_batch(client):
+    response = post(client, ["  how do I rotate keys?  ", "x" * main.MAX_QUESTION_CHARS])
+    assert response.status_code == 200
+    assert '"question": "how do I rotate keys?"' in response.text
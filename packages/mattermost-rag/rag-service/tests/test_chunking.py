@@ -0,0 +1,97 @@
+import pytest
+
+import chunking
+from chunking import chunk_file, chunk_markdown, iter_blocks
+
+
+@pytest.fixture(autouse=True)
+def word_tokens(monkeypatch):
+    """One token per word, whether or not tiktoken is available."""
+    monkeypatch.setattr(chunking, "count_tokens", lambda text: len(text.split()))
+
+
+def words(n, prefix="w"):
+    return " ".join(f"{prefix}{i}" for i in range(n))
+
+
+def test_chunks_never_exceed_max_tokens_and_never_overlap():
+    paragraphs = [f"{words(30, f'p{i}-')}." for i in range(10)]
+    doc = "\n\n".join(paragraphs).splitlines(keepends=True)
+
+    chunks = list(chunk_markdown(doc, max_tokens=100, min_tokens=10))
+
+    assert [c.index for c in chunks] == list(range(len(chunks)))
+    assert all(c.token_count <= 100 for c in chunks)
+    # Paragraphs are packed whole, each exactly once, in order
+    assert [p for c in chunks for p in c.text.split("\n\n")] == paragraphs
+
+
+def test_oversized_paragraph_splits_on_sentence_boundaries():
+    sentences = [f"Sentence {i} {words(20)}." for i in range(6)]
+
+    chunks = list(chunk_markdown([" ".join(sentences)], max_tokens=50, min_tokens=10))
+
+    assert len(chunks) > 1
+    assert all(c.token_count <= 50 for c in chunks)
+    for chunk in chunks:
+        assert chunk.text.startswith("Sentence ")
+        assert chunk.text.endswith(".")
+    assert " ".join(c.text for c in chunks) == " ".join(sentences)
+
+
+def test_single_sentence_longer_than_max_splits_on_words():
+    text = words(25)
+
+    chunks = list(chunk_markdown([text], max_tokens=10, min_tokens=1))
+
+    assert [c.token_count for c in chunks] == [10, 10, 5]
+    assert " ".join(c.text for c in chunks) == text
+
+
+def test_new_section_starts_new_chunk_with_heading_path():
+    doc = [
+        "# Deployment Guide\n",
+        f"{words(20)}\n",
+        "## Troubleshooting\n",
+        f"{words(20, 't')}\n",
+    ]
+
+    chunks = list(chunk_markdown(doc, max_tokens=100, min_tokens=10))
+
+    assert [c.heading_path for c in chunks] == [
+        ["Deployment Guide"],
+        ["Deployment Guide", "Troubleshooting"],
+    ]
+    assert chunks[1].embedding_input().startswith("Deployment Guide > Troubleshooting\n\n")
+
+
+def test_tiny_sections_merge_forward_under_the_common_parent():
+    doc = ["# Guide\n", "## Setup\n", "Short.\n", "## Usage\n", "Also short.\n"]
+
+    chunks = list(chunk_markdown(doc, max_tokens=100, min_tokens=10))
+
+    assert len(chunks) == 1
+    assert chunks[0].heading_path == ["Guide"]
+    assert chunks[0].text == "Short.\n\nAlso short."
+
+
+def test_code_fence_is_one_block_and_hash_is_not_a_heading():
+    doc = ["# Title\n", "```bash\n", "# not a heading\n", "", "echo hi\n", "```\n", "After.\n"]
+
+    blocks = list(iter_blocks(doc))
+
+    assert blocks == [
+        (["Title"], "```bash\n# not a heading\n\necho hi\n```"),
+        (["Title"], "After."),
+    ]
+
+
+def test_chunk_file_streams_from_disk(tmp_path):
+    path = tmp_path / "guide.md"
+    path.write_text("# Guide\n\nFirst paragraph.\n\nSecond paragraph.\n", encoding="utf-8")
+
+    chunks = list(chunk_file(path, max_tokens=100, min_tokens=1))
+
+    assert len(chunks) == 1
+    assert chunks[0].text == "First paragraph.\n\nSecond paragraph."
+    assert chunks[0].metadata == {"heading_path": ["Guide"]}
@@ -0,0 +1,41 @@
+import asyncio
+
+import pytest
+
+from circuit_breaker import CLOSED, HALF_OPEN, CircuitBreaker, call_with_breaker
+
+
+def half_open_breaker() -> CircuitBreaker:
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=0.0)
+    breaker.record_failure()
+    assert breaker.state == HALF_OPEN
+    return breaker
+
+
+def test_cancelled_half_open_trial_releases_slot():
+    breaker = half_open_breaker()
+
+    async def scenario():
+        trial = asyncio.create_task(call_with_breaker(breaker, lambda: asyncio.sleep(10)))
+        await asyncio.sleep(0)
+        trial.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await trial
+
+        # The next call is allowed as a trial and closes the breaker
+        async def ok():
+            return "ok"
+
+        return await call_with_breaker(breaker, ok)
+
+    assert asyncio.run(scenario()) == "ok"
+    assert breaker.state == CLOSED
+
+
+def test_failed_half_open_trial_reopens():
+    breaker = CircuitBreaker("test", failure_threshold=1, reset_timeout=60.0)
+    breaker.record_failure()
+    breaker._opened_at -= 60.0
+    assert breaker.allow()
+    breaker.record_failure()
+    assert not breaker.allow()
@@ -0,0 +1,23 @@
+from context_packer import pack_context
+
+
+def test_keeps_retrieval_order():
+    docs = [
+        {"title": "fused first", "snippet": "Restart the ingest worker after rotating keys.", "rrf_score": 0.03},
+        {"title": "high cosine", "snippet": "Key rotation happens every ninety days.", "score": 0.91},
+        {"title": "keyword only", "snippet": "Rotate keys from the admin console.", "bm25": 12.0},
+    ]
+
+    packed = pack_context(docs, token_budget=1000)
+
+    assert [d["title"] for d in packed] == ["fused first", "high cosine", "keyword only"]
+
+
+def test_trims_and_drops_from_the_tail():
+    long_text = " ".join(f"Sentence number {i} is here." for i in range(200))
+    docs = [{"title": "a", "snippet": long_text}, {"title": "b", "snippet": "Short one about b."}]
+
+    packed = pack_context(docs, token_budget=200, min_tokens=30)
+
+    assert [d["title"] for d in packed] == ["a"]
+    assert len(packed[0]["snippet"]) < len(long_text)
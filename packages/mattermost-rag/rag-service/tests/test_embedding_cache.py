@@ -0,0 +1,87 @@
+import numpy as np
+
+from embedding_cache import EmbeddingCache
+
+DIM = 4
+ROW_BYTES = DIM * 4
+
+
+def vec(x):
+    return [float(x)] * DIM
+
+
+def release(cache):
+    """Drop the directory lock, as a worker exit would."""
+    cache.flush()
+    cache._lock_file.close()
+
+
+def test_lru_eviction_and_normalized_keys():
+    cache = EmbeddingCache(dim=DIM, max_bytes=2 * ROW_BYTES)
+    cache.put("m", "How do I file?", vec(1))
+    cache.put("m", "payroll", vec(2))
+    assert cache.get("m", "  how do I FILE?  ") == vec(1)
+
+    cache.put("m", "leave", vec(3))
+
+    assert cache.get("m", "payroll") is None
+    assert cache.get("m", "how do i file?") == vec(1)
+    assert cache.get("other-model", "leave") is None
+    assert cache.evictions == 1
+
+
+def test_mmap_cache_survives_restart(tmp_path):
+    cache = EmbeddingCache(dim=DIM, max_bytes=4 * ROW_BYTES, path=str(tmp_path))
+    cache.put("m", "payroll", vec(1))
+    cache.put("m", "leave", vec(2))
+    assert isinstance(cache._vectors, np.memmap)
+    release(cache)
+
+    reloaded = EmbeddingCache(dim=DIM, max_bytes=4 * ROW_BYTES, path=str(tmp_path))
+
+    assert reloaded.stats()["persistent"] is True
+    assert reloaded.get("m", "payroll") == vec(1)
+    assert reloaded.get("m", "leave") == vec(2)
+
+
+def test_reload_drops_entries_whose_rows_were_reused_after_flush(tmp_path):
+    cache = EmbeddingCache(dim=DIM, max_bytes=1 * ROW_BYTES, path=str(tmp_path))
+    cache.put("m", "payroll", vec(1))
+    cache.flush()
+    # Evicts "payroll" and overwrites its row, but the index on disk is not rewritten
+    cache.put("m", "leave", vec(2))
+    cache._vectors.flush()
+    cache._fingerprints.flush()
+    cache._lock_file.close()
+
+    reloaded = EmbeddingCache(dim=DIM, max_bytes=1 * ROW_BYTES, path=str(tmp_path))
+
+    assert reloaded.get("m", "payroll") is None
+    assert reloaded.stats()["entries"] == 0
+
+
+def test_dimension_change_starts_a_fresh_cache(tmp_path):
+    cache = EmbeddingCache(dim=DIM, max_bytes=4 * ROW_BYTES, path=str(tmp_path))
+    cache.put("m", "payroll", vec(1))
+    release(cache)
+
+    resized = EmbeddingCache(dim=2 * DIM, max_bytes=8 * ROW_BYTES, path=str(tmp_path))
+
+    assert resized.stats()["entries"] == 0
+    assert resized.get("m", "payroll") is None
+
+
+def test_second_process_falls_back_to_memory(tmp_path):
+    owner = EmbeddingCache(dim=DIM, max_bytes=4 * ROW_BYTES, path=str(tmp_path))
+    other = EmbeddingCache(dim=DIM, max_bytes=4 * ROW_BYTES, path=str(tmp_path))
+
+    assert owner.stats()["persistent"] is True
+    assert other.stats()["persistent"] is False
+    assert not isinstance(other._vectors, np.memmap)
+
+    # The in-memory cache still works and never writes to the owner's files
+    other.put("m", "payroll", vec(9))
+    other.flush()
+    assert other.get("m", "payroll") == vec(9)
+    release(owner)
+    assert EmbeddingCache(dim=DIM, max_bytes=4 * ROW_BYTES, path=str(tmp_path)).get("m", "payroll") is None
@@ -0,0 +1,80 @@
+import pytest
+
+import fast_path as fast_path_module
+from fast_path import ExtractiveFastPath
+
+FAQ = (
+    "Payroll runs twice a month. The payroll cutoff is the 25th at noon. "
+    "Late timesheets roll over to the next run."
+)
+
+
+def docs(top=0.95, runner_up=0.80):
+    return [
+        {"title": "Team FAQ", "snippet": FAQ, "url": "https://wiki/faq", "score": top},
+        {"title": "Handbook", "snippet": "Unrelated text.", "url": "https://wiki/hb", "score": runner_up},
+    ]
+
+
+@pytest.fixture
+def confidence(monkeypatch):
+    """Set the calibrated confidence the gate sees."""
+    value = {"score": 0.95}
+    monkeypatch.setattr(
+        fast_path_module.calibrator,
+        "assess",
+        lambda hits: (value["score"], "high" if value["score"] >= 0.85 else "medium"),
+    )
+    return value
+
+
+def test_answers_from_the_dominant_hit(confidence):
+    result = ExtractiveFastPath(enabled=True).answer("When is the payroll cutoff?", docs())
+
+    assert result is not None
+    answer, score, level = result
+    assert answer.startswith("> ")
+    assert "The payroll cutoff is the 25th at noon." in answer
+    assert "[source: Document 1]" in answer
+    assert (score, level) == (0.95, "high")
+
+
+@pytest.mark.parametrize(
+    "calibrated, hits",
+    [
+        (0.85, docs()),  # calibrated confidence below min_confidence
+        (0.95, docs(top=0.87, runner_up=0.70)),  # top similarity below min_score
+        (0.95, docs(top=0.95, runner_up=0.92)),  # runner-up too close
+    ],
+)
+def test_gate_falls_back_to_the_llm(confidence, calibrated, hits):
+    confidence["score"] = calibrated
+    fast = ExtractiveFastPath(enabled=True)
+
+    assert fast.answer("When is the payroll cutoff?", hits) is None
+    assert fast.stats()["answers"] == 0
+
+
+def test_disabled_or_without_hits_never_answers(confidence):
+    assert ExtractiveFastPath(enabled=False).answer("payroll cutoff", docs()) is None
+    assert ExtractiveFastPath(enabled=True).answer("payroll cutoff", []) is None
+
+
+def test_declines_when_no_sentence_matches_the_question(confidence):
+    fast = ExtractiveFastPath(enabled=True)
+
+    assert fast.answer("vacation carryover", docs()) is None
+    assert fast.declined == 1
+
+
+def test_domain_overrides_match_the_top_title(confidence):
+    fast = ExtractiveFastPath(
+        enabled=True, domains={"*faq*": {"min_score": 0.99}, "handbook*": {"enabled": False}}
+    )
+
+    assert fast.settings_for("Team FAQ")["min_score"] == 0.99
+    assert fast.answer("When is the payroll cutoff?", docs()) is None
+
+    # The handbook hit ranks first here, and its domain has the fast path off
+    assert fast.settings_for("Handbook")["enabled"] is False
+    assert fast.answer("When is the payroll cutoff?", docs(top=0.80, runner_up=0.95)) is None
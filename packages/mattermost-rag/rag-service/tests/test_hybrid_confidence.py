@@ -0,0 +1,28 @@
+from calibration import ConfidenceCalibrator
+from prompts import format_citations
+from rag_client import reciprocal_rank_fusion
+
+
+def test_rrf_score_is_vector_similarity_only():
+    vector = [{"document_id": "a", "score": 0.62}, {"document_id": "b", "score": 0.55}]
+    lexical = [{"document_id": "c", "bm25": 14.0}, {"document_id": "a", "bm25": 9.0}]
+
+    fused = {hit["document_id"]: hit for hit in reciprocal_rank_fusion([vector, lexical], limit=3)}
+
+    assert fused["a"]["score"] == 0.62
+    assert fused["a"]["bm25"] == 9.0
+    assert "score" not in fused["c"]
+
+
+def test_keyword_only_hits_excluded_from_confidence():
+    calibrator = ConfidenceCalibrator()
+    vector_only = [{"score": 0.62}, {"score": 0.55}]
+    hybrid = [{"bm25": 14.0}] + vector_only
+
+    assert calibrator.assess(hybrid) == calibrator.assess(vector_only)
+    assert calibrator.assess([{"bm25": 14.0}]) == (0.0, "low")
+
+
+def test_keyword_only_citation_has_no_confidence():
+    citations = format_citations([{"title": "Runbook", "url": "u", "bm25": 3.2}])
+    assert citations == "1. [Runbook](u) (keyword match)"
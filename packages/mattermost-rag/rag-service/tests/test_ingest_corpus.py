@@ -0,0 +1,99 @@
+import asyncio
+import json
+import os
+
+from ingest_corpus import Checkpoint, CorpusIngester
+from ingest_documents import EMBEDDING_MODEL, IngestStats
+
+
+class RecordingIngester:
+    """Stands in for BatchIngester: records ingested keys, fails the ones in `fail`."""
+
+    model = EMBEDDING_MODEL
+
+    def __init__(self, fail=()):
+        self.fail = set(fail)
+        self.ingested = []
+        self.stats = IngestStats()
+
+    async def ingest_source(self, title, chunks, object_key, **kwargs):
+        if object_key in self.fail:
+            raise RuntimeError("embedding API down")
+        self.ingested.append(object_key)
+        return f"source-{object_key}"
+
+
+def corpus_dir(tmp_path):
+    root = tmp_path / "docs"
+    (root / "ops").mkdir(parents=True)
+    (root / "ops" / "payroll.md").write_text("# Payroll\n\nCutoff is the 25th.\n")
+    (root / "ops" / "leave.txt").write_text("Leave requests go to HR.\n")
+    (root / "faq.md").write_text("# FAQ\n\nAsk in the channel.\n")
+    (root / ".git").mkdir()
+    (root / ".git" / "notes.md").write_text("hidden\n")
+    (root / "image.png").write_bytes(b"\x89PNG")
+    return root
+
+
+def run(root, checkpoint_path, ingester):
+    corpus = CorpusIngester(ingester, Checkpoint(checkpoint_path), root, workers=1)
+    asyncio.run(corpus.run([root], report_interval=60))
+    return corpus
+
+
+def test_checkpoint_round_trips_and_detects_changed_files(tmp_path):
+    doc = tmp_path / "a.md"
+    doc.write_text("one\n")
+    path = tmp_path / "checkpoint.json"
+
+    checkpoint = Checkpoint(path, interval=0)
+    checkpoint.mark_done("a.md", doc.stat(), "source-1")
+    checkpoint.mark_failed("b.md", "boom")
+
+    reloaded = Checkpoint(path)
+    assert reloaded.is_done("a.md", doc.stat())
+    assert reloaded.files["a.md"]["source_id"] == "source-1"
+    assert reloaded.failed == {"b.md": "boom"}
+    assert not os.path.exists(str(path) + ".tmp")
+
+    doc.write_text("one, edited\n")
+    assert not reloaded.is_done("a.md", doc.stat())
+
+
+def test_checkpoint_saves_are_throttled_until_forced(tmp_path):
+    doc = tmp_path / "a.md"
+    doc.write_text("one\n")
+    path = tmp_path / "checkpoint.json"
+    checkpoint = Checkpoint(path, interval=3600)
+
+    checkpoint.mark_done("a.md", doc.stat(), "source-1")
+    assert json.loads(path.read_text())["files"] == {"a.md": checkpoint.files["a.md"]}
+
+    checkpoint.mark_done("b.md", doc.stat(), "source-2")
+    assert "b.md" not in json.loads(path.read_text())["files"]
+
+    checkpoint.save(force=True)
+    assert "b.md" in json.loads(path.read_text())["files"]
+
+
+def test_interrupted_run_resumes_with_only_unfinished_files(tmp_path):
+    root = corpus_dir(tmp_path)
+    checkpoint_path = tmp_path / "checkpoint.json"
+
+    first = RecordingIngester(fail={"ops/leave.txt"})
+    corpus = run(root, checkpoint_path, first)
+    assert sorted(first.ingested) == ["faq.md", "ops/payroll.md"]
+    assert corpus.failed.items == 1
+    assert "ops/leave.txt" in Checkpoint(checkpoint_path).failed
+
+    second = RecordingIngester()
+    corpus = run(root, checkpoint_path, second)
+    assert second.ingested == ["ops/leave.txt"]
+    assert corpus.resumed.items == 2
+    assert Checkpoint(checkpoint_path).failed == {}
+
+    (root / "faq.md").write_text("# FAQ\n\nAsk in the channel, or DM ops.\n")
+    third = RecordingIngester()
+    corpus = run(root, checkpoint_path, third)
+    assert third.ingested == ["faq.md"]
+    assert corpus.resumed.items == 2
@@ -0,0 +1,91 @@
+import asyncio
+
+import pytest
+
+from chunking import Chunk
+from fake_supabase import FakeSupabase, fake_openai
+from ingest_documents import HASHES_PER_QUERY, BatchIngester
+
+
+def chunks(*texts):
+    return [Chunk(index=i, text=t, token_count=len(t.split())) for i, t in enumerate(texts)]
+
+
+@pytest.fixture
+def db():
+    return FakeSupabase()
+
+
+def ingester(db, **options):
+    return BatchIngester(db, fake_openai(), verbose=False, **options)
+
+
+def sync(ingest, texts, source_hash="v1"):
+    return asyncio.run(
+        ingest.ingest_source("Runbook", chunks(*texts), object_key="runbook.md", source_hash=source_hash)
+    )
+
+
+def documents(db, source_id):
+    rows = [r for r in db.rows("opex_documents") if r["source_id"] == source_id]
+    return sorted((r["chunk_index"], r["text"]) for r in rows)
+
+
+def test_resync_embeds_only_new_chunks_and_deletes_orphans(db):
+    first = ingester(db)
+    source_id = sync(first, ["alpha", "beta", "gamma"])
+    assert first.stats.embedded == 3
+
+    second = ingester(db)
+    assert sync(second, ["beta", "delta", "alpha"], source_hash="v2") == source_id
+
+    assert second.openai.embeddings.inputs == ["delta"]
+    assert second.stats.unchanged == 2
+    assert second.stats.deleted == 1
+    assert documents(db, source_id) == [(0, "beta"), (1, "delta"), (2, "alpha")]
+    assert len(db.rows("opex_document_embeddings")) == 3
+
+
+def test_unchanged_file_is_skipped(db):
+    sync(ingester(db), ["alpha"])
+    again = ingester(db)
+    sync(again, ["alpha", "beta"])
+    assert again.stats.skipped_sources == 1
+    assert again.openai.embeddings.inputs == []
+
+
+def test_chunks_stored_elsewhere_reuse_their_vectors(db):
+    first = ingester(db)
+    asyncio.run(first.ingest_source("A", chunks("shared", "only a"), object_key="a.md"))
+    second = ingester(db)
+    asyncio.run(second.ingest_source("B", chunks("shared", "only b"), object_key="b.md"))
+
+    assert second.openai.embeddings.inputs == ["only b"]
+    assert second.stats.copied == 1
+
+
+def test_reusable_lookup_is_chunked(db):
+    many = [f"chunk number {i}" for i in range(2 * HASHES_PER_QUERY + 5)]
+    sync(ingester(db, batch_size=2048), many)
+    assert max(db.in_sizes) <= HASHES_PER_QUERY
+
+
+def test_failed_resync_keeps_a_ready_source_searchable(db):
+    source_id = sync(ingester(db), ["alpha"])
+    db.fail_inserts_into.add("opex_documents")
+
+    with pytest.raises(RuntimeError):
+        sync(ingester(db), ["alpha", "beta"], source_hash="v2")
+
+    source = db.rows("opex_embedding_sources")[0]
+    assert source["id"] == source_id
+    assert source["status"] == "ready"
+    assert source["content_hash"] == "v1"
+    assert "failed" in source["error_message"]
+
+
+def test_failed_first_sync_marks_the_source_failed(db):
+    db.fail_inserts_into.add("opex_documents")
+    with pytest.raises(RuntimeError):
+        sync(ingester(db), ["alpha"])
+    assert db.rows("opex_embedding_sources")[0]["status"] == "failed"
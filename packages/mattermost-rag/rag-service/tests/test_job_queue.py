@@ -0,0 +1,104 @@
+import asyncio
+import sqlite3
+import time
+
+import pytest
+
+from job_queue import DEAD, DONE, QUEUED, SQLiteJobQueue
+
+
+@pytest.fixture
+def make_queue(tmp_path):
+    def make(**options):
+        queue = SQLiteJobQueue(str(tmp_path / "jobs.db"), **options)
+        asyncio.run(queue.setup())
+        return queue
+
+    return make
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def status(queue, job_id):
+    with sqlite3.connect(queue.path) as conn:
+        return conn.execute("SELECT status FROM rag_jobs WHERE id = ?", (job_id,)).fetchone()[0]
+
+
+def test_enqueue_is_idempotent(make_queue):
+    queue = make_queue()
+    job_id, created = run(queue.enqueue({"q": 1}, "key"))
+    again, created_again = run(queue.enqueue({"q": 2}, "key"))
+    assert created and not created_again
+    assert again == job_id
+
+
+def test_claimed_job_is_invisible_until_the_visibility_timeout(make_queue):
+    queue = make_queue(visibility_timeout=0.1)
+    job_id, _ = run(queue.enqueue({"q": 1}, "key"))
+
+    first = run(queue.claim())
+    assert first.id == job_id and first.attempts == 1
+    assert run(queue.claim()) is None
+
+    time.sleep(0.15)
+    second = run(queue.claim())
+    assert second.id == job_id and second.attempts == 2
+    assert second.claim_token != first.claim_token
+
+
+def test_stale_claim_token_is_rejected(make_queue):
+    queue = make_queue(visibility_timeout=0.05)
+    run(queue.enqueue({"q": 1}, "key"))
+    stale = run(queue.claim())
+    time.sleep(0.1)
+    current = run(queue.claim())
+
+    assert not run(queue.complete(stale))
+    assert not run(queue.fail(stale, "late"))
+    assert not run(queue.extend(stale))
+    assert run(queue.complete(current))
+    assert status(queue, current.id) == DONE
+
+
+def test_failures_retry_then_dead_letter(make_queue):
+    queue = make_queue(max_attempts=2, retry_backoff=0)
+    job_id, _ = run(queue.enqueue({"q": 1}, "key"))
+
+    assert run(queue.fail(run(queue.claim()), "boom"))
+    assert status(queue, job_id) == QUEUED
+
+    retry = run(queue.claim())
+    assert retry.attempts == 2
+    assert run(queue.fail(retry, "boom again"))
+    assert status(queue, job_id) == DEAD
+    assert run(queue.claim()) is None
+    assert run(queue.depth()) == {DEAD: 1}
+
+
+def test_extend_keeps_a_running_job_leased(make_queue):
+    queue = make_queue(visibility_timeout=0.1)
+    run(queue.enqueue({"q": 1}, "key"))
+    job = run(queue.claim())
+
+    for _ in range(3):
+        time.sleep(0.05)
+        assert run(queue.extend(job))
+    assert run(queue.claim()) is None
+
+    assert run(queue.complete(job))
+    assert not run(queue.extend(job))
+
+
+def test_purge_removes_only_done_jobs_past_retention(make_queue):
+    queue = make_queue(retention=0.05, retry_backoff=60)
+    run(queue.enqueue({"q": 1}, "done"))
+    run(queue.enqueue({"q": 2}, "failed"))
+    assert run(queue.complete(run(queue.claim())))
+    assert run(queue.fail(run(queue.claim()), "boom"))
+
+    assert run(queue.purge()) == 0
+    time.sleep(0.1)
+    assert run(queue.purge()) == 1
+    assert run(queue.depth()) == {QUEUED: 1}
@@ -0,0 +1,76 @@
+import math
+
+import pytest
+
+from lexical_index import LexicalIndex, tokenize
+
+ROWS = [
+    {"document_id": "d1", "title": "Withholding", "text": "File BIR form 1601-C by the 10th", "embedding": [0.1]},
+    {"document_id": "d2", "title": "Payroll", "text": "Payroll cutoff payroll run payroll approval"},
+    {"document_id": "d3", "title": "Leave", "text": "Leave requests need manager approval"},
+]
+
+
+def bm25(tf, df, n_docs, doc_len, avg_len, k1=1.2, b=0.75):
+    idf = math.log(1 + (n_docs - df + 0.5) / (df + 0.5))
+    return idf * tf * (k1 + 1) / (tf + k1 * (1 - b + b * doc_len / avg_len))
+
+
+@pytest.fixture
+def index():
+    index = LexicalIndex()
+    index.sync(ROWS, version="v1")
+    return index
+
+
+def test_tokenize_keeps_identifiers_whole_and_drops_stopwords():
+    assert tokenize("How do I file the 1601-C?") == ["file", "1601-c", "1601", "c"]
+
+
+def test_scores_match_the_bm25_formula(index):
+    lengths = {"d1": 7, "d2": 6, "d3": 5}
+    avg_len = sum(lengths.values()) / 3
+
+    hits = index.search("payroll approval")
+
+    assert [h["document_id"] for h in hits] == ["d2", "d3"]
+    assert hits[0]["bm25"] == pytest.approx(
+        bm25(3, 1, 3, lengths["d2"], avg_len) + bm25(1, 2, 3, lengths["d2"], avg_len), rel=1e-5
+    )
+    assert hits[1]["bm25"] == pytest.approx(bm25(1, 2, 3, lengths["d3"], avg_len), rel=1e-5)
+    assert "score" not in hits[0]
+    assert "embedding" not in hits[0]
+
+
+def test_exact_identifier_outranks_partial_matches(index):
+    hits = index.search("1601-C deadline")
+    assert hits[0]["document_id"] == "d1"
+    assert index.search("nothing matches here") == []
+
+
+def test_search_returns_top_k(index):
+    assert len(index.search("payroll approval leave", k=1)) == 1
+
+
+def test_sync_is_incremental_and_drops_removed_rows(index):
+    added, removed = index.sync(
+        ROWS[1:] + [{"document_id": "d4", "title": "Form", "text": "Form 1601-C template"}]
+    )
+
+    assert (added, removed) == (1, 1)
+    assert [h["document_id"] for h in index.search("1601-C")] == ["d4"]
+    assert index.stats()["documents"] == 3
+
+
+def test_save_and_load_round_trip(tmp_path, index):
+    index.path = str(tmp_path / "bm25.npz")
+    index.sync(ROWS[1:], version="v2")  # tombstones d1 and saves
+
+    reloaded = LexicalIndex(path=index.path)
+    assert reloaded.load()
+
+    assert reloaded.version == "v2"
+    assert reloaded.search("1601-C") == []
+    before, after = index.search("payroll approval"), reloaded.search("payroll approval")
+    assert [h["document_id"] for h in after] == [h["document_id"] for h in before]
+    assert [h["bm25"] for h in after] == pytest.approx([h["bm25"] for h in before])
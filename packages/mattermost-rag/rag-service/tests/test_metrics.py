@@ -0,0 +1,45 @@
+from openai.types.chat import ChatCompletionChunk
+
+from metrics import LLM_TOKENS, record_token_usage
+
+
+def counter(model: str, kind: str) -> float:
+    return LLM_TOKENS.labels(model=model, kind=kind)._value.get()
+
+
+def test_streamed_usage_dict_is_counted():
+    # The final streamed chunk of the pinned client exposes usage as a dict
+    chunk = ChatCompletionChunk.model_validate(
+        {
+            "id": "c",
+            "choices": [],
+            "created": 0,
+            "model": "m",
+            "object": "chat.completion.chunk",
+            "usage": {
+                "prompt_tokens": 120,
+                "completion_tokens": 30,
+                "prompt_tokens_details": {"cached_tokens": 64},
+            },
+        }
+    )
+    assert isinstance(chunk.usage, dict)
+
+    record_token_usage("stream-test", chunk.usage)
+
+    assert counter("stream-test", "prompt") == 120
+    assert counter("stream-test", "completion") == 30
+    assert counter("stream-test", "cached_prompt") == 64
+
+
+def test_typed_usage_is_counted():
+    class Usage:
+        prompt_tokens = 10
+        completion_tokens = 5
+        prompt_tokens_details = None
+
+    record_token_usage("typed-test", Usage())
+
+    assert counter("typed-test", "prompt") == 10
+    assert counter("typed-test", "completion") == 5
+    assert counter("typed-test", "cached_prompt") == 0
@@ -0,0 +1,21 @@
+import asyncio
+
+from rag_client import rag_client
+
+
+def test_parallel_merge_keeps_every_chunk_of_a_source():
+    async def backend():
+        return [{"document_id": "rag-1", "url": "opex:source:7", "score": 0.9}]
+
+    async def supabase():
+        return [
+            {"document_id": f"chunk-{i}", "url": "opex:source:7", "score": 0.8 - i / 100}
+            for i in range(3)
+        ] + [{"document_id": "rag-1", "url": "opex:source:7", "score": 0.95}]
+
+    hits = asyncio.run(
+        rag_client._parallel_retrieve([("rag_backend", backend), ("supabase", supabase)], limit=5)
+    )
+
+    assert [h["document_id"] for h in hits] == ["rag-1", "chunk-0", "chunk-1", "chunk-2"]
+    assert hits[0]["score"] == 0.95
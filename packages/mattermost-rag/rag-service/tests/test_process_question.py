@@ -0,0 +1,54 @@
+import asyncio
+
+import pytest
+
+import main
+from metrics import STAGE_ERRORS
+
+
+def _errors() -> float:
+    return STAGE_ERRORS.labels(stage="process_question")._value.get()
+
+
+@pytest.fixture
+def failing_pipeline(monkeypatch):
+    posted = []
+
+    async def retrieve_and_synthesize(*args, **kwargs):
+        raise RuntimeError("openai down")
+
+    async def mm_post_message(channel_id, message, root_id=None):
+        posted.append(message)
+        return {"id": "post"}
+
+    monkeypatch.setattr(main, "STREAM_ANSWERS", False)
+    monkeypatch.setattr(main, "retrieve_and_synthesize", retrieve_and_synthesize)
+    monkeypatch.setattr(main, "mm_post_message", mm_post_message)
+    return posted
+
+
+@pytest.mark.parametrize("reraise", [False, True])
+def test_failure_is_counted_once(failing_pipeline, reraise):
+    before = _errors()
+
+    async def run():
+        await main.run_traced_question("u", "c", "why?", None, None, reraise=reraise)
+
+    if reraise:
+        with pytest.raises(RuntimeError):
+            asyncio.run(run())
+    else:
+        asyncio.run(run())
+
+    assert _errors() == before + 1
+    assert len(failing_pipeline) == 1
+
+
+def test_non_final_attempt_posts_no_error(failing_pipeline):
+    with pytest.raises(RuntimeError):
+        asyncio.run(
+            main.run_traced_question(
+                "u", "c", "why?", None, None, reraise=True, final_attempt=False
+            )
+        )
+    assert failing_pipeline == []
@@ -0,0 +1,35 @@
+import pytest
+
+from calibration import ConfidenceCalibrator
+from fit_confidence import build_dataset
+from query_log import QueryLog, build_row
+
+
+def test_row_carries_the_scores_the_fit_reads():
+    docs = [{"title": "a", "url": "u", "score": 0.82}, {"title": "b", "bm25": 7.0}, {"score": 0.71}]
+    row = build_row(
+        question="q",
+        answer="a",
+        user_id="mm-user",
+        context_docs=docs,
+        confidence_score=0.8,
+        confidence_level="medium",
+    )
+
+    assert row["metadata"]["retrieval_scores"] == [0.82, 0.71]
+    features, labels = build_dataset([dict(row, rating=5)], helpful_min=4)
+    assert labels.tolist() == [1.0]
+    expected = ConfidenceCalibrator().assess(docs)[0]
+    assert 0.7 * features[0, 0] + 0.3 * features[0, 1] == pytest.approx(expected)
+
+
+def test_disabled_without_supabase():
+    log = QueryLog(url="", key="")
+    assert log.record(
+        question="q",
+        answer="a",
+        user_id="u",
+        context_docs=[],
+        confidence_score=0.0,
+        confidence_level="low",
+    ) is None
@@ -0,0 +1,46 @@
+import asyncio
+import time
+
+from reranker import Reranker
+
+
+def hits(n):
+    return [{"title": f"doc {i}", "snippet": "text", "score": 0.9 - i / 100} for i in range(n)]
+
+
+def test_saturated_pool_skips_reranking_instead_of_queueing(monkeypatch):
+    reranker = Reranker(mode="lexical", budget=0.01, threads=1)
+    calls = []
+
+    def slow_score(question, candidates):
+        calls.append(question)
+        time.sleep(0.2)
+        return [float(i) for i in range(len(candidates))]
+
+    monkeypatch.setattr(reranker, "score", slow_score)
+
+    async def run():
+        first = await reranker.rerank("q1", hits(3), limit=2)
+        second = await reranker.rerank("q2", hits(3), limit=2)
+        return first, second
+
+    first, second = asyncio.run(run())
+
+    assert [h["title"] for h in first] == [h["title"] for h in second] == ["doc 0", "doc 1"]
+    assert reranker.timeouts == 1
+    assert reranker.saturated == 1
+    assert calls == ["q1"]
+
+    time.sleep(0.25)
+    assert reranker.stats()["busy"] == 0
+
+
+def test_reranks_within_budget():
+    reranker = Reranker(mode="lexical", budget=1.0)
+    candidates = [
+        {"title": "Payroll", "snippet": "Payroll cutoff is the 25th.", "score": 0.80},
+        {"title": "Form 1601-C", "snippet": "File BIR form 1601-c by the 10th.", "score": 0.78},
+    ]
+    ranked = asyncio.run(reranker.rerank("when is 1601-c due", candidates, limit=2))
+    assert ranked[0]["title"] == "Form 1601-C"
+    assert "rerank_score" in ranked[0]
@@ -0,0 +1,86 @@
+import asyncio
+
+import pytest
+
+from singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_execution():
+    flights = SingleFlight()
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "answer"
+
+    async def main():
+        return await asyncio.gather(*(flights.do("q", work) for _ in range(3)))
+
+    results = asyncio.run(main())
+
+    assert calls == [1]
+    assert results == [("answer", False), ("answer", True), ("answer", True)]
+    assert flights.stats() == {"in_flight": 0, "executed": 1, "coalesced": 2}
+
+
+def test_exception_reaches_every_waiter_and_the_key_is_retried():
+    flights = SingleFlight()
+    attempts = []
+
+    async def failing():
+        attempts.append(1)
+        await asyncio.sleep(0.01)
+        raise RuntimeError("llm down")
+
+    async def ok():
+        return "answer"
+
+    async def main():
+        results = await asyncio.gather(
+            flights.do("q", failing), flights.do("q", failing), return_exceptions=True
+        )
+        # The failed flight is forgotten, so the next call runs fresh
+        return results, await flights.do("q", ok)
+
+    results, retry = asyncio.run(main())
+
+    assert attempts == [1]
+    assert all(isinstance(r, RuntimeError) for r in results)
+    assert retry == ("answer", False)
+
+
+def test_cancelled_follower_does_not_cancel_the_leader():
+    flights = SingleFlight()
+
+    async def work():
+        await asyncio.sleep(0.02)
+        return "answer"
+
+    async def main():
+        leader = asyncio.create_task(flights.do("q", work))
+        await asyncio.sleep(0)
+        follower = asyncio.create_task(flights.do("q", work))
+        await asyncio.sleep(0)
+        follower.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await follower
+        return await leader
+
+    assert asyncio.run(main()) == ("answer", False)
+
+
+def test_different_keys_run_independently():
+    flights = SingleFlight()
+
+    async def work(value):
+        await asyncio.sleep(0.01)
+        return value
+
+    async def main():
+        return await asyncio.gather(
+            flights.do("a", lambda: work("A")), flights.do("b", lambda: work("B"))
+        )
+
+    assert asyncio.run(main()) == [("A", False), ("B", False)]
+    assert flights.coalesced == 0
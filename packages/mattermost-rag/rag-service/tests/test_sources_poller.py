@@ -0,0 +1,37 @@
+import asyncio
+
+import rag_client
+from answer_cache import answer_cache
+
+
+def test_cache_hits_never_wait_on_the_sources_version(monkeypatch):
+    async def slow_version():
+        raise AssertionError("sources_version queried on the request path")
+
+    monkeypatch.setattr(rag_client.rag_client, "sources_version", slow_version)
+    answer_cache.put("how do I rotate keys?", ("answer", "", 0.9, "high"))
+
+    cached, _ = asyncio.run(rag_client._cached_answer("How do I rotate keys?"))
+
+    assert cached == ("answer", "", 0.9, "high")
+
+
+def test_poller_invalidates_when_sources_change(monkeypatch):
+    versions = iter(["3:2026-01-01", "4:2026-01-02"])
+
+    async def sources_version():
+        return next(versions)
+
+    monkeypatch.setattr(rag_client.rag_client, "sources_version", sources_version)
+    monkeypatch.setattr(rag_client, "SOURCES_POLL_SECONDS", 0.01)
+
+    async def run():
+        await rag_client.start_sources_poller()
+        await asyncio.sleep(0.005)
+        answer_cache.put("what is the close calendar?", ("answer", "", 0.9, "high"))
+        await asyncio.sleep(0.02)
+        await rag_client.stop_sources_poller()
+
+    asyncio.run(run())
+
+    assert answer_cache.get("what is the close calendar?") is None
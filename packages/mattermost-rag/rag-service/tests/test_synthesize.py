@@ -0,0 +1,20 @@
+import asyncio
+
+import rag_client
+from calibration import calibrator
+
+
+def test_escalation_skips_packing_and_prompt(monkeypatch):
+    def fail(*args, **kwargs):
+        raise AssertionError("packed context for an escalated question")
+
+    monkeypatch.setattr(rag_client, "pack_context", fail)
+    monkeypatch.setattr(rag_client.RAG_PROMPT, "messages", fail)
+    monkeypatch.setattr(calibrator, "escalate_below", 0.5)
+
+    answer, _, _, level = asyncio.run(
+        rag_client.rag_client.synthesize("how do I rotate keys?", [{"score": 0.2}])
+    )
+
+    assert answer == rag_client.ESCALATION_ANSWER
+    assert level == "low"
@@ -0,0 +1,53 @@
+import os
+import threading
+
+import numpy as np
+
+from vector_index import VectorIndex
+
+
+def _rows(n, dim, seed):
+    rng = np.random.default_rng(seed)
+    return [
+        {
+            "title": f"doc {i}",
+            "text": "text",
+            "source_id": i,
+            "document_id": f"d{i}",
+            "embedding": rng.standard_normal(dim).tolist(),
+        }
+        for i in range(n)
+    ]
+
+
+def test_processes_sharing_a_path_never_load_a_pruned_snapshot(tmp_path):
+    path = str(tmp_path)
+    writers = [VectorIndex(path=path, dim=8) for _ in range(2)]
+    reader = VectorIndex(path=path, dim=8)
+    errors = []
+
+    def rebuild(index, seed):
+        try:
+            for i in range(20):
+                index.build(_rows(30, 8, seed + i), version=f"{seed}-{i}")
+        except Exception as e:
+            errors.append(e)
+
+    def reload():
+        try:
+            for _ in range(100):
+                if reader.load():
+                    assert len(reader.search(np.ones(8), k=3)) == 3
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=rebuild, args=(w, 100 * n)) for n, w in enumerate(writers)]
+    threads.append(threading.Thread(target=reload))
+    for t in threads:
+        t.start()
+    for t in threads:
+        t.join()
+
+    assert not errors
+    assert reader.load()
+    assert len([e for e in os.listdir(path) if e.startswith("snapshot-")]) == 1
@@ -0,0 +1,264 @@
+"""Lightweight request tracing: spans propagated via contextvars, exported in OTLP JSON."""
+
+import asyncio
+import json
+import os
+import secrets
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Optional
+
+import structlog
+
+logger = structlog.get_logger()
+
+
+@dataclass
+class Span:
+    name: str
+    trace_id: str
+    span_id: str
+    parent_id: Optional[str]
+    start_ns: int
+    end_ns: int = 0
+    attributes: dict[str, Any] = field(default_factory=dict)
+    error: Optional[str] = None
+    children: list["Span"] = field(default_factory=list)
+
+    def set(self, **attributes):
+        """Attach attributes (hits, scores, token usage...) to the span."""
+        self.attributes.update(attributes)
+
+    @property
+    def duration_ms(self) -> float:
+        return (self.end_ns - self.start_ns) / 1e6 if self.end_ns else 0.0
+
+    def to_otlp(self) -> dict:
+        otlp = {
+            "traceId": self.trace_id,
+            "spanId": self.span_id,
+            "name": self.name,
+            "kind": 1,  # SPAN_KIND_INTERNAL
+            "startTimeUnixNano": str(self.start_ns),
+            "endTimeUnixNano": str(self.end_ns),
+            "attributes": [_otlp_attribute(k, v) for k, v in self.attributes.items()],
+            "status": {"code": 2, "message": self.error} if self.error else {"code": 1},
+        }
+        if self.parent_id:
+            otlp["parentSpanId"] = self.parent_id
+        return otlp
+
+
+def _otlp_attribute(key: str, value: Any) -> dict:
+    if isinstance(value, bool):
+        return {"key": key, "value": {"boolValue": value}}
+    if isinstance(value, int):
+        return {"key": key, "value": {"intValue": str(value)}}
+    if isinstance(value, float):
+        return {"key": key, "value": {"doubleValue": value}}
+    return {"key": key, "value": {"stringValue": str(value)}}
+
+
+_current_span: ContextVar[Optional[Span]] = ContextVar("current_span", default=None)
+_trace_parent: ContextVar[Optional[tuple[str, Optional[str]]]] = ContextVar(
+    "trace_parent", default=None
+)
+
+
+def new_request_id() -> str:
+    """A new trace / request ID (32 hex chars, OTLP traceId format)."""
+    return secrets.token_hex(16)
+
+
+def current_span() -> Optional[Span]:
+    return _current_span.get()
+
+
+def current_traceparent() -> Optional[str]:
+    """Serialize the active trace position as "<trace_id>-<span_id>" for hand-off."""
+    span = _current_span.get()
+    if span is not None:
+        return f"{span.trace_id}-{span.span_id}"
+    parent = _trace_parent.get()
+    if parent is not None:
+        return f"{parent[0]}-{parent[1] or ''}".rstrip("-")
+    return None
+
+
+@contextmanager
+def trace_context(traceparent: Optional[str] = None):
+    """
+    Continue a trace (e.g. in a detached background task) or start a new one.
+
+    Binds the request ID into structlog's contextvars so every log line of
+    the request carries it.
+    """
+    trace_id, _, parent_id = (traceparent or new_request_id()).partition("-")
+    parent_token = _trace_parent.set((trace_id, parent_id or None))
+    span_token = _current_span.set(None)
+    structlog.contextvars.bind_contextvars(request_id=trace_id)
+    try:
+        yield trace_id
+    finally:
+        structlog.contextvars.unbind_contextvars("request_id")
+        _current_span.reset(span_token)
+        _trace_parent.reset(parent_token)
+
+
+@contextmanager
+def span(name: str, **attributes):
+    """Record a timed span as a child of the current span (or trace context)."""
+    parent = _current_span.get()
+    if parent is not None:
+        trace_id, parent_id = parent.trace_id, parent.span_id
+    else:
+        trace_id, parent_id = _trace_parent.get() or (new_request_id(), None)
+
+    current = Span(
+        name=name,
+        trace_id=trace_id,
+        span_id=secrets.token_hex(8),
+        parent_id=parent_id,
+        start_ns=time.time_ns(),
+        attributes=dict(attributes),
+    )
+    if parent is not None:
+        parent.children.append(current)
+
+    token = _current_span.set(current)
+    try:
+        yield current
+    except BaseException as e:
+        current.error = f"{type(e).__name__}: {str(e)[:200]}"
+        raise
+    finally:
+        current.end_ns = time.time_ns()
+        _current_span.reset(token)
+        exporter.add(current)
+        if parent is None:
+            exporter.summarize(current)
+
+
+class SpanExporter:
+    """
+    Buffer finished spans and flush them in batches to a JSONL file and/or an
+    OTLP/HTTP JSON endpoint (e.g. an OpenTelemetry collector on :4318).
+    """
+
+    def __init__(
+        self,
+        file_path: Optional[str] = None,
+        otlp_endpoint: Optional[str] = None,
+        flush_interval: float = 2.0,
+        max_buffer: int = 5000,
+        log_summary: bool = True,
+    ):
+        self.file_path = file_path
+        self.otlp_endpoint = otlp_endpoint
+        self.flush_interval = flush_interval
+        self.max_buffer = max_buffer
+        self.log_summary = log_summary
+
+        self._buffer: list[Span] = []
+        self._task: Optional[asyncio.Task] = None
+        self.exported_total = 0
+        self.dropped_total = 0
+
+    @property
+    def enabled(self) -> bool:
+        return bool(self.file_path or self.otlp_endpoint)
+
+    def add(self, finished: Span):
+        if not self.enabled:
+            return
+        if len(self._buffer) >= self.max_buffer:
+            self.dropped_total += 1
+            return
+        self._buffer.append(finished)
+
+    def summarize(self, root: Span):
+        """One log line per finished local trace root with per-stage timings."""
+        if not self.log_summary:
+            return
+        stages = {}
+
+        def walk(node: Span):
+            for child in node.children:
+                stages[child.name] = round(stages.get(child.name, 0.0) + child.duration_ms, 1)
+                walk(child)
+
+        walk(root)
+        logger.info(
+            "trace_summary",
+            span=root.name,
+            trace_id=root.trace_id,
+            duration_ms=round(root.duration_ms, 1),
+            stages=stages,
+            error=root.error,
+        )
+
+    async def start(self):
+        if self.enabled and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+        await self.flush()
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.flush_interval)
+            try:
+                await self.flush()
+            except Exception as e:
+                logger.warning("trace_export_failed", error=str(e))
+
+    async def flush(self):
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        spans = [s.to_otlp() for s in batch]
+        payload = {
+            "resourceSpans": [
+                {
+                    "resource": {
+                        "attributes": [_otlp_attribute("service.name", "mattermost-rag")]
+                    },
+                    "scopeSpans": [{"scope": {"name": "rag-service"}, "spans": spans}],
+                }
+            ]
+        }
+
+        if self.file_path:
+            lines = "".join(json.dumps(s) + "\n" for s in spans)
+            await asyncio.to_thread(self._append, lines)
+        if self.otlp_endpoint:
+            from http_pool import http_pool
+
+            response = await http_pool.post(self.otlp_endpoint, json=payload, timeout=5)
+            response.raise_for_status()
+        self.exported_total += len(batch)
+
+    def _append(self, lines: str):
+        with open(self.file_path, "a") as f:
+            f.write(lines)
+
+    def stats(self) -> dict:
+        return {
+            "enabled": self.enabled,
+            "buffered": len(self._buffer),
+            "exported_total": self.exported_total,
+            "dropped_total": self.dropped_total,
+        }
+
+
+exporter = SpanExporter(
+    file_path=os.getenv("TRACE_EXPORT_PATH") or None,
+    otlp_endpoint=os.getenv("TRACE_OTLP_ENDPOINT") or None,
+    flush_interval=float(os.getenv("TRACE_FLUSH_SECONDS", "2")),
+    log_summary=os.getenv("TRACE_LOG_SUMMARY", "true").lower() == "true",
+)
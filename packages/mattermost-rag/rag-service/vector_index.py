@@ -0,0 +1,353 @@
+"""Local vector index over opex_document_embeddings snapshots: exact or IVF top-k on a float32 memmap."""
+
+import asyncio
+import fcntl
+import json
+import os
+import shutil
+import time
+from contextlib import contextmanager
+from typing import Awaitable, Callable, Optional, Sequence
+
+import numpy as np
+import structlog
+
+logger = structlog.get_logger()
+
+_CURRENT_FILE = "CURRENT"
+_LOCK_FILE = ".lock"
+_MANIFEST_FILE = "manifest.json"
+_VECTORS_FILE = "vectors.f32"
+_DOCUMENTS_FILE = "documents.json"
+_CENTROIDS_FILE = "centroids.f32"
+_OFFSETS_FILE = "list_offsets.i64"
+
+
+def _normalize(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def _parse_embedding(value) -> list:
+    # PostgREST returns pgvector columns as their text form "[0.1,0.2,...]"
+    return json.loads(value) if isinstance(value, str) else value
+
+
+def _top_k(scores: np.ndarray, k: int) -> np.ndarray:
+    """Indexes of the k largest scores, best first."""
+    if len(scores) <= k:
+        return np.argsort(-scores)
+    top = np.argpartition(-scores, k)[:k]
+    return top[np.argsort(-scores[top])]
+
+
+def _train_ivf(
+    vectors: np.ndarray, nlist: int, iterations: int = 10, sample_size: int = 100_000
+) -> np.ndarray:
+    """Spherical k-means centroids (nlist, dim) trained on a sample of the vectors."""
+    rng = np.random.default_rng(0)
+    n = len(vectors)
+    sample = vectors[np.sort(rng.choice(n, min(n, sample_size), replace=False))]
+    centroids = sample[rng.choice(len(sample), nlist, replace=False)].copy()
+
+    for _ in range(iterations):
+        assign = np.argmax(sample @ centroids.T, axis=1)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assign, sample)
+        counts = np.bincount(assign, minlength=nlist)
+        empty = counts == 0
+        # Re-seed empty lists with random points
+        sums[empty] = sample[rng.choice(len(sample), int(empty.sum()), replace=False)]
+        centroids = _normalize(sums).astype(np.float32)
+    return centroids
+
+
+class VectorIndex:
+    """
+    In-process top-k over a snapshot of the chunk embeddings.
+
+    Vectors are L2-normalized float32 rows, so cosine similarity is a dot
+    product. Small indexes are searched exactly (blocked matrix products);
+    at `exact_below` rows and up an IVF layer is built: rows are clustered
+    into `nlist` lists stored contiguously and a query scans only the
+    `nprobe` lists whose centroids are closest.
+
+    With `path` set each snapshot is written to its own directory and the
+    matrix is memory-mapped read-only; a CURRENT file names the live
+    snapshot, so a rebuild never disturbs searches on the previous one and
+    restarts load instantly without network access. Processes sharing
+    `path` serialize writes (and pruning) against loads with a file lock.
+    """
+
+    def __init__(
+        self,
+        path: Optional[str] = None,
+        dim: int = 1536,
+        nlist: int = 0,
+        nprobe: int = 8,
+        exact_below: int = 20_000,
+        block_rows: int = 65_536,
+        refresh_interval: float = 300.0,
+    ):
+        self.path = path
+        self.dim = dim
+        self.nlist = nlist
+        self.nprobe = nprobe
+        self.exact_below = exact_below
+        self.block_rows = block_rows
+        self.refresh_interval = refresh_interval
+
+        self._vectors: Optional[np.ndarray] = None
+        self._documents: list[dict] = []
+        self._centroids: Optional[np.ndarray] = None
+        self._offsets: Optional[np.ndarray] = None
+        self.version: Optional[str] = None
+        self.built_at: Optional[float] = None
+
+        self._task: Optional[asyncio.Task] = None
+        self.searches = 0
+        self.refreshes = 0
+
+    @property
+    def ready(self) -> bool:
+        return self._vectors is not None and len(self._documents) > 0
+
+    # ---------- search ----------
+
+    def search(self, query: Sequence[float], k: int = 5, min_score: float = 0.0) -> list[dict]:
+        """Top-k documents (RPC-shaped rows with `similarity`) for one query."""
+        return self.search_batch([query], k, min_score)[0]
+
+    def search_batch(
+        self, queries: Sequence[Sequence[float]], k: int = 5, min_score: float = 0.0
+    ) -> list[list[dict]]:
+        """Top-k for several queries at once (one matrix product per block)."""
+        if not self.ready:
+            return [[] for _ in queries]
+        q = _normalize(np.asarray(queries, dtype=np.float32).reshape(len(queries), self.dim))
+        self.searches += len(q)
+
+        if self._centroids is None:
+            rows, scores = self._exact(q, k)
+        else:
+            results = [self._ivf(query, k) for query in q]
+            rows = [r for r, _ in results]
+            scores = [s for _, s in results]
+
+        return [
+            [
+                dict(self._documents[row], similarity=float(score))
+                for row, score in zip(query_rows, query_scores)
+                if score >= min_score
+            ]
+            for query_rows, query_scores in zip(rows, scores)
+        ]
+
+    def _exact(self, q: np.ndarray, k: int) -> tuple[list[np.ndarray], list[np.ndarray]]:
+        n = len(self._documents)
+        best_rows = [np.empty(0, dtype=np.int64) for _ in q]
+        best_scores = [np.empty(0, dtype=np.float32) for _ in q]
+        for start in range(0, n, self.block_rows):
+            block = self._vectors[start : start + self.block_rows] @ q.T  # (rows, queries)
+            for i in range(len(q)):
+                rows = np.concatenate([best_rows[i], np.arange(start, start + len(block))])
+                scores = np.concatenate([best_scores[i], block[:, i]])
+                top = _top_k(scores, k)
+                best_rows[i], best_scores[i] = rows[top], scores[top]
+        return best_rows, best_scores
+
+    def _ivf(self, query: np.ndarray, k: int) -> tuple[np.ndarray, np.ndarray]:
+        probes = _top_k(self._centroids @ query, min(self.nprobe, len(self._centroids)))
+        rows = np.concatenate(
+            [np.arange(self._offsets[p], self._offsets[p + 1]) for p in probes]
+        )
+        if len(rows) == 0:
+            return rows, np.empty(0, dtype=np.float32)
+        scores = self._vectors[rows] @ query
+        top = _top_k(scores, k)
+        return rows[top], scores[top]
+
+    # ---------- build / load ----------
+
+    def build(self, rows: list[dict], version: Optional[str] = None):
+        """
+        Build a new snapshot from rows shaped like match_opex_documents results
+        plus `embedding`, then swap it in.
+        """
+        started = time.perf_counter()
+        documents, vectors = [], []
+        for row in rows:
+            embedding = _parse_embedding(row.get("embedding"))
+            if not embedding or len(embedding) != self.dim:
+                continue
+            vectors.append(embedding)
+            documents.append({k: v for k, v in row.items() if k != "embedding"})
+
+        matrix = _normalize(np.asarray(vectors, dtype=np.float32).reshape(-1, self.dim))
+        centroids, offsets = None, None
+        nlist = self.nlist or (int(4 * np.sqrt(len(matrix))) if len(matrix) >= self.exact_below else 0)
+        nlist = min(nlist, len(matrix) // 10)
+        if nlist > 1:
+            centroids = _train_ivf(matrix, nlist)
+            assign = np.empty(len(matrix), dtype=np.int64)
+            for start in range(0, len(matrix), self.block_rows):
+                block = matrix[start : start + self.block_rows]
+                assign[start : start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+            order = np.argsort(assign, kind="stable")
+            matrix = matrix[order]
+            documents = [documents[i] for i in order]
+            offsets = np.searchsorted(assign[order], np.arange(nlist + 1)).astype(np.int64)
+
+        if self.path:
+            self._write_snapshot(matrix, documents, centroids, offsets, version)
+            self.load()
+        else:
+            self._vectors, self._documents = matrix, documents
+            self._centroids, self._offsets = centroids, offsets
+            self.version, self.built_at = version, time.time()
+        self.refreshes += 1
+        logger.info(
+            "vector_index_built",
+            documents=len(documents),
+            nlist=len(centroids) if centroids is not None else 0,
+            version=version,
+            duration_ms=round(1000 * (time.perf_counter() - started), 1),
+        )
+
+    @contextmanager
+    def _snapshot_lock(self, operation: int):
+        """flock on the snapshot directory: LOCK_EX to write and prune, LOCK_SH to load."""
+        os.makedirs(self.path, exist_ok=True)
+        with open(os.path.join(self.path, _LOCK_FILE), "a") as lock_file:
+            fcntl.flock(lock_file, operation)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _write_snapshot(self, matrix, documents, centroids, offsets, version):
+        with self._snapshot_lock(fcntl.LOCK_EX):
+            self._write_snapshot_locked(matrix, documents, centroids, offsets, version)
+
+    def _write_snapshot_locked(self, matrix, documents, centroids, offsets, version):
+        name = f"snapshot-{time.time_ns()}"
+        snapshot = os.path.join(self.path, name)
+        os.makedirs(snapshot)
+
+        matrix.tofile(os.path.join(snapshot, _VECTORS_FILE))
+        with open(os.path.join(snapshot, _DOCUMENTS_FILE), "w") as f:
+            json.dump(documents, f)
+        if centroids is not None:
+            centroids.tofile(os.path.join(snapshot, _CENTROIDS_FILE))
+            offsets.tofile(os.path.join(snapshot, _OFFSETS_FILE))
+        manifest = {
+            "count": len(documents),
+            "dim": self.dim,
+            "nlist": len(centroids) if centroids is not None else 0,
+            "version": version,
+            "built_at": time.time(),
+        }
+        with open(os.path.join(snapshot, _MANIFEST_FILE), "w") as f:
+            json.dump(manifest, f)
+
+        tmp_path = os.path.join(self.path, _CURRENT_FILE + ".tmp")
+        with open(tmp_path, "w") as f:
+            f.write(name)
+        os.replace(tmp_path, os.path.join(self.path, _CURRENT_FILE))
+
+        # Older snapshots: searches in flight hold their own memmap, so unlinking
+        # is safe, and no other process is mid-write or mid-load under the lock
+        for entry in os.listdir(self.path):
+            if entry.startswith("snapshot-") and entry != name:
+                shutil.rmtree(os.path.join(self.path, entry), ignore_errors=True)
+
+    def load(self) -> bool:
+        """Map the snapshot named by CURRENT (if any); returns whether one was loaded."""
+        if not self.path:
+            return False
+        with self._snapshot_lock(fcntl.LOCK_SH):
+            return self._load_locked()
+
+    def _load_locked(self) -> bool:
+        try:
+            with open(os.path.join(self.path, _CURRENT_FILE)) as f:
+                snapshot = os.path.join(self.path, f.read().strip())
+            with open(os.path.join(snapshot, _MANIFEST_FILE)) as f:
+                manifest = json.load(f)
+            if manifest["dim"] != self.dim:
+                logger.warning("vector_index_dim_mismatch", dim=manifest["dim"], expected=self.dim)
+                return False
+            with open(os.path.join(snapshot, _DOCUMENTS_FILE)) as f:
+                documents = json.load(f)
+        except (OSError, ValueError, KeyError) as e:
+            logger.info("vector_index_not_loaded", path=self.path, reason=str(e))
+            return False
+
+        count = manifest["count"]
+        vectors = (
+            np.memmap(
+                os.path.join(snapshot, _VECTORS_FILE),
+                dtype=np.float32,
+                mode="r",
+                shape=(count, self.dim),
+            )
+            if count
+            else None
+        )
+        centroids, offsets = None, None
+        if manifest["nlist"]:
+            centroids = np.fromfile(os.path.join(snapshot, _CENTROIDS_FILE), dtype=np.float32)
+            centroids = centroids.reshape(manifest["nlist"], self.dim)
+            offsets = np.fromfile(os.path.join(snapshot, _OFFSETS_FILE), dtype=np.int64)
+
+        self._vectors, self._documents = vectors, documents
+        self._centroids, self._offsets = centroids, offsets
+        self.version, self.built_at = manifest["version"], manifest["built_at"]
+        logger.info("vector_index_loaded", documents=count, nlist=manifest["nlist"])
+        return True
+
+    # ---------- background refresh ----------
+
+    async def start(self, refresh: Callable[[], Awaitable[None]]):
+        """Load the last snapshot, then call `refresh` every `refresh_interval` seconds."""
+        await asyncio.to_thread(self.load)
+        if self._task is None and self.refresh_interval > 0:
+            self._task = asyncio.create_task(self._run(refresh))
+
+    async def close(self):
+        if self._task is not None:
+            self._task.cancel()
+            self._task = None
+
+    async def _run(self, refresh: Callable[[], Awaitable[None]]):
+        while True:
+            try:
+                await refresh()
+            except Exception as e:
+                logger.warning("vector_index_refresh_failed", error=str(e))
+            await asyncio.sleep(self.refresh_interval)
+
+    def stats(self) -> dict:
+        return {
+            "ready": self.ready,
+            "documents": len(self._documents),
+            "ivf_lists": len(self._centroids) if self._centroids is not None else 0,
+            "persistent": bool(self.path),
+            "version": self.version,
+            "age_seconds": round(time.time() - self.built_at, 1) if self.built_at else None,
+            "searches": self.searches,
+            "refreshes": self.refreshes,
+        }
+
+
+VECTOR_INDEX_MODE = os.getenv("VECTOR_INDEX_MODE", "off").lower()
+
+vector_index = VectorIndex(
+    path=os.getenv("VECTOR_INDEX_PATH") or None,
+    dim=int(os.getenv("EMBEDDING_DIM", "1536")),
+    nlist=int(os.getenv("VECTOR_INDEX_NLIST", "0")),
+    nprobe=int(os.getenv("VECTOR_INDEX_NPROBE", "8")),
+    exact_below=int(os.getenv("VECTOR_INDEX_EXACT_BELOW", "20000")),
+    refresh_interval=float(os.getenv("VECTOR_INDEX_REFRESH_SECONDS", "300")),
+)
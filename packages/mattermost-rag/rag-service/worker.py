@@ -0,0 +1,40 @@
+"""
+Standalone /ask worker: claims jobs from the durable queue without serving HTTP.
+
+Run alongside (or instead of in-app workers in) the API replicas to scale
+answer generation horizontally:
+
+    JOB_QUEUE_BACKEND=postgres JOB_QUEUE_DATABASE_URL=... python worker.py
+"""
+
+import asyncio
+import os
+import signal
+
+import structlog
+
+import main
+from job_queue import job_queue
+
+logger = structlog.get_logger()
+
+
+async def run():
+    if job_queue is None:
+        raise SystemExit("JOB_QUEUE_BACKEND is not set; nothing to work on")
+
+    await main.start_background_services()
+    await main.start_job_workers(int(os.getenv("JOB_WORKERS", "8")))
+
+    stopping = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, stopping.set)
+    await stopping.wait()
+
+    logger.info("job_worker_stopping")
+    await main.shutdown_event()
+
+
+if __name__ == "__main__":
+    asyncio.run(run())
@@ -0,0 +1,216 @@
+"""
+Token-aware, structure-aware chunking for RAG ingestion.
+
+Documents are split along their own structure - markdown headings, then
+paragraphs, then sentences - and chunks are sized by tokenizer counts
+instead of fixed character windows, so no word or sentence is cut and no
+bytes are stored twice. Each chunk records the heading path it came from
+("Deployment Guide > Troubleshooting"), which is prepended to the text
+sent to the embedding model.
+
+Chunks are produced lazily from any iterable of lines, so very large files
+are never held in memory.
+"""
+
+import re
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Callable, Iterable, Iterator, List, Optional, Tuple
+
+DEFAULT_MAX_TOKENS = 400
+DEFAULT_MIN_TOKENS = 40
+
+_HEADING = re.compile(r"^(#{1,6})\s+(.*?)\s*#*\s*$")
+_FENCE = re.compile(r"^\s*(```|~~~)")
+_SENTENCE_END = re.compile(r"(?<=[.!?])\s+(?=[\"'(\[]?[A-Z0-9])")
+_WORDS = re.compile(r"\w+|[^\w\s]")
+
+
+def _load_tokenizer() -> Callable[[str], int]:
+    """tiktoken's cl100k_base (used by text-embedding-3-*) if available, else an estimate."""
+    try:
+        import tiktoken
+
+        encoding = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    except Exception:
+        # Not installed, or the BPE file can't be downloaded (offline): words
+        # and punctuation marks are roughly one token each
+        return lambda text: len(_WORDS.findall(text))
+
+
+count_tokens = _load_tokenizer()
+
+
+@dataclass
+class Chunk:
+    index: int
+    text: str
+    token_count: int
+    heading_path: List[str] = field(default_factory=list)
+
+    @property
+    def metadata(self) -> dict:
+        return {"heading_path": self.heading_path}
+
+    def embedding_input(self) -> str:
+        """Text sent to the embedding model: heading breadcrumb + body."""
+        if not self.heading_path:
+            return self.text
+        return " > ".join(self.heading_path) + "\n\n" + self.text
+
+
+def iter_blocks(lines: Iterable[str]) -> Iterator[Tuple[List[str], str]]:
+    """
+    Yield (heading_path, block) for each paragraph, list or code block.
+
+    Code fences are kept whole (a `#` inside a fence is not a heading).
+    """
+    headings: List[Tuple[int, str]] = []
+    block: List[str] = []
+    in_fence = False
+
+    def flush():
+        text = "\n".join(block).strip()
+        block.clear()
+        return text
+
+    for line in lines:
+        line = line.rstrip("\r\n")
+
+        if _FENCE.match(line):
+            if not in_fence and block:
+                text = flush()
+                if text:
+                    yield [h for _, h in headings], text
+            in_fence = not in_fence
+            block.append(line)
+            if not in_fence:
+                yield [h for _, h in headings], flush()
+            continue
+        if in_fence:
+            block.append(line)
+            continue
+
+        heading = _HEADING.match(line)
+        if heading or not line.strip():
+            text = flush()
+            if text:
+                yield [h for _, h in headings], text
+            if heading:
+                level = len(heading.group(1))
+                headings = [(lvl, h) for lvl, h in headings if lvl < level]
+                headings.append((level, heading.group(2)))
+            continue
+
+        block.append(line)
+
+    text = flush()
+    if text:
+        yield [h for _, h in headings], text
+
+
+def split_sentences(text: str) -> List[str]:
+    return [s for s in _SENTENCE_END.split(text) if s.strip()]
+
+
+def _split_oversized(text: str, max_tokens: int) -> Iterator[Tuple[str, int]]:
+    """Break a block larger than max_tokens at sentence (or line, for code), then word, boundaries."""
+    is_code = bool(_FENCE.match(text))
+    units = text.split("\n") if is_code else split_sentences(text)
+
+    pieces: List[str] = []
+    for unit in units:
+        if count_tokens(unit) <= max_tokens:
+            pieces.append(unit)
+            continue
+        current: List[str] = []
+        for word in unit.split(" "):
+            if current and count_tokens(" ".join(current + [word])) > max_tokens:
+                pieces.append(" ".join(current))
+                current = []
+            current.append(word)
+        if current:
+            pieces.append(" ".join(current))
+
+    joiner = "\n" if is_code else " "
+    current, current_tokens = [], 0
+    for piece in pieces:
+        tokens = count_tokens(piece)
+        if current and current_tokens + tokens > max_tokens:
+            yield joiner.join(current), current_tokens
+            current, current_tokens = [], 0
+        current.append(piece)
+        current_tokens += tokens
+    if current:
+        yield joiner.join(current), current_tokens
+
+
+def chunk_markdown(
+    lines: Iterable[str],
+    max_tokens: int = DEFAULT_MAX_TOKENS,
+    min_tokens: int = DEFAULT_MIN_TOKENS,
+) -> Iterator[Chunk]:
+    """
+    Lazily pack blocks into chunks of at most `max_tokens`.
+
+    A new section (heading path change) starts a new chunk once the current
+    one has at least `min_tokens`; tiny sections are merged forward and keep
+    the shared parent heading path.
+    """
+    index = 0
+    parts: List[str] = []
+    tokens = 0
+    section: Optional[List[str]] = None  # heading path of the last block
+    chunk_path: List[str] = []  # heading path recorded on the open chunk
+
+    def emit():
+        nonlocal index, parts, tokens
+        chunk = Chunk(index, "\n\n".join(parts), tokens, list(chunk_path))
+        index += 1
+        parts, tokens = [], 0
+        return chunk
+
+    for heading_path, block in iter_blocks(lines):
+        if heading_path != section:
+            if tokens >= min_tokens:
+                yield emit()
+            if parts:
+                # Tiny section merged forward: keep only the common parent path
+                common = 0
+                while (
+                    common < min(len(chunk_path), len(heading_path))
+                    and chunk_path[common] == heading_path[common]
+                ):
+                    common += 1
+                chunk_path = chunk_path[:common]
+            else:
+                chunk_path = heading_path
+            section = heading_path
+
+        block_tokens = count_tokens(block)
+        if block_tokens > max_tokens:
+            if parts:
+                yield emit()
+            chunk_path = heading_path
+            for piece, piece_tokens in _split_oversized(block, max_tokens):
+                parts, tokens = [piece], piece_tokens
+                yield emit()
+            continue
+
+        if parts and tokens + block_tokens > max_tokens:
+            yield emit()
+            chunk_path = heading_path
+        parts.append(block)
+        tokens += block_tokens
+
+    if parts:
+        yield emit()
+
+
+def chunk_file(
+    path: Path, max_tokens: int = DEFAULT_MAX_TOKENS, min_tokens: int = DEFAULT_MIN_TOKENS
+) -> Iterator[Chunk]:
+    """Stream a text/markdown file from disk into chunks."""
+    with open(path, encoding="utf-8", errors="replace") as f:
+        yield from chunk_markdown(f, max_tokens, min_tokens)
@@ -0,0 +1,460 @@
+#!/usr/bin/env python3
+"""
+Corpus ingestion: walk directories and ingest every supported document.
+
+Pipeline (each stage bounded, so a slow stage back-pressures the ones before it):
+
+1. discover - walk the roots for .md/.markdown/.txt/.html/.htm/.pdf
+              (PDFs with a text layer; needs `pip install pypdf`)
+2. parse    - extract text and chunk it in a process pool (CPU-bound)
+3. embed    - batched embeddings + bulk inserts via BatchIngester, several
+              sources in flight, sharing one rate limiter
+
+A checkpoint file records every finished file (size + mtime), so an
+interrupted run resumes where it stopped. Re-syncs are incremental anyway
+(see ingest_documents.py); the checkpoint also skips the parse step.
+
+Usage:
+    export SUPABASE_URL="https://ublqmilcjtpnflofprkr.supabase.co"
+    export SUPABASE_SERVICE_ROLE_KEY="your-service-role-key"
+    export OPENAI_API_KEY="your-openai-api-key"
+    python ingest_corpus.py ~/docs/finance-ops --tags finance --workers 8
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+from dataclasses import dataclass, field
+from html.parser import HTMLParser
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from openai import AsyncOpenAI
+from supabase import create_client
+
+from chunking import DEFAULT_MAX_TOKENS, Chunk, chunk_markdown
+from ingest_documents import EMBEDDING_MODEL, BatchIngester, file_hash
+
+SUPPORTED_EXTENSIONS = {
+    ".md": "markdown",
+    ".markdown": "markdown",
+    ".txt": "text",
+    ".html": "html",
+    ".htm": "html",
+    ".pdf": "pdf",
+}
+
+
+# ---------------------------------------------------------------------------
+# Parsing (runs in worker processes)
+# ---------------------------------------------------------------------------
+
+
+class _HTMLToMarkdown(HTMLParser):
+    """Just enough HTML -> markdown for the chunker: headings, blocks, list items."""
+
+    BLOCKS = {"p", "div", "section", "article", "li", "tr", "br", "pre", "blockquote", "table"}
+    SKIP = {"script", "style", "noscript", "nav", "footer", "head"}
+
+    def __init__(self):
+        super().__init__(convert_charrefs=True)
+        self.lines: List[str] = []
+        self.current: List[str] = []
+        self.title: Optional[str] = None
+        self._skip_depth = 0
+        self._heading: Optional[int] = None
+        self._in_title = False
+
+    def _flush(self):
+        text = " ".join("".join(self.current).split())
+        self.current = []
+        if text:
+            prefix = "#" * self._heading + " " if self._heading else ""
+            self.lines.extend([prefix + text, ""])
+
+    def handle_starttag(self, tag, attrs):
+        if tag in self.SKIP:
+            self._skip_depth += 1
+        elif tag == "title":
+            self._in_title = True
+        elif len(tag) == 2 and tag[0] == "h" and tag[1] in "123456":
+            self._flush()
+            self._heading = int(tag[1])
+        elif tag in self.BLOCKS:
+            self._flush()
+            if tag == "li":
+                self.current.append("- ")
+
+    def handle_endtag(self, tag):
+        if tag in self.SKIP:
+            self._skip_depth = max(0, self._skip_depth - 1)
+        elif tag == "title":
+            self._in_title = False
+        elif self._heading and tag == f"h{self._heading}":
+            self._flush()
+            self._heading = None
+        elif tag in self.BLOCKS:
+            self._flush()
+
+    def handle_data(self, data):
+        if self._in_title:
+            self.title = (self.title or "") + data.strip()
+        elif not self._skip_depth:
+            self.current.append(data)
+
+    def close(self):
+        super().close()
+        self._flush()
+
+
+def extract_lines(path: Path, kind: str) -> Tuple[Optional[str], List[str]]:
+    """Return (title if the document declares one, markdown-ish lines)."""
+    if kind == "html":
+        parser = _HTMLToMarkdown()
+        parser.feed(path.read_text(encoding="utf-8", errors="replace"))
+        parser.close()
+        return parser.title, parser.lines
+
+    if kind == "pdf":
+        from pypdf import PdfReader  # optional: only needed for PDFs
+
+        reader = PdfReader(str(path))
+        title = (reader.metadata.title if reader.metadata else None) or None
+        lines: List[str] = []
+        for page in reader.pages:
+            lines.extend((page.extract_text() or "").splitlines())
+            lines.append("")
+        return title, lines
+
+    lines = path.read_text(encoding="utf-8", errors="replace").splitlines()
+    title = None
+    if kind == "markdown":
+        title = next((l[2:].strip() for l in lines if l.startswith("# ")), None)
+    return title, lines
+
+
+@dataclass
+class ParsedDocument:
+    path: str
+    object_key: str
+    title: str
+    source_hash: str
+    size: int
+    chunks: List[Chunk] = field(default_factory=list)
+    error: Optional[str] = None
+    parse_seconds: float = 0.0
+
+
+def parse_document(path: str, object_key: str, max_tokens: int, model: str) -> ParsedDocument:
+    """Process-pool worker: hash, extract and chunk one file."""
+    started = time.perf_counter()
+    file_path = Path(path)
+    kind = SUPPORTED_EXTENSIONS[file_path.suffix.lower()]
+    fallback_title = file_path.stem.replace("_", " ").replace("-", " ").title()
+    doc = ParsedDocument(path, object_key, fallback_title, "", file_path.stat().st_size)
+    try:
+        doc.source_hash = file_hash(file_path, model, max_tokens)
+        title, lines = extract_lines(file_path, kind)
+        doc.title = title or fallback_title
+        doc.chunks = list(chunk_markdown(lines, max_tokens))
+    except Exception as e:
+        doc.error = f"{type(e).__name__}: {e}"
+    doc.parse_seconds = time.perf_counter() - started
+    return doc
+
+
+def discover(roots: List[Path]) -> Iterator[Path]:
+    """Walk the roots (skipping hidden directories) in a stable order."""
+    for root in roots:
+        if root.is_file():
+            if root.suffix.lower() in SUPPORTED_EXTENSIONS:
+                yield root
+            continue
+        for dirpath, dirnames, filenames in os.walk(root):
+            dirnames[:] = sorted(d for d in dirnames if not d.startswith("."))
+            for name in sorted(filenames):
+                if Path(name).suffix.lower() in SUPPORTED_EXTENSIONS and not name.startswith("."):
+                    yield Path(dirpath) / name
+
+
+# ---------------------------------------------------------------------------
+# Checkpoint
+# ---------------------------------------------------------------------------
+
+
+class Checkpoint:
+    """
+    JSON file of finished files: {"files": {key: {size, mtime_ns, source_id}},
+    "failed": {key: error}}. Written atomically, at most every `interval` seconds.
+    """
+
+    def __init__(self, path: Path, interval: float = 5.0):
+        self.path = path
+        self.interval = interval
+        self.files: Dict[str, dict] = {}
+        self.failed: Dict[str, str] = {}
+        self._saved_at = 0.0
+        self._dirty = False
+        if path.exists():
+            data = json.loads(path.read_text())
+            self.files = data.get("files", {})
+            self.failed = data.get("failed", {})
+
+    def is_done(self, key: str, stat: os.stat_result) -> bool:
+        entry = self.files.get(key)
+        return bool(entry) and entry["size"] == stat.st_size and entry["mtime_ns"] == stat.st_mtime_ns
+
+    def mark_done(self, key: str, stat: os.stat_result, source_id: str):
+        self.files[key] = {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns, "source_id": source_id}
+        self.failed.pop(key, None)
+        self._dirty = True
+        self.save()
+
+    def mark_failed(self, key: str, error: str):
+        self.failed[key] = error
+        self._dirty = True
+        self.save()
+
+    def save(self, force: bool = False):
+        if not self._dirty or (not force and time.monotonic() - self._saved_at < self.interval):
+            return
+        tmp = self.path.with_name(self.path.name + ".tmp")
+        tmp.write_text(json.dumps({"files": self.files, "failed": self.failed}))
+        os.replace(tmp, self.path)
+        self._saved_at = time.monotonic()
+        self._dirty = False
+
+
+# ---------------------------------------------------------------------------
+# Pipeline
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class StageCounter:
+    items: int = 0
+    chunks: int = 0
+    bytes: int = 0
+    busy_seconds: float = 0.0
+
+
+class CorpusIngester:
+    def __init__(
+        self,
+        ingester: BatchIngester,
+        checkpoint: Checkpoint,
+        root: Path,
+        workers: int = 4,
+        sources_in_flight: int = 4,
+        queue_size: int = 32,
+        max_tokens: int = DEFAULT_MAX_TOKENS,
+        tags: Optional[List[str]] = None,
+        description: str = "",
+    ):
+        self.ingester = ingester
+        self.checkpoint = checkpoint
+        self.root = root.resolve()
+        self.workers = workers
+        self.sources_in_flight = sources_in_flight
+        self.queue_size = queue_size
+        self.max_tokens = max_tokens
+        self.tags = tags or []
+        self.description = description
+
+        self.discovered = StageCounter()
+        self.resumed = StageCounter()
+        self.parsed = StageCounter()
+        self.stored = StageCounter()
+        self.failed = StageCounter()
+        self.started = time.perf_counter()
+
+    def object_key(self, path: Path) -> str:
+        resolved = path.resolve()
+        if resolved.is_relative_to(self.root):
+            return resolved.relative_to(self.root).as_posix()
+        return resolved.as_posix()
+
+    async def _produce(self, roots: List[Path], queue: asyncio.Queue, pool: ProcessPoolExecutor):
+        """discover + parse: at most 2x workers files in the pool, blocked by a full queue."""
+        loop = asyncio.get_running_loop()
+        parse_slots = asyncio.Semaphore(self.workers * 2)
+        pending = set()
+
+        async def parse(path: Path, key: str):
+            try:
+                doc = await loop.run_in_executor(
+                    pool, parse_document, str(path), key, self.max_tokens, self.ingester.model
+                )
+                self.parsed.items += 1
+                self.parsed.chunks += len(doc.chunks)
+                self.parsed.bytes += doc.size
+                self.parsed.busy_seconds += doc.parse_seconds
+                await queue.put(doc)
+            finally:
+                parse_slots.release()
+
+        for path in discover(roots):
+            key = self.object_key(path)
+            stat = path.stat()
+            self.discovered.items += 1
+            if self.checkpoint.is_done(key, stat):
+                self.resumed.items += 1
+                continue
+            await parse_slots.acquire()
+            task = asyncio.create_task(parse(path, key))
+            pending.add(task)
+            task.add_done_callback(pending.discard)
+        if pending:
+            await asyncio.gather(*pending)
+
+    async def _consume(self, queue: asyncio.Queue):
+        """embed + store one parsed document at a time."""
+        while True:
+            doc: Optional[ParsedDocument] = await queue.get()
+            if doc is None:
+                return
+            if doc.error:
+                self.failed.items += 1
+                self.checkpoint.mark_failed(doc.object_key, doc.error)
+                print(f"   ❌ {doc.object_key}: {doc.error}")
+                continue
+
+            started = time.perf_counter()
+            stat = Path(doc.path).stat()
+            try:
+                source_id = await self.ingester.ingest_source(
+                    title=doc.title,
+                    chunks=iter(doc.chunks),
+                    description=self.description or f"Ingested from {doc.object_key}",
+                    tags=self.tags,
+                    object_key=doc.object_key,
+                    source_hash=doc.source_hash,
+                )
+            except Exception as e:
+                self.failed.items += 1
+                self.checkpoint.mark_failed(doc.object_key, f"{type(e).__name__}: {e}")
+                print(f"   ❌ {doc.object_key}: {e}")
+                continue
+            self.stored.items += 1
+            self.stored.chunks += len(doc.chunks)
+            self.stored.busy_seconds += time.perf_counter() - started
+            self.checkpoint.mark_done(doc.object_key, stat, source_id)
+
+    def progress(self) -> str:
+        elapsed = max(time.perf_counter() - self.started, 1e-9)
+        embed = self.ingester.stats
+        return "\n".join(
+            [
+                f"   discover: {self.discovered.items} files ({self.discovered.items / elapsed:.1f}/s), "
+                f"{self.resumed.items} already done per checkpoint",
+                f"   parse:    {self.parsed.items} files, {self.parsed.chunks} chunks, "
+                f"{self.parsed.bytes / 1e6:.1f} MB ({self.parsed.items / elapsed:.1f} files/s, "
+                f"{self.parsed.chunks / elapsed:.1f} chunks/s)",
+                f"   embed:    {embed.embedded} embedded, {embed.copied} reused, "
+                f"{embed.unchanged} unchanged ({embed.embedded / elapsed:.1f} chunks/s, "
+                f"API busy {embed.embed_seconds:.1f}s)",
+                f"   store:    {self.stored.items} files, {embed.chunks} chunks written "
+                f"({self.stored.items / elapsed:.1f} files/s, {embed.chunks / elapsed:.1f} chunks/s), "
+                f"{self.failed.items} failed",
+            ]
+        )
+
+    async def _report(self, interval: float):
+        while True:
+            await asyncio.sleep(interval)
+            print(f"⏱️  {time.perf_counter() - self.started:.0f}s\n{self.progress()}")
+
+    async def run(self, roots: List[Path], report_interval: float = 10.0):
+        queue: asyncio.Queue = asyncio.Queue(maxsize=self.queue_size)
+        reporter = asyncio.create_task(self._report(report_interval))
+        try:
+            with ProcessPoolExecutor(max_workers=self.workers) as pool:
+                consumers = [
+                    asyncio.create_task(self._consume(queue)) for _ in range(self.sources_in_flight)
+                ]
+                await self._produce(roots, queue, pool)
+                for _ in consumers:
+                    await queue.put(None)
+                await asyncio.gather(*consumers)
+        finally:
+            reporter.cancel()
+            self.checkpoint.save(force=True)
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("roots", nargs="+", type=Path, help="Directories (or files) to ingest")
+    parser.add_argument(
+        "--root",
+        type=Path,
+        default=None,
+        help="Base for stored paths (default: the first root directory)",
+    )
+    parser.add_argument("--tags", default="", help="Comma-separated tags for every source")
+    parser.add_argument("--description", default="", help="Source description")
+    parser.add_argument(
+        "--checkpoint",
+        type=Path,
+        default=Path(".ingest_checkpoint.json"),
+        help="Checkpoint file used to resume interrupted runs",
+    )
+    parser.add_argument("--workers", type=int, default=os.cpu_count() or 4, help="Parse processes")
+    parser.add_argument("--sources-in-flight", type=int, default=4, help="Files embedding at once")
+    parser.add_argument("--queue-size", type=int, default=32, help="Parsed files waiting to embed")
+    parser.add_argument("--max-tokens", type=int, default=DEFAULT_MAX_TOKENS)
+    parser.add_argument("--batch-size", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=2, help="Batches in flight per file")
+    parser.add_argument("--rpm", type=float, default=3000)
+    parser.add_argument("--tpm", type=float, default=1_000_000)
+    parser.add_argument("--report-interval", type=float, default=10.0, help="Seconds")
+    return parser.parse_args(argv)
+
+
+async def run(args: argparse.Namespace) -> CorpusIngester:
+    supabase = create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_SERVICE_ROLE_KEY"])
+    ingester = BatchIngester(
+        supabase,
+        AsyncOpenAI(api_key=os.environ["OPENAI_API_KEY"]),
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+        model=EMBEDDING_MODEL,
+        verbose=False,
+    )
+    root = args.root or next((r for r in args.roots if r.is_dir()), Path("."))
+    corpus = CorpusIngester(
+        ingester,
+        Checkpoint(args.checkpoint),
+        root,
+        workers=args.workers,
+        sources_in_flight=args.sources_in_flight,
+        queue_size=args.queue_size,
+        max_tokens=args.max_tokens,
+        tags=[t.strip() for t in args.tags.split(",") if t.strip()],
+        description=args.description,
+    )
+    await corpus.run(args.roots, args.report_interval)
+    return corpus
+
+
+def main(argv: Optional[List[str]] = None):
+    if not all(os.getenv(k) for k in ("SUPABASE_URL", "SUPABASE_SERVICE_ROLE_KEY", "OPENAI_API_KEY")):
+        print("❌ Error: Missing required environment variables")
+        print("Required: SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY, OPENAI_API_KEY")
+        sys.exit(1)
+
+    args = parse_args(argv)
+    corpus = asyncio.run(run(args))
+    print(f"\n🎉 Corpus ingested in {time.perf_counter() - corpus.started:.1f}s")
+    print(corpus.progress())
+    if corpus.checkpoint.failed:
+        print(f"\n⚠️  {len(corpus.checkpoint.failed)} files failed (see {args.checkpoint})")
+
+
+if __name__ == "__main__":
+    main()
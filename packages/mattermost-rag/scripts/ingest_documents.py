@@ -0,0 +1,509 @@
+#!/usr/bin/env python3
+"""
+Batch ingestion CLI for the OpEx RAG vector database.
+
+Instead of one document insert, one embedding call and one embedding insert
+per chunk (3N sequential round trips), chunks are processed in batches:
+
+1. One embeddings API call per batch (up to the API's input-list limit)
+2. One multi-row INSERT into opex_documents per batch
+3. One multi-row INSERT into opex_document_embeddings per batch
+
+Batches run concurrently under a requests/tokens-per-minute rate limiter,
+and throughput is reported in chunks/sec.
+
+Re-running is incremental: files are matched to their existing source by
+path, unchanged files are skipped, and only chunks whose content hash is
+new get embedded; chunks that disappeared are deleted.
+
+Usage:
+    export SUPABASE_URL="https://ublqmilcjtpnflofprkr.supabase.co"
+    export SUPABASE_SERVICE_ROLE_KEY="your-service-role-key"
+    export OPENAI_API_KEY="your-openai-api-key"
+    python ingest_documents.py docs/*.md --tags finance,close --concurrency 4
+"""
+
+import argparse
+import asyncio
+import hashlib
+import os
+import sys
+import time
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+from openai import AsyncOpenAI
+from supabase import Client, create_client
+
+from chunking import DEFAULT_MAX_TOKENS, Chunk, chunk_file
+
+EMBEDDING_MODEL = "text-embedding-3-small"
+
+# OpenAI embeddings API limits: 2048 inputs and ~300k tokens per request
+MAX_INPUTS_PER_REQUEST = 2048
+MAX_TOKENS_PER_REQUEST = 300_000
+
+# content_hash values per `IN (...)` filter: each is 64 hex chars in the
+# PostgREST GET URL, so larger lists run past URL length limits
+HASHES_PER_QUERY = 100
+
+
+class RateLimiter:
+    """Token buckets for requests/min and tokens/min shared by all batches."""
+
+    def __init__(self, requests_per_minute: float, tokens_per_minute: float):
+        self.rpm = requests_per_minute
+        self.tpm = tokens_per_minute
+        self._requests = requests_per_minute
+        self._tokens = tokens_per_minute
+        self._refilled_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    def _refill(self):
+        now = time.monotonic()
+        elapsed = now - self._refilled_at
+        self._requests = min(self.rpm, self._requests + elapsed * self.rpm / 60)
+        self._tokens = min(self.tpm, self._tokens + elapsed * self.tpm / 60)
+        self._refilled_at = now
+
+    async def acquire(self, tokens: int):
+        # A batch larger than the whole per-minute budget can still run (alone)
+        tokens = min(tokens, self.tpm)
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._requests >= 1 and self._tokens >= tokens:
+                    self._requests -= 1
+                    self._tokens -= tokens
+                    return
+                wait = max(
+                    (1 - self._requests) * 60 / self.rpm,
+                    (tokens - self._tokens) * 60 / self.tpm,
+                )
+                await asyncio.sleep(max(wait, 0.01))
+
+
+@dataclass
+class IngestStats:
+    chunks: int = 0
+    batches: int = 0
+    embedded: int = 0
+    copied: int = 0
+    unchanged: int = 0
+    duplicates: int = 0
+    deleted: int = 0
+    skipped_sources: int = 0
+    embed_seconds: float = 0.0
+    insert_seconds: float = 0.0
+    started: float = field(default_factory=time.perf_counter)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self.started
+
+    @property
+    def chunks_per_second(self) -> float:
+        return self.chunks / self.elapsed if self.elapsed else 0.0
+
+    def report(self) -> str:
+        return (
+            f"{self.chunks} chunks in {self.batches} batches, {self.elapsed:.1f}s "
+            f"({self.chunks_per_second:.1f} chunks/sec; "
+            f"embed {self.embed_seconds:.1f}s, insert {self.insert_seconds:.1f}s cumulative); "
+            f"{self.embedded} embedded, {self.copied} reused from other sources, "
+            f"{self.unchanged} unchanged, {self.duplicates} duplicates, {self.deleted} deleted, "
+            f"{self.skipped_sources} sources skipped"
+        )
+
+
+def make_batches(chunks: Iterable[Chunk], batch_size: int) -> Iterator[List[Chunk]]:
+    """Lazily group chunks into batches within the per-request input and token limits."""
+    batch_size = min(batch_size, MAX_INPUTS_PER_REQUEST)
+    current: List[Chunk] = []
+    current_tokens = 0
+    for chunk in chunks:
+        if current and (
+            len(current) >= batch_size
+            or current_tokens + chunk.token_count > MAX_TOKENS_PER_REQUEST
+        ):
+            yield current
+            current, current_tokens = [], 0
+        current.append(chunk)
+        current_tokens += chunk.token_count
+    if current:
+        yield current
+
+
+def content_hash(text: str, model: str) -> str:
+    """Content address of a chunk: normalized embedding input + embedding model."""
+    normalized = " ".join(text.split())
+    return hashlib.sha256(f"{model}\0{normalized}".encode("utf-8")).hexdigest()
+
+
+def file_hash(path: Path, model: str, max_tokens: int) -> str:
+    """Whole-file hash (plus chunking settings) to skip unchanged files outright."""
+    digest = hashlib.sha256(f"{model}\0{max_tokens}\0".encode("utf-8"))
+    with open(path, "rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+class BatchIngester:
+    """
+    Embed and bulk-insert chunks for one or more sources.
+
+    Sources are synced incrementally: chunks are content-addressed (see
+    content_hash), so only chunks whose hash is not yet stored for the source
+    are embedded; hashes already stored under another source reuse that
+    vector instead of calling the API, and stored chunks that no longer
+    appear are deleted.
+    """
+
+    def __init__(
+        self,
+        supabase: Client,
+        openai_client: AsyncOpenAI,
+        batch_size: int = 100,
+        concurrency: int = 4,
+        requests_per_minute: float = 3000,
+        tokens_per_minute: float = 1_000_000,
+        model: str = EMBEDDING_MODEL,
+        verbose: bool = True,
+    ):
+        self.supabase = supabase
+        self.openai = openai_client
+        self.batch_size = batch_size
+        self.model = model
+        self.limiter = RateLimiter(requests_per_minute, tokens_per_minute)
+        self.concurrency = concurrency
+        self.verbose = verbose
+        self.stats = IngestStats()
+
+    def log(self, message: str):
+        if self.verbose:
+            print(message)
+
+    async def embed(self, chunks: List[Chunk]) -> List[List[float]]:
+        """One embeddings call for the whole batch (order preserved by index)."""
+        await self.limiter.acquire(sum(c.token_count for c in chunks))
+        started = time.perf_counter()
+        response = await self.openai.embeddings.create(
+            model=self.model, input=[c.embedding_input() for c in chunks]
+        )
+        self.stats.embed_seconds += time.perf_counter() - started
+        return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+
+    async def load_stored(self, source_id: str) -> Dict[str, Tuple[str, int]]:
+        """content_hash -> (document id, chunk_index) for everything stored for a source."""
+        stored: Dict[str, Tuple[str, int]] = {}
+        page = 1000
+        offset = 0
+        while True:
+            result = await asyncio.to_thread(
+                lambda: self.supabase.table("opex_documents")
+                .select("id, chunk_index, content_hash")
+                .eq("source_id", source_id)
+                .order("id")
+                .range(offset, offset + page - 1)
+                .execute()
+            )
+            for row in result.data:
+                # Rows from before content hashing have no hash: treated as orphans
+                if row["content_hash"]:
+                    stored[row["content_hash"]] = (row["id"], row["chunk_index"])
+            if len(result.data) < page:
+                return stored
+            offset += page
+
+    async def reusable_embeddings(self, hashes: List[str]) -> Dict[str, object]:
+        """Vectors already computed for these hashes under any source."""
+        reusable = {}
+        for i in range(0, len(hashes), HASHES_PER_QUERY):
+            chunk = hashes[i : i + HASHES_PER_QUERY]
+            result = await asyncio.to_thread(
+                lambda: self.supabase.table("opex_documents")
+                .select("content_hash, opex_document_embeddings(embedding, model)")
+                .in_("content_hash", chunk)
+                .execute()
+            )
+            for row in result.data:
+                embeddings = row.get("opex_document_embeddings") or []
+                if isinstance(embeddings, dict):
+                    embeddings = [embeddings]
+                for embedding in embeddings:
+                    if embedding.get("model") == self.model and embedding.get("embedding"):
+                        reusable[row["content_hash"]] = embedding["embedding"]
+        return reusable
+
+    def _document_row(self, source_id: str, chunk: Chunk, chunk_hash: str) -> dict:
+        return {
+            "source_id": source_id,
+            "chunk_index": chunk.index,
+            "text": chunk.text,
+            "token_count": chunk.token_count,
+            "metadata": chunk.metadata,
+            "content_hash": chunk_hash,
+        }
+
+    async def insert_batch(
+        self, source_id: str, chunks: List[Chunk], hashes: Dict[int, str], embeddings: List
+    ):
+        """Multi-row inserts: documents first (for their IDs), then embeddings."""
+        started = time.perf_counter()
+        documents = [self._document_row(source_id, c, hashes[c.index]) for c in chunks]
+        inserted = await asyncio.to_thread(
+            lambda: self.supabase.table("opex_documents").insert(documents).execute()
+        )
+        ids_by_hash: Dict[str, str] = {row["content_hash"]: row["id"] for row in inserted.data}
+
+        rows = [
+            {"document_id": ids_by_hash[hashes[c.index]], "embedding": embedding, "model": self.model}
+            for c, embedding in zip(chunks, embeddings)
+        ]
+        await asyncio.to_thread(
+            lambda: self.supabase.table("opex_document_embeddings").insert(rows).execute()
+        )
+        self.stats.insert_seconds += time.perf_counter() - started
+
+    async def _run_batch(self, source_id: str, batch: List[Chunk], hashes: Dict[int, str]):
+        reusable = await self.reusable_embeddings([hashes[c.index] for c in batch])
+        to_embed = [c for c in batch if hashes[c.index] not in reusable]
+        fresh = dict(zip((c.index for c in to_embed), await self.embed(to_embed))) if to_embed else {}
+        embeddings = [
+            fresh[c.index] if c.index in fresh else reusable[hashes[c.index]] for c in batch
+        ]
+        await self.insert_batch(source_id, batch, hashes, embeddings)
+
+        self.stats.chunks += len(batch)
+        self.stats.embedded += len(to_embed)
+        self.stats.copied += len(batch) - len(to_embed)
+        self.stats.batches += 1
+        self.log(
+            f"   ✅ Batch of {len(batch)} stored, {len(to_embed)} embedded "
+            f"({self.stats.chunks} chunks, {self.stats.chunks_per_second:.1f} chunks/sec)"
+        )
+
+    async def _update_positions(self, source_id: str, moved: List[Tuple[Chunk, str]]):
+        """Upsert kept chunks whose position or metadata changed (no re-embedding)."""
+        rows = [self._document_row(source_id, c, h) for c, h in moved]
+        await asyncio.to_thread(
+            lambda: self.supabase.table("opex_documents")
+            .upsert(rows, on_conflict="source_id,content_hash")
+            .execute()
+        )
+
+    async def _delete_documents(self, ids: List[str]):
+        for i in range(0, len(ids), self.batch_size):
+            batch = ids[i : i + self.batch_size]
+            await asyncio.to_thread(
+                lambda: self.supabase.table("opex_documents").delete().in_("id", batch).execute()
+            )
+
+    async def ingest_chunks(self, source_id: str, chunks: Iterable[Chunk]) -> int:
+        """
+        Sync a source's chunks: embed new ones, keep unchanged ones, delete orphans.
+
+        Up to `concurrency` batches are in flight. Chunks are pulled lazily:
+        the next batch is only built once a slot frees up, so a huge file is
+        never fully chunked in memory.
+        """
+        stored = await self.load_stored(source_id)
+        seen: Dict[str, int] = {}
+        hashes: Dict[int, str] = {}
+        moved: List[Tuple[Chunk, str]] = []
+
+        def new_chunks() -> Iterator[Chunk]:
+            for chunk in chunks:
+                chunk_hash = content_hash(chunk.embedding_input(), self.model)
+                if chunk_hash in seen:
+                    self.stats.duplicates += 1
+                    continue
+                seen[chunk_hash] = chunk.index
+                if chunk_hash in stored:
+                    self.stats.unchanged += 1
+                    if stored[chunk_hash][1] != chunk.index:
+                        moved.append((chunk, chunk_hash))
+                    continue
+                hashes[chunk.index] = chunk_hash
+                yield chunk
+
+        in_flight: set = set()
+        try:
+            for batch in make_batches(new_chunks(), self.batch_size):
+                if len(in_flight) >= self.concurrency:
+                    done, in_flight = await asyncio.wait(
+                        in_flight, return_when=asyncio.FIRST_COMPLETED
+                    )
+                    for task in done:
+                        task.result()
+                in_flight.add(asyncio.create_task(self._run_batch(source_id, batch, hashes)))
+            if in_flight:
+                await asyncio.gather(*in_flight)
+        except BaseException:
+            for task in in_flight:
+                task.cancel()
+            raise
+
+        for i in range(0, len(moved), self.batch_size):
+            await self._update_positions(source_id, moved[i : i + self.batch_size])
+
+        orphans = [doc_id for h, (doc_id, _) in stored.items() if h not in seen]
+        if orphans:
+            await self._delete_documents(orphans)
+        self.stats.deleted += len(orphans)
+        return len(seen)
+
+    def find_source(self, object_key: str) -> Optional[dict]:
+        result = (
+            self.supabase.table("opex_embedding_sources")
+            .select("id, content_hash, status")
+            .eq("source_type", "manual")
+            .eq("object_key", object_key)
+            .limit(1)
+            .execute()
+        )
+        return result.data[0] if result.data else None
+
+    def create_source(
+        self,
+        title: str,
+        description: str = "",
+        tags: Optional[List[str]] = None,
+        object_key: Optional[str] = None,
+    ) -> str:
+        result = (
+            self.supabase.table("opex_embedding_sources")
+            .insert(
+                {
+                    "source_type": "manual",
+                    "title": title,
+                    "description": description,
+                    "tags": tags or [],
+                    "object_key": object_key,
+                    "status": "processing",
+                }
+            )
+            .execute()
+        )
+        return result.data[0]["id"]
+
+    def set_status(
+        self,
+        source_id: str,
+        status: str,
+        source_hash: Optional[str] = None,
+        error: Optional[str] = None,
+    ):
+        update = {"status": status, "error_message": error}
+        if source_hash is not None:
+            update["content_hash"] = source_hash
+        self.supabase.table("opex_embedding_sources").update(update).eq("id", source_id).execute()
+
+    async def ingest_source(
+        self,
+        title: str,
+        chunks: Iterable[Chunk],
+        description: str = "",
+        tags: Optional[List[str]] = None,
+        object_key: Optional[str] = None,
+        source_hash: Optional[str] = None,
+    ) -> str:
+        """
+        Create or re-sync a source and mark it ready (or failed).
+
+        With an `object_key` the existing source for that key is reused; if
+        its stored `source_hash` matches, the source is skipped without
+        chunking. An existing source stays searchable while it is re-synced,
+        and a failed re-sync of a ready source only records `error_message`:
+        the source stays ready (with its old hash, so the next run retries).
+        """
+        existing = await asyncio.to_thread(self.find_source, object_key) if object_key else None
+        if existing and source_hash and existing.get("content_hash") == source_hash:
+            self.stats.skipped_sources += 1
+            self.log(f"⏭️  {title} unchanged")
+            return existing["id"]
+
+        if existing:
+            source_id = existing["id"]
+        else:
+            source_id = await asyncio.to_thread(
+                self.create_source, title, description, tags, object_key
+            )
+        self.log(f"📄 {title} (source {source_id})")
+        try:
+            count = await self.ingest_chunks(source_id, chunks)
+        except Exception as e:
+            status = "ready" if existing and existing.get("status") == "ready" else "failed"
+            await asyncio.to_thread(self.set_status, source_id, status, None, str(e)[:1000])
+            raise
+        await asyncio.to_thread(self.set_status, source_id, "ready", source_hash)
+        self.log(f"   {count} chunks")
+        return source_id
+
+
+def parse_args(argv: Optional[List[str]] = None) -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.split("\n\n")[0])
+    parser.add_argument("files", nargs="+", type=Path, help="Text/markdown files to ingest")
+    parser.add_argument("--tags", default="", help="Comma-separated tags for every source")
+    parser.add_argument("--description", default="", help="Source description")
+    parser.add_argument(
+        "--root",
+        type=Path,
+        default=Path("."),
+        help="Paths are stored relative to this directory to recognize sources on re-sync",
+    )
+    parser.add_argument(
+        "--max-tokens", type=int, default=DEFAULT_MAX_TOKENS, help="Max tokens per chunk"
+    )
+    parser.add_argument(
+        "--batch-size", type=int, default=100, help="Chunks per embeddings call / INSERT"
+    )
+    parser.add_argument("--concurrency", type=int, default=4, help="Batches in flight")
+    parser.add_argument("--rpm", type=float, default=3000, help="Embedding requests per minute")
+    parser.add_argument("--tpm", type=float, default=1_000_000, help="Embedding tokens per minute")
+    return parser.parse_args(argv)
+
+
+async def run(args: argparse.Namespace) -> IngestStats:
+    supabase = create_client(os.environ["SUPABASE_URL"], os.environ["SUPABASE_SERVICE_ROLE_KEY"])
+    ingester = BatchIngester(
+        supabase,
+        AsyncOpenAI(api_key=os.environ["OPENAI_API_KEY"]),
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        requests_per_minute=args.rpm,
+        tokens_per_minute=args.tpm,
+    )
+    tags = [t.strip() for t in args.tags.split(",") if t.strip()]
+
+    root = args.root.resolve()
+    for path in args.files:
+        resolved = path.resolve()
+        object_key = (
+            resolved.relative_to(root) if resolved.is_relative_to(root) else resolved
+        ).as_posix()
+        await ingester.ingest_source(
+            title=path.stem.replace("_", " ").replace("-", " ").title(),
+            chunks=chunk_file(path, args.max_tokens),
+            description=args.description or f"Ingested from {path.name}",
+            tags=tags,
+            object_key=object_key,
+            source_hash=file_hash(path, ingester.model, args.max_tokens),
+        )
+    return ingester.stats
+
+
+def main(argv: Optional[List[str]] = None):
+    if not all(os.getenv(k) for k in ("SUPABASE_URL", "SUPABASE_SERVICE_ROLE_KEY", "OPENAI_API_KEY")):
+        print("❌ Error: Missing required environment variables")
+        print("Required: SUPABASE_URL, SUPABASE_SERVICE_ROLE_KEY, OPENAI_API_KEY")
+        sys.exit(1)
+
+    stats = asyncio.run(run(parse_args(argv)))
+    print(f"\n🎉 Ingested {stats.report()}")
+
+
+if __name__ == "__main__":
+    main()
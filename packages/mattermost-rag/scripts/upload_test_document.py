@@ -4,9 +4,9 @@ Upload test document to OpEx RAG vector database.
 
 This script:
 1. Creates a test document in opex_embedding_sources
-2. Chunks the text into smaller pieces
-3. Generates embeddings using OpenAI
-4. Stores embeddings in opex_document_embeddings
+2. Chunks the text by headings/paragraphs/sentences (see chunking.py)
+3. Generates embeddings using OpenAI (batched, see ingest_documents.py)
+4. Bulk-inserts chunks and embeddings into opex_documents / opex_document_embeddings
 5. Verifies the document is searchable via match_opex_documents()
 
 Usage:
@@ -16,11 +16,14 @@ Usage:
     python upload_test_document.py
 """
 
+import asyncio
 import os
 import sys
-from typing import List
 from supabase import create_client
-from openai import OpenAI
+from openai import AsyncOpenAI, OpenAI
+
+from chunking import chunk_markdown
+from ingest_documents import BatchIngester
 
 # Test document content
 TEST_DOCUMENT = """
@@ -122,20 +125,6 @@ Configure slash commands in Mattermost:
 """
 
 
-def chunk_text(text: str, chunk_size: int = 800, overlap: int = 200) -> List[str]:
-    """Split text into overlapping chunks."""
-    chunks = []
-    start = 0
-
-    while start < len(text):
-        end = start + chunk_size
-        chunk = text[start:end]
-        chunks.append(chunk)
-        start += chunk_size - overlap
-
-    return chunks
-
-
 def main():
     # Validate environment variables
     supabase_url = os.getenv("SUPABASE_URL")
@@ -171,41 +160,14 @@ def main():
 
     # Step 2: Chunk the document
     print("\n📄 Chunking document...")
-    chunks = chunk_text(TEST_DOCUMENT)
+    chunks = list(chunk_markdown(TEST_DOCUMENT.splitlines()))
     print(f"✅ Created {len(chunks)} chunks")
 
-    # Step 3: Process each chunk
-    print("\n🔄 Processing chunks and generating embeddings...")
-    for idx, chunk_text in enumerate(chunks):
-        print(f"   Processing chunk {idx + 1}/{len(chunks)}...")
-
-        # Create document record
-        doc_data = {
-            "source_id": source_id,
-            "chunk_index": idx,
-            "text": chunk_text,
-            "token_count": len(chunk_text.split())  # Rough estimate
-        }
-
-        doc_result = supabase.table("opex_documents").insert(doc_data).execute()
-        document_id = doc_result.data[0]["id"]
-
-        # Generate embedding
-        embedding_response = openai_client.embeddings.create(
-            model="text-embedding-3-small",
-            input=chunk_text
-        )
-        embedding = embedding_response.data[0].embedding
-
-        # Store embedding
-        embedding_data = {
-            "document_id": document_id,
-            "embedding": embedding,
-            "model": "text-embedding-3-small"
-        }
-
-        supabase.table("opex_document_embeddings").insert(embedding_data).execute()
-        print(f"   ✅ Chunk {idx + 1} embedded and stored")
+    # Step 3: Embed and store chunks in batches (one API call + two INSERTs per batch)
+    print("\n🔄 Generating embeddings and storing chunks in batches...")
+    ingester = BatchIngester(supabase, AsyncOpenAI(api_key=openai_key))
+    asyncio.run(ingester.ingest_chunks(source_id, chunks))
+    print(f"✅ {ingester.stats.report()}")
 
     # Step 4: Mark source as ready
     print("\n✅ Marking source as ready...")
@@ -0,0 +1,46 @@
+-- OpEx RAG: chunk metadata
+-- Purpose: structure-aware chunker records each chunk's heading path
+--          (e.g. ["Deployment Guide", "Troubleshooting"]); search returns it
+
+ALTER TABLE opex_documents
+    ADD COLUMN IF NOT EXISTS metadata JSONB NOT NULL DEFAULT '{}'::jsonb;
+
+-- Return type changes, so the function must be dropped first
+DROP FUNCTION IF EXISTS match_opex_documents(vector, FLOAT, INT);
+
+CREATE OR REPLACE FUNCTION match_opex_documents(
+    query_embedding vector(1536),
+    match_threshold FLOAT DEFAULT 0.7,
+    match_count INT DEFAULT 5
+)
+RETURNS TABLE (
+    document_id UUID,
+    source_id UUID,
+    title TEXT,
+    text TEXT,
+    metadata JSONB,
+    similarity FLOAT
+)
+LANGUAGE plpgsql
+AS $$
+BEGIN
+    RETURN QUERY
+    SELECT
+        d.id AS document_id,
+        d.source_id,
+        s.title,
+        d.text,
+        d.metadata,
+        1 - (e.embedding <=> query_embedding) AS similarity
+    FROM opex_document_embeddings e
+    JOIN opex_documents d ON e.document_id = d.id
+    JOIN opex_embedding_sources s ON d.source_id = s.id
+    WHERE s.status = 'ready'
+        AND (1 - (e.embedding <=> query_embedding)) > match_threshold
+    ORDER BY e.embedding <=> query_embedding
+    LIMIT match_count;
+END;
+$$;
+
+COMMENT ON COLUMN opex_documents.metadata IS 'Chunk metadata (heading_path, ...)';
+COMMENT ON FUNCTION match_opex_documents IS 'Vector similarity search across OpEx knowledge base';
@@ -0,0 +1,25 @@
+-- OpEx RAG: content-addressed chunks for incremental re-sync
+-- Purpose: ingestion embeds only chunks whose content hash is new,
+--          reuses vectors across sources and deletes orphaned chunks
+
+-- sha256(model || normalized embedding input) per chunk
+ALTER TABLE opex_documents
+    ADD COLUMN IF NOT EXISTS content_hash TEXT;
+
+-- Chunks are identified by content within a source; chunk_index is only
+-- ordering and may shift (or briefly collide) while a source is re-synced
+ALTER TABLE opex_documents
+    DROP CONSTRAINT IF EXISTS opex_documents_source_id_chunk_index_key;
+CREATE UNIQUE INDEX IF NOT EXISTS idx_opex_docs_source_hash
+    ON opex_documents(source_id, content_hash);
+CREATE INDEX IF NOT EXISTS idx_opex_docs_content_hash
+    ON opex_documents(content_hash);
+
+-- Whole-file hash (+ model, chunk size) so unchanged files are skipped
+ALTER TABLE opex_embedding_sources
+    ADD COLUMN IF NOT EXISTS content_hash TEXT;
+CREATE INDEX IF NOT EXISTS idx_opex_sources_object_key
+    ON opex_embedding_sources(source_type, object_key);
+
+COMMENT ON COLUMN opex_documents.content_hash IS 'sha256 of embedding model + normalized chunk text';
+COMMENT ON COLUMN opex_embedding_sources.content_hash IS 'Hash of the ingested file and chunking settings';